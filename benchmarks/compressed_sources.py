@@ -0,0 +1,165 @@
+"""
+Сравнение чтения несжатых и сжатых файлов таблиц (JSON, NDJSON, gzip, zstd).
+
+Скрипт генерирует синтетическую таблицу, сохраняет ее в каждом формате и читает
+через DataRepository (без кэша таблиц) двумя запросами:
+
+* предпросмотр - первая страница из 20 строк;
+* полное чтение таблицы.
+
+Для каждого запроса выводится время и процессорное время при прогретом страничном
+кэше ОС (случай, когда чтение ограничено процессором). Случай, когда чтение
+ограничено диском (например, сетевым томом), оценивается для скоростей из --disk-mbps:
+к процессорному времени добавляется время чтения файла с такой скоростью (для
+предпросмотра сжатых NDJSON - только распакованного начала файла). С параметром
+--drop-caches перед каждым чтением сбрасывается страничный кэш ОС (нужны права root),
+и время чтения с диска измеряется, а не оценивается.
+
+Пример запуска:
+
+    uv run --group bench python benchmarks/compressed_sources.py --rows 1000000 --disk-mbps 100 500
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import pyarrow as pa
+
+from aw_connector_example.dto import DataSource
+from aw_connector_example.services.readers import CompressedNdjsonReader
+from aw_connector_example.services.repo import DataRepository
+
+
+FORMATS = ['json', 'json.gz', 'json.zst', 'ndjson', 'ndjson.gz', 'ndjson.zst']
+
+
+def generate_rows(rows: int) -> list[dict]:
+    """
+    Генерирует синтетическую таблицу с числами, датами и повторяющимися строками
+    """
+    rnd = random.Random(rows)
+    return [
+        {
+            'id': i,
+            'amount': round(rnd.uniform(0, 100_000), 2),
+            'created_at': f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}',
+            'category': f'category {rnd.randint(0, 50)}',
+            'comment': f'comment {rnd.randint(0, 100_000)}',
+        }
+        for i in range(rows)
+    ]
+
+
+def write_tables(folder: Path, rows: list[dict]):
+    """
+    Сохраняет таблицу в каждом формате (таблица t_json_gz - файл t_json_gz.json.gz и т.д.)
+    """
+    folder.mkdir(parents=True)
+    json_content = json.dumps(rows).encode('utf-8')
+    ndjson_content = b''.join(json.dumps(row).encode('utf-8') + b'\n' for row in rows)
+
+    for fmt in FORMATS:
+        content = json_content if fmt.startswith('json') else ndjson_content
+        if fmt.endswith('.gz'):
+            content = gzip.compress(content, compresslevel=6)
+        elif fmt.endswith('.zst'):
+            content = pa.Codec('zstd', compression_level=3).compress(
+                content, asbytes=True
+            )
+        (folder / f'{get_table_name(fmt)}.{fmt}').write_bytes(content)
+
+
+def get_table_name(fmt: str) -> str:
+    return 't_' + fmt.replace('.', '_')
+
+
+def drop_caches():
+    subprocess.run(['sync'], check=True)
+    Path('/proc/sys/vm/drop_caches').write_text('3\n')
+
+
+def measure(coro_factory, repeat: int, cold: bool) -> tuple[float, float]:
+    """
+    Возвращает лучшие из repeat запусков время и процессорное время (в секундах)
+    """
+    wall = cpu = float('inf')
+    for _ in range(repeat):
+        if cold:
+            drop_caches()
+        started, cpu_started = time.perf_counter(), time.process_time()
+        asyncio.run(coro_factory())
+        wall = min(wall, time.perf_counter() - started)
+        cpu = min(cpu, time.process_time() - cpu_started)
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--formats', nargs='+', default=FORMATS, choices=FORMATS)
+    parser.add_argument(
+        '--disk-mbps',
+        type=float,
+        nargs='+',
+        default=[100, 500],
+        help='Скорости чтения с диска (MB/s) для оценки времени чтения',
+    )
+    parser.add_argument('--drop-caches', action='store_true')
+    parser.add_argument('--repeat', type=int, default=3, help='Лучшее из N запусков')
+    args = parser.parse_args()
+
+    data_source = DataSource(id=0, type='bench', params={'db': 'db1'})
+
+    with tempfile.TemporaryDirectory(prefix='aw-connector-bench-') as tmp:
+        folder = Path(tmp) / 'db1' / 'public'
+        write_tables(folder, generate_rows(args.rows))
+        repo = DataRepository(Path(tmp))
+
+        header = (
+            f'{"format":<11} {"size, MB":>9} {"query":<8} {"time, s":>8} {"cpu, s":>7} '
+            + ' '.join(f'{f"@{mbps:g}MB/s":>10}' for mbps in args.disk_mbps)
+        )
+        print(f'Таблица: {args.rows} строк')
+        print(header)
+        print('-' * len(header))
+
+        for fmt in args.formats:
+            object_name = f'public.{get_table_name(fmt)}'
+            file_path = folder / f'{get_table_name(fmt)}.{fmt}'
+            size = file_path.stat().st_size
+
+            # при предпросмотре сжатого NDJSON читается только начало файла
+            preview_size = size
+            if fmt.startswith('ndjson'):
+                preview_size = min(size, CompressedNdjsonReader.min_chunk_size)
+
+            queries = {
+                'preview': (
+                    lambda: repo.get_object_frame(
+                        data_source, object_name, limit=20, offset=0
+                    ),
+                    preview_size,
+                ),
+                'full': (lambda: repo.get_object_frame(data_source, object_name), size),
+            }
+            for query, (coro_factory, read_size) in queries.items():
+                wall, cpu = measure(coro_factory, args.repeat, args.drop_caches)
+                disk_times = ' '.join(
+                    f'{cpu + read_size / 1024 / 1024 / mbps:>10.3f}'
+                    for mbps in args.disk_mbps
+                )
+                print(
+                    f'{fmt:<11} {size / 1024 / 1024:>9.2f} {query:<8} '
+                    f'{wall:>8.3f} {cpu:>7.3f} {disk_times}'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Сравнение параметров записи parquet-файлов (сжатие, размер группы строк,
+словарное кодирование).
+
+Скрипт генерирует синтетическую таблицу, записывает ее в локальную папку через
+ParquetService с каждой комбинацией параметров и выводит:
+
+* время записи и скорость (MB/s по объему несжатых данных таблицы);
+* размер записанных файлов и степень сжатия;
+* время полного чтения записанных файлов.
+
+Пример запуска:
+
+    uv run --group bench python benchmarks/parquet_writer.py --rows 1000000 --codecs snappy zstd --row-groups 65536 1048576
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aw_connector_example.dto import ParquetWriterOptions
+from aw_connector_example.services.parquet import ParquetService
+
+
+def generate_table(rows: int, extra_columns: int) -> pa.Table:
+    """
+    Генерирует синтетическую таблицу: числа, даты и строки с повторяющимися
+    значениями (на них заметен эффект словарного кодирования)
+    """
+    rnd = random.Random(rows)
+    columns = {
+        'id': list(range(1, rows + 1)),
+        'amount': [round(rnd.uniform(0, 100_000), 2) for _ in range(rows)],
+        'created_at': [
+            f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}'
+            for _ in range(rows)
+        ],
+        'is_active': [rnd.random() > 0.5 for _ in range(rows)],
+    }
+    for c in range(extra_columns):
+        columns[f'attr_{c}'] = [f'value {rnd.randint(0, 1000)}' for _ in range(rows)]
+    return pa.table(columns)
+
+
+def folder_size(folder: Path) -> int:
+    return sum(f.stat().st_size for f in folder.rglob('*.parquet'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--extra-columns', type=int, default=5)
+    parser.add_argument(
+        '--codecs',
+        nargs='+',
+        default=['none', 'snappy', 'lz4', 'zstd', 'gzip'],
+        choices=['none', 'snappy', 'gzip', 'brotli', 'zstd', 'lz4'],
+    )
+    parser.add_argument('--row-groups', type=int, nargs='+', default=[65536, 1048576])
+    parser.add_argument('--dictionary', choices=['on', 'off', 'both'], default='both')
+    parser.add_argument('--repeat', type=int, default=3, help='Лучшее из N запусков')
+    args = parser.parse_args()
+
+    table = generate_table(args.rows, args.extra_columns)
+    table_mb = table.nbytes / 1024 / 1024
+    dictionary = {'on': [True], 'off': [False], 'both': [True, False]}[args.dictionary]
+
+    header = (
+        f'{"codec":<7} {"row group":>10} {"dict":>5} {"write, s":>9} {"MB/s":>8} '
+        f'{"size, MB":>9} {"ratio":>6} {"read, s":>8}'
+    )
+    print(f'Таблица: {args.rows} строк, {table_mb:.1f} MB несжатых данных')
+    print(header)
+    print('-' * len(header))
+
+    parquet_service = ParquetService()
+    with tempfile.TemporaryDirectory(prefix='aw-connector-bench-') as tmp:
+        for i, (codec, row_group, use_dictionary) in enumerate(
+            product(args.codecs, args.row_groups, dictionary)
+        ):
+            options = ParquetWriterOptions(
+                compression=codec,
+                max_rows_per_group=row_group,
+                use_dictionary=use_dictionary,
+            )
+
+            write_time = read_time = float('inf')
+            for attempt in range(args.repeat):
+                folder = Path(tmp) / f'{i}-{attempt}'
+                started = time.perf_counter()
+                parquet_service.write_dataset(table, str(folder), options=options)
+                write_time = min(write_time, time.perf_counter() - started)
+
+                started = time.perf_counter()
+                pq.read_table(folder)
+                read_time = min(read_time, time.perf_counter() - started)
+
+            size_mb = folder_size(folder) / 1024 / 1024
+            print(
+                f'{codec:<7} {row_group:>10} {"on" if use_dictionary else "off":>5} '
+                f'{write_time:>9.3f} {table_mb / write_time:>8.1f} '
+                f'{size_mb:>9.2f} {table_mb / size_mb:>6.2f} {read_time:>8.3f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
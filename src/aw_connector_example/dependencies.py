@@ -1,17 +1,41 @@
-from typing import Annotated
+from typing import Annotated, TYPE_CHECKING
 import os
 from functools import lru_cache
 import logging
 from pathlib import Path
+from urllib.parse import urlparse
 
-from fastapi import Depends
+from fastapi import Depends, FastAPI, Header, Request
 
+from aw_connector_example.dto import ParquetWriterOptions
+from aw_connector_example.services.admission import AdmissionController
+from aw_connector_example.services.container import ServiceContainer
+from aw_connector_example.services.health import HealthProber
+from aw_connector_example.services.compression import ResponseCompressor
+from aw_connector_example.services.views import ViewStore, ViewRefresher
 from aw_connector_example.services.repo import DataRepository
 from aw_connector_example.services.parquet import ParquetService
 from aw_connector_example.services.parquet_queue import ParquetQueue
+from aw_connector_example.services.schema import SchemaInference
+from aw_connector_example.services.storage import (
+    DiskCache,
+    LocalStorage,
+    ObjectStorage,
+)
+from aw_connector_example.services.table_cache import TableCache
+from aw_connector_example.services.warmup import Warmup
+from aw_connector_example.services.watermark import WatermarkStore
+from aw_connector_example.services.fingerprint import FingerprintStore
 from aw_connector_example.settings import Settings
+from aw_connector_example.lazy import lazy_import
 
+if TYPE_CHECKING:
+    import s3fs
+else:
+    s3fs = lazy_import('s3fs')
 
+
+@lru_cache
 def get_logger() -> logging.Logger:
     uvicorn_logger = logging.getLogger('uvicorn')
     log_level = os.getenv('LOG_LEVEL')
@@ -20,34 +44,358 @@ def get_logger() -> logging.Logger:
     return uvicorn_logger
 
 
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
 def get_data_root_folder() -> Path:
     """
-    Возвращает путь к папке с данными
+    Возвращает путь к папке с данными по умолчанию (папка data внутри пакета)
     """
     return Path(__file__).parent / 'data'
 
 
+def get_request_timeout(
+    x_request_timeout: Annotated[str | None, Header()] = None,
+) -> str | None:
+    """
+    Возвращает таймаут запроса (в секундах) из заголовка X-Request-Timeout
+    """
+    return x_request_timeout
+
+
+def get_if_none_match(
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> str | None:
+    """
+    Возвращает ETag ответов, которые уже есть у клиента (заголовок If-None-Match)
+    """
+    return if_none_match
+
+
+def get_cache_folder(settings: Settings) -> Path:
+    """
+    Возвращает путь к папке со служебными файлами коннектора
+    """
+    if settings.cache_folder:
+        return Path(settings.cache_folder)
+    return Path(__file__).parent / '.cache'
+
+
+def get_queue_folder(settings: Settings) -> Path:
+    """
+    Возвращает путь к папке со статусами задач асинхронной выгрузки в parquet
+    """
+    if settings.queue_folder:
+        return Path(settings.queue_folder)
+    return Path(__file__).parent / '.queue'
+
+
+def get_watermark_folder(settings: Settings) -> Path:
+    """
+    Возвращает путь к папке с отметками инкрементальной выгрузки в parquet
+    """
+    if settings.watermark_folder:
+        return Path(settings.watermark_folder)
+    return Path(__file__).parent / '.watermarks'
+
+
+def get_views_folder(settings: Settings) -> Path:
+    """
+    Возвращает путь к папке с материализованными представлениями
+    """
+    if settings.views_folder:
+        return Path(settings.views_folder)
+    return Path(__file__).parent / '.views'
+
+
+def get_spill_folder(settings: Settings) -> Path:
+    """
+    Возвращает путь к папке для временных файлов потокового выполнения запросов
+    """
+    if settings.spill_folder:
+        return Path(settings.spill_folder)
+    return Path(__file__).parent / '.spill'
+
+
+def get_data_cache_folder(settings: Settings) -> Path:
+    """
+    Возвращает путь к папке локального кэша файлов из S3
+    """
+    if settings.data_cache_folder:
+        return Path(settings.data_cache_folder)
+    return get_cache_folder(settings) / 'objects'
+
+
+def get_data_storage(settings: Settings) -> LocalStorage | ObjectStorage:
+    """
+    Возвращает хранилище данных источников: папку на диске или папку в S3 (если
+    DATA_ROOT - URL вида s3://bucket/prefix)
+    """
+    if not settings.data_root.startswith('s3://'):
+        return LocalStorage(
+            Path(settings.data_root) if settings.data_root else get_data_root_folder()
+        )
+
+    fs = s3fs.S3FileSystem(
+        **get_s3_storage_options(settings, settings.data_s3_url or None)
+    )
+    return ObjectStorage(
+        fs,
+        settings.data_root,
+        cache=DiskCache(
+            get_data_cache_folder(settings),
+            max_size=settings.data_cache_size_mb * 1024 * 1024,
+        ),
+        listing_interval=settings.data_listing_interval,
+        part_size=settings.data_download_part_size_mb * 1024 * 1024,
+        max_concurrency=settings.data_download_concurrency,
+        prefetch=settings.data_prefetch,
+    )
+
+
+def get_table_cache(
+    settings: Settings, storage: LocalStorage | ObjectStorage | None = None
+) -> TableCache | None:
+    """
+    Возвращает кэш колоночных копий таблиц (или None, если кэш отключен)
+    """
+    if not settings.table_cache_enabled:
+        return None
+    return TableCache(
+        get_cache_folder(settings),
+        chunk_rows=settings.table_cache_chunk_rows,
+        storage=storage,
+    )
+
+
+def get_s3_storage_options(settings: Settings, url: str | None = None) -> dict:
+    """
+    Возвращает параметры подключения к S3 хранилищу по URL url (по умолчанию -
+    к S3 хранилищу AW BI из ETL_S3_URL)
+    """
+    s3_parsed_url = urlparse(url or settings.etl_s3_url)
+
+    port = f':{s3_parsed_url.port}' if s3_parsed_url.port else ''
+
+    return dict(
+        endpoint_url=f'{s3_parsed_url.scheme}://{s3_parsed_url.hostname}{port}',
+        key=s3_parsed_url.username,
+        secret=s3_parsed_url.password,
+        use_ssl=s3_parsed_url.scheme == 'https',
+    )
+
+
+def get_s3_filesystem(
+    settings: Annotated[Settings, Depends(get_settings)],
+) -> 's3fs.S3FileSystem':
+    """
+    Возвращает файловую систему S3 хранилища AW BI.
+
+    Экземпляры S3FileSystem с одинаковыми параметрами кэшируются fsspec, поэтому
+    все запросы процесса используют одно и то же соединение (пул соединений)
+    """
+    return s3fs.S3FileSystem(**get_s3_storage_options(settings))
+
+
+def create_services(app: FastAPI) -> ServiceContainer:
+    """
+    Создает сервисы приложения (вызывается один раз в lifespan).
+
+    Настройки и папка с данными берутся из app.dependency_overrides, если функции
+    get_settings и get_data_root_folder там переопределены (например, в тестах)
+    """
+    settings = app.dependency_overrides.get(get_settings, get_settings)()
+    if get_data_root_folder in app.dependency_overrides:
+        storage = LocalStorage(app.dependency_overrides[get_data_root_folder]())
+    else:
+        storage = get_data_storage(settings)
+
+    # временные файлы Polars (в том числе при потоковом выполнении запросов)
+    # пишутся в папку spill_folder
+    spill_folder = get_spill_folder(settings)
+    spill_folder.mkdir(parents=True, exist_ok=True)
+    os.environ['POLARS_TEMP_DIR'] = str(spill_folder)
+
+    data_repo = DataRepository(
+        storage.root,
+        table_cache=get_table_cache(settings, storage),
+        schema_inference=SchemaInference(sample_rows=settings.schema_sample_rows),
+        streaming_threshold=settings.streaming_threshold_mb * 1024 * 1024,
+        views=ViewStore(
+            get_views_folder(settings), chunk_rows=settings.table_cache_chunk_rows
+        ),
+        storage=storage,
+        stats_precision=settings.stats_precision,
+    )
+
+    warmup = Warmup(
+        data_repo,
+        tables=split_list(settings.warmup_tables),
+        schemas=split_list(settings.warmup_schemas),
+        s3_storage_options=(
+            get_s3_storage_options(settings) if settings.etl_s3_url else None
+        ),
+        s3_bucket=settings.etl_s3_bucket,
+    )
+
+    admission = AdmissionController(
+        max_requests=settings.admission_max_requests,
+        source_max_requests=settings.admission_source_max_requests,
+        memory_limit=settings.admission_memory_limit_mb * 1024 * 1024,
+        source_memory_limit=settings.admission_source_memory_limit_mb * 1024 * 1024,
+        queue_size=settings.admission_queue_size,
+        queue_timeout=settings.admission_queue_timeout,
+    )
+
+    health_prober = None
+    if settings.etl_s3_url and settings.etl_s3_bucket:
+        health_prober = HealthProber(
+            get_s3_storage_options(settings),
+            bucket=settings.etl_s3_bucket,
+            interval=settings.health_check_interval,
+            timeout=settings.health_check_timeout,
+        )
+
+    compressor = None
+    if split_list(settings.compression_encodings):
+        compressor = ResponseCompressor(
+            split_list(settings.compression_encodings),
+            min_size=settings.compression_min_size,
+            gzip_level=settings.compression_gzip_level,
+            zstd_level=settings.compression_zstd_level,
+            thread_threshold=settings.compression_thread_threshold,
+        )
+
+    return ServiceContainer(
+        data_repo=data_repo,
+        parquet_service=ParquetService(
+            spill_folder=spill_folder,
+            options=ParquetWriterOptions(
+                compression=settings.parquet_compression,
+                compression_level=settings.parquet_compression_level,
+                use_dictionary=settings.parquet_use_dictionary,
+                data_page_size=settings.parquet_data_page_size,
+                max_rows_per_group=settings.parquet_max_rows_per_group,
+                max_rows_per_file=settings.parquet_max_rows_per_file,
+                target_file_size_mb=settings.parquet_target_file_size_mb,
+            ),
+        ),
+        parquet_queue=ParquetQueue(root=get_queue_folder(settings)),
+        watermark_store=WatermarkStore(root=get_watermark_folder(settings)),
+        fingerprint_store=FingerprintStore(
+            root=get_watermark_folder(settings) / 'fingerprints'
+        ),
+        warmup=warmup,
+        admission=admission,
+        health_prober=health_prober,
+        compressor=compressor,
+        view_refresher=(
+            ViewRefresher(data_repo, interval=settings.views_refresh_interval)
+            if settings.views_refresh_interval > 0
+            else None
+        ),
+        object_storage=storage if isinstance(storage, ObjectStorage) else None,
+    )
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """
+    Возвращает сервисы приложения, созданные при запуске
+    """
+    services = getattr(request.app.state, 'services', None)
+    if services is None:
+        raise RuntimeError(
+            'Сервисы приложения не созданы: приложение запущено без lifespan'
+        )
+    return services
+
+
 def get_data_repository(
-    data_root_folder: Annotated[Path, Depends(get_data_root_folder)],
+    services: Annotated[ServiceContainer, Depends(get_services)],
 ) -> DataRepository:
     """
     Возвращает репозиторий для доступа к данным
     """
-    return DataRepository(data_root_folder)
+    return services.data_repo
 
 
-def get_parquet_service():
+def get_parquet_service(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> ParquetService:
     """
     Возвращает сервис для работы с parquet-таблицами
     """
-    return ParquetService()
+    return services.parquet_service
 
 
-def get_parquet_queue_service() -> ParquetQueue:
-    """ """
-    return ParquetQueue(root=Path(__file__).parent / '.queue')
+def get_parquet_queue_service(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> ParquetQueue:
+    """
+    Возвращает сервис очереди задач асинхронной выгрузки в parquet
+    """
+    return services.parquet_queue
 
 
-@lru_cache
-def get_settings() -> Settings:
-    return Settings()
+def get_watermark_store(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> WatermarkStore:
+    """
+    Возвращает хранилище отметок инкрементальной выгрузки в parquet
+    """
+    return services.watermark_store
+
+
+def get_fingerprint_store(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> FingerprintStore:
+    """
+    Возвращает хранилище отпечатков выгрузок в parquet
+    """
+    return services.fingerprint_store
+
+
+def get_warmup(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> Warmup:
+    """
+    Возвращает сервис прогрева коннектора
+    """
+    return services.warmup
+
+
+def get_admission(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> AdmissionController:
+    """
+    Возвращает сервис ограничения одновременно выполняемых запросов к данным
+    """
+    return services.admission
+
+
+def get_health_prober(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> HealthProber | None:
+    """
+    Возвращает сервис фоновой проверки доступа к S3 хранилищу (или None, если
+    параметры S3 хранилища не указаны)
+    """
+    return services.health_prober
+
+
+def get_compressor(
+    services: Annotated[ServiceContainer, Depends(get_services)],
+) -> ResponseCompressor | None:
+    """
+    Возвращает сервис сжатия ответов (или None, если сжатие ответов отключено)
+    """
+    return services.compressor
+
+
+def split_list(value: str) -> list[str]:
+    """
+    Разбивает значение переменной окружения со списком через запятую
+    """
+    return [item.strip() for item in value.split(',') if item.strip()]
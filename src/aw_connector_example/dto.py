@@ -1,4 +1,5 @@
-from typing import Any
+from typing import Any, Literal
+import datetime
 from enum import Enum
 
 from pydantic import BaseModel, Field
@@ -127,6 +128,48 @@ class ObjectMeta(BaseModel):
     )
 
 
+class ObjectColumnStats(BaseModel):
+    """
+    Статистики столбца объекта
+    """
+
+    name: str = Field(description='Название столбца', examples=['name'])
+    type: str = Field(description='Тип столбца', examples=['String'])
+    null_count: int = Field(description='Количество значений null', examples=[0])
+    distinct_count: int | None = Field(
+        description='Оценка количества различных значений (без null, погрешность около 1%)',
+        default=None,
+        examples=[3],
+    )
+    min: Any = Field(
+        description='Минимальное значение (для чисел, строк, логических значений и дат)',
+        default=None,
+        examples=['name 1'],
+    )
+    max: Any = Field(
+        description='Максимальное значение (для чисел, строк, логических значений и дат)',
+        default=None,
+        examples=['name 3'],
+    )
+    size: int = Field(
+        description='Оценка объема данных столбца в памяти (в байтах)', examples=[18]
+    )
+
+
+class ObjectStats(BaseModel):
+    """
+    Статистики объекта источника
+    """
+
+    row_count: int = Field(description='Количество строк', examples=[3])
+    size: int = Field(
+        description='Оценка объема данных объекта в памяти (в байтах)', examples=[42]
+    )
+    columns: list[ObjectColumnStats] = Field(
+        description='Статистики столбцов объекта', default=[]
+    )
+
+
 class ObjectData(BaseModel):
     """
     Данные объекта источника
@@ -211,6 +254,60 @@ class ParquetObject(BaseModel):
     )
 
 
+class ParquetWriterOptions(BaseModel):
+    """
+    Параметры записи parquet-файлов. Не указанные параметры берутся из настроек коннектора
+    """
+
+    compression: Literal['none', 'snappy', 'gzip', 'brotli', 'zstd', 'lz4'] | None = (
+        Field(
+            default=None,
+            description='Алгоритм сжатия',
+            examples=['zstd'],
+        )
+    )
+    compression_level: int | None = Field(
+        default=None,
+        description='Уровень сжатия (для gzip, brotli и zstd)',
+        examples=[None],
+    )
+    use_dictionary: bool | None = Field(
+        default=None,
+        description='Использовать словарное кодирование столбцов',
+        examples=[None],
+    )
+    data_page_size: int | None = Field(
+        default=None,
+        gt=0,
+        description='Размер страницы данных (в байтах)',
+        examples=[None],
+    )
+    max_rows_per_group: int | None = Field(
+        default=None,
+        gt=0,
+        description='Максимальное количество строк в группе строк (row group)',
+        examples=[1048576],
+    )
+    max_rows_per_file: int | None = Field(
+        default=None,
+        ge=0,
+        description='Максимальное количество строк в одном файле (0 - без ограничения)',
+        examples=[None],
+    )
+    target_file_size_mb: float | None = Field(
+        default=None,
+        ge=0,
+        description='Примерный размер одного файла (в МБ, по объему несжатых данных). '
+        'Данные разбиваются на файлы такого размера (0 - без ограничения)',
+        examples=[None],
+    )
+    partition_cols: list[str] | None = Field(
+        default=None,
+        description='Столбцы, по значениям которых данные разбиваются на подпапки вида column=value',
+        examples=[None],
+    )
+
+
 # -----------------------------------------------------------------------
 # DTO для запросов и ответов
 # -----------------------------------------------------------------------
@@ -375,3 +472,137 @@ class ParquetRequest(BaseModel):
         description='Ограничение на количество записей, которое нужно выгрузить в parquet',
         examples=[None],
     )
+    incremental_column: str | None = Field(
+        default=None,
+        description='Столбец с возрастающими значениями (например, id или updated_at) для инкрементальной выгрузки. '
+        'Выгружаются только строки, в которых значение столбца больше, чем в прошлой выгрузке в эту же папку. '
+        'Если не указан, используется параметр ИнкрементальныйСтолбец источника',
+        examples=[None],
+    )
+    writer_options: ParquetWriterOptions | None = Field(
+        default=None,
+        description='Параметры записи parquet-файлов (переопределяют настройки коннектора)',
+        examples=[None],
+    )
+
+
+class ParquetBatchRequest(BaseModel):
+    """
+    Запрос на пакетную выгрузку данных нескольких объектов в parquet
+    """
+
+    exports: list[ParquetRequest] = Field(
+        ...,
+        min_length=1,
+        description='Выгрузки объектов пакета (каждая - как в запросе /data-source/parquet). '
+        'Таблицы источника, которые используются в нескольких объектах, загружаются один раз',
+    )
+    max_parallel: int | None = Field(
+        default=None,
+        gt=0,
+        description='Сколько объектов пакета выгружать одновременно. Если не указано, '
+        'используется настройка коннектора PARQUET_BATCH_MAX_PARALLEL',
+        examples=[None],
+    )
+
+
+class ParquetBatchObjectStatus(BaseModel):
+    """
+    Состояние выгрузки объекта пакета
+    """
+
+    name: str = Field(description='Название объекта', examples=['public.table2'])
+    folder: str = Field(
+        description='Папка, в которую выгружаются данные объекта',
+        examples=['s3://runs/2025-08-21_01-02-03-preview-68d9/data.parquet'],
+    )
+    status: str = Field(
+        description='Состояние выгрузки: started (ожидает запуска), running, finished или error',
+        examples=['finished'],
+    )
+    error: str | None = Field(
+        default=None, description='Текст ошибки выгрузки', examples=[None]
+    )
+
+
+class ParquetBatchStatus(BaseModel):
+    """
+    Состояние пакетной выгрузки в parquet
+    """
+
+    status: str = Field(
+        description='Состояние пакета: running (есть незавершенные выгрузки), '
+        'finished (все объекты выгружены) или error (есть выгрузки с ошибками)',
+        examples=['running'],
+    )
+    objects: list[ParquetBatchObjectStatus] = Field(
+        description='Состояние выгрузки каждого объекта пакета (в порядке запроса)'
+    )
+
+
+class MaterializedViewRequest(BaseModel):
+    """
+    Запрос на создание (замену) материализованного представления
+    """
+
+    data_source: DataSource = Field(..., description='Описание источника данных')
+    schema_name: str = Field(
+        alias='schema',
+        default='views',
+        pattern=r'^[A-Za-z_][A-Za-z0-9_]*$',
+        description='Схема, в которой представление показывается в списке объектов источника',
+        examples=['views'],
+    )
+    name: str = Field(
+        ...,
+        pattern=r'^[A-Za-z_][A-Za-z0-9_]*$',
+        description='Название представления. Не должно совпадать с названиями таблиц источника',
+        examples=['sales_by_product'],
+    )
+    query_text: str = Field(
+        ...,
+        description='Текст SQL запроса к таблицам источника',
+        examples=[
+            'select t1.id, sum(t2.amount) as amount from table1 t1 join table2 t2 on t1.id = t2.id group by t1.id'
+        ],
+    )
+
+
+class MaterializedViewListRequest(BaseModel):
+    """
+    Запрос списка материализованных представлений источника
+    """
+
+    data_source: DataSource = Field(..., description='Описание источника данных')
+
+
+class MaterializedViewDropRequest(BaseModel):
+    """
+    Запрос на удаление материализованного представления
+    """
+
+    data_source: DataSource = Field(..., description='Описание источника данных')
+    object_name: str = Field(
+        ...,
+        description='Название представления в формате {schema}.{name}',
+        examples=['views.sales_by_product'],
+    )
+
+
+class MaterializedViewInfo(BaseModel):
+    """
+    Материализованное представление и состояние его результата
+    """
+
+    schema_name: str = Field(alias='schema', examples=['views'])
+    name: str = Field(examples=['sales_by_product'])
+    query_text: str = Field(examples=['select * from table1'])
+    fresh: bool = Field(
+        description='Результат представления рассчитан по текущим данным таблиц',
+        examples=[True],
+    )
+    refreshed_at: datetime.datetime | None = Field(
+        default=None,
+        description='Время последнего расчета представления',
+        examples=['2025-08-01T10:00:00+00:00'],
+    )
@@ -0,0 +1,33 @@
+"""
+Настройки gunicorn для запуска коннектора в несколько процессов (workers).
+
+Запуск:
+
+    gunicorn -c python:aw_connector_example.gunicorn_conf aw_connector_example.main:app
+
+Приложение загружается в мастер-процессе до запуска workers (preload_app), поэтому
+код приложения импортируется один раз. Тяжелые библиотеки (polars, pyarrow, s3fs)
+импортируются в каждом worker при первом обращении к данным (см. lazy.py).
+
+Состояние, которое должно быть общим для всех workers (статусы задач выгрузки,
+колоночные копии таблиц), хранится в файлах в QUEUE_FOLDER и CACHE_FOLDER
+"""
+
+import os
+
+from aw_connector_example.settings import Settings
+
+settings = Settings()
+
+bind = f'0.0.0.0:{os.getenv("CONNECTOR_HTTP_PORT", "8080")}'
+workers = settings.connector_workers
+worker_class = 'uvicorn_worker.UvicornWorker'
+preload_app = True
+
+# выгрузки больших таблиц выполняются долго, не перезапускаем worker по таймауту
+timeout = 0
+graceful_timeout = 30
+
+_log_level = os.getenv('LOG_LEVEL', 'info').lower()
+loglevel = 'debug' if _log_level == 'trace' else _log_level
+accesslog = '-'
@@ -0,0 +1,30 @@
+"""
+Отложенный импорт тяжелых библиотек (polars, pyarrow, sqlglot, s3fs).
+
+Модуль, полученный через lazy_import, импортируется при первом обращении к его
+атрибуту, а не при импорте приложения. Поэтому коннектор быстрее запускается
+и начинает отвечать на /health до первого обращения к данным
+"""
+
+from types import ModuleType
+
+import importlib
+
+
+class LazyModule(ModuleType):
+    """
+    Заместитель модуля, который импортирует модуль при первом обращении к атрибуту
+    """
+
+    def __getattr__(self, name: str):
+        module = importlib.import_module(self.__name__)
+        # после импорта атрибуты модуля берутся из __dict__ без вызова __getattr__
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Возвращает модуль name, который будет импортирован при первом использовании
+    """
+    return LazyModule(name)
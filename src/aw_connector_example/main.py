@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
@@ -6,7 +8,8 @@ from fastapi.openapi.utils import get_openapi
 
 from aw_connector_example.routers.data_source import router as data_source_router
 from aw_connector_example.routers import router
-from aw_connector_example.dependencies import get_logger
+from aw_connector_example.dependencies import get_logger, create_services
+from aw_connector_example.middleware import CompressionMiddleware
 
 description = """
 Пример реализации API пользовательского коннектора для [AW BI](https://aw-bi.ru) на языке Python с использованием 
@@ -29,12 +32,31 @@ tags_metadata = [
     },
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Создает сервисы приложения и запускает их фоновые задачи (прогрев коннектора).
+    При остановке приложения фоновые задачи отменяются
+    """
+    app.state.services = create_services(app)
+    await app.state.services.start()
+
+    yield
+
+    await app.state.services.close()
+    app.state.services = None
+
+
 app = FastAPI(
     title='Пример коннектора AW BI',
     description=description,
     openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
 
+app.add_middleware(CompressionMiddleware)
+
 app.include_router(data_source_router)
 app.include_router(router)
 
@@ -0,0 +1,86 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов API (gzip или zstd, в зависимости от Accept-Encoding запроса).
+
+    Сжимаются только ответы с JSON и текстом (например, данные объектов для
+    предпросмотра). Параметры сжатия берутся из сервиса ResponseCompressor,
+    созданного при запуске приложения. Если сервисы не созданы или сжатие
+    выключено, то ответы возвращаются как есть
+    """
+
+    compressible_types = ('application/json', 'text/')
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        services = (
+            getattr(scope['app'].state, 'services', None)
+            if scope['type'] == 'http' and 'app' in scope
+            else None
+        )
+        compressor = services.compressor if services is not None else None
+        if compressor is None:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = compressor.choose_encoding(
+            Headers(scope=scope).get('accept-encoding')
+        )
+        start_message: Message | None = None
+        chunks: list[bytes] = []
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                content_type = headers.get('content-type', '')
+                if 'content-encoding' in headers or not content_type.startswith(
+                    self.compressible_types
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            # ответы API формируются целиком в памяти, поэтому тело можно собрать
+            # полностью перед сжатием
+            chunks.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+
+            body = b''.join(chunks)
+            headers = MutableHeaders(raw=start_message['headers'])
+            headers.add_vary_header('Accept-Encoding')
+
+            compressed = (
+                await compressor.compress(body, encoding) if encoding and body else None
+            )
+            if compressed is not None and len(compressed) < len(body):
+                body = compressed
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                # сжатый ответ побайтово отличается от исходного
+                etag = headers.get('etag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = f'W/{etag}'
+
+            await send(start_message)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
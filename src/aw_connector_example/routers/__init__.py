@@ -3,3 +3,5 @@ from fastapi import APIRouter
 router = APIRouter()
 
 from .health import *
+from .ready import *
+from .metrics import *
@@ -6,7 +6,10 @@ from .ping import *
 from .objects import *
 from .object_meta import *
 from .object_data import *
+from .object_stats import *
 from .sql_meta import *
 from .sql_data import *
 from .parquet import *
 
+from .parquet_batch import *
+from .views import *
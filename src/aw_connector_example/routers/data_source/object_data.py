@@ -5,7 +5,17 @@ from fastapi import Depends, Body, HTTPException
 
 from aw_connector_example.dto import ObjectDataRequest, ObjectData
 from aw_connector_example.services.repo import DataRepository, DataRepositoryError
-from aw_connector_example.dependencies import get_data_repository, get_logger
+from aw_connector_example.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+from aw_connector_example.services.deadline import DeadlineExceeded
+from aw_connector_example.dependencies import (
+    get_admission,
+    get_data_repository,
+    get_logger,
+    get_request_timeout,
+)
 from aw_connector_example.routers.data_source import router
 
 
@@ -19,6 +29,8 @@ async def object_data(
     request: Annotated[ObjectDataRequest, Body()],
     data_repo: Annotated[DataRepository, Depends(get_data_repository)],
     logger: Annotated[logging.Logger, Depends(get_logger)],
+    request_timeout: Annotated[str | None, Depends(get_request_timeout)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
 ):
     """
     Предварительный просмотр (preview) данных объекта источника.
@@ -32,14 +44,37 @@ async def object_data(
         limit, offset = request.page_size, (request.page - 1) * request.page_size
 
     try:
-        rows = await data_repo.get_object_data(
-            request.data_source, request.object_name, limit=limit, offset=offset
+        deadline = data_repo.get_deadline(request.data_source, request_timeout)
+        memory = await data_repo.estimate_memory(
+            request.data_source, object_name=request.object_name
         )
+        async with admission.admit(request.data_source.id, memory, deadline):
+            rows = await data_repo.get_object_data(
+                request.data_source,
+                request.object_name,
+                limit=limit,
+                offset=offset,
+                deadline=deadline,
+            )
     except DataRepositoryError as e:
         logger.error(
             f'Не удалось получить данные объекта {request.object_name} из источника id={request.data_source.id}: {e}'
         )
         raise HTTPException(status_code=400, detail=f'{e}')
+    except DeadlineExceeded as e:
+        logger.error(
+            f'Прервано получение данных объекта {request.object_name} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(status_code=504, detail=f'{e}')
+    except AdmissionRejected as e:
+        logger.warning(
+            f'Отклонен запрос данных объекта {request.object_name} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(
+            status_code=503,
+            detail=f'{e}',
+            headers={'Retry-After': f'{e.retry_after:g}'},
+        )
     except Exception as e:
         logger.exception(
             f'Ошибка получения данных объекта {request.object_name} из источника id={request.data_source.id}'
@@ -1,11 +1,18 @@
 from typing import Annotated
 import logging
 
-from fastapi import Depends, Body, HTTPException
+from fastapi import Depends, Body, HTTPException, Response
 
 from aw_connector_example.dto import ObjectMetaRequest, ObjectMeta
 from aw_connector_example.services.repo import DataRepository, DataRepositoryError
-from aw_connector_example.dependencies import get_data_repository, get_logger
+from aw_connector_example.services.etag import make_etag, etag_matches
+from aw_connector_example.settings import Settings
+from aw_connector_example.dependencies import (
+    get_data_repository,
+    get_if_none_match,
+    get_logger,
+    get_settings,
+)
 from aw_connector_example.routers.data_source import router
 
 
@@ -32,31 +39,60 @@ from aw_connector_example.routers.data_source import router
                                 'type': 'VARCHAR',
                                 'simple_type': 'string',
                                 'comment': None,
+                            },
+                        ],
+                        'foreign_keys': [
+                            {
+                                'column_name': 'id',
+                                'foreign_table_schema': 'public',
+                                'foreign_table_name': 'table1',
+                                'foreign_column_name': 'id',
                             }
                         ],
-                        'foreign_keys': [{
-                            'column_name': 'id',
-                            'foreign_table_schema': 'public',
-                            'foreign_table_name': 'table1',
-                            'foreign_column_name': 'id'
-                        }],
                     }
                 }
             },
-        }
+        },
+        304: {
+            'description': 'Метаданные не изменились (ETag совпадает с If-None-Match)'
+        },
     },
 )
 async def object_meta(
     request: Annotated[ObjectMetaRequest, Body()],
     data_repo: Annotated[DataRepository, Depends(get_data_repository)],
     logger: Annotated[logging.Logger, Depends(get_logger)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    if_none_match: Annotated[str | None, Depends(get_if_none_match)],
+    response: Response,
 ):
     """ 
     Возвращает метаданные объекта источника: столбцы и их типы, а также внешние связи с другими объектами источника.
+
+    В ответе возвращается заголовок ETag, который меняется при изменении файла объекта. Если ETag передан
+    в заголовке If-None-Match повторного запроса, и объект не изменился, то возвращается HTTP 304 без тела ответа.
     """
     logger.debug(
         f'Запрос на получение метаданных объекта /data-source/object-meta:\n{request.model_dump_json(indent=2)}'
     )
+
+    try:
+        etag = make_etag(
+            request.model_dump_json(),
+            await data_repo.get_version(
+                request.data_source, object_name=request.object_name
+            ),
+        )
+    except Exception:
+        # версию данных определить не удалось, ответ возвращается без ETag
+        etag = None
+
+    if etag is not None and etag_matches(if_none_match, etag):
+        # данные не изменились, ответ у клиента актуален
+        return Response(
+            status_code=304,
+            headers={'ETag': etag, 'Cache-Control': settings.metadata_cache_control},
+        )
     try:
         object_meta = await data_repo.get_object_meta(
             request.data_source, request.object_name
@@ -70,6 +106,10 @@ async def object_meta(
         )
         raise HTTPException(status_code=500, detail=f'{e}')
 
+    if etag is not None:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = settings.metadata_cache_control
+
     logger.debug(
         f'Ответ на запрос /data-source/object-meta:\n{object_meta.model_dump_json(indent=2)}'
     )
@@ -0,0 +1,117 @@
+from typing import Annotated
+
+import logging
+from fastapi import Depends, Body, HTTPException, Response
+
+from aw_connector_example.dto import ObjectMetaRequest, ObjectStats
+from aw_connector_example.services.repo import DataRepository, DataRepositoryError
+from aw_connector_example.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+from aw_connector_example.services.deadline import DeadlineExceeded
+from aw_connector_example.services.etag import make_etag, etag_matches
+from aw_connector_example.settings import Settings
+from aw_connector_example.dependencies import (
+    get_admission,
+    get_data_repository,
+    get_if_none_match,
+    get_logger,
+    get_request_timeout,
+    get_settings,
+)
+from aw_connector_example.routers.data_source import router
+
+
+@router.post(
+    path='/object-stats',
+    summary='Статистики столбцов объекта источника',
+    response_model=ObjectStats,
+    tags=['data source'],
+    responses={
+        304: {
+            'description': 'Статистики не изменились (ETag совпадает с If-None-Match)'
+        },
+    },
+)
+async def object_stats(
+    request: Annotated[ObjectMetaRequest, Body()],
+    data_repo: Annotated[DataRepository, Depends(get_data_repository)],
+    logger: Annotated[logging.Logger, Depends(get_logger)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    if_none_match: Annotated[str | None, Depends(get_if_none_match)],
+    request_timeout: Annotated[str | None, Depends(get_request_timeout)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+    response: Response,
+):
+    """
+    Возвращает статистики объекта источника: количество строк, а для каждого столбца - количество
+    null, оценку количества различных значений (HyperLogLog) и минимальное и максимальное значения.
+
+    Статистики вычисляются за один проход по данным при первом запросе к текущей версии объекта
+    и сохраняются. В ответе возвращается заголовок ETag, который меняется при изменении файла объекта.
+    """
+    logger.debug(
+        f'Запрос на получение статистик объекта /data-source/object-stats:\n{request.model_dump_json(indent=2)}'
+    )
+
+    try:
+        etag = make_etag(
+            request.model_dump_json(),
+            await data_repo.get_version(
+                request.data_source, object_name=request.object_name
+            ),
+        )
+    except Exception:
+        # версию данных определить не удалось, ответ возвращается без ETag
+        etag = None
+
+    if etag is not None and etag_matches(if_none_match, etag):
+        return Response(
+            status_code=304,
+            headers={'ETag': etag, 'Cache-Control': settings.metadata_cache_control},
+        )
+
+    try:
+        deadline = data_repo.get_deadline(request.data_source, request_timeout)
+        memory = await data_repo.estimate_memory(
+            request.data_source, object_name=request.object_name
+        )
+        async with admission.admit(request.data_source.id, memory, deadline):
+            object_stats = await data_repo.get_object_stats(
+                request.data_source, request.object_name, deadline=deadline
+            )
+    except DataRepositoryError as e:
+        logger.error(
+            f'Не удалось получить статистики объекта {request.object_name} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(status_code=400, detail=f'{e}')
+    except DeadlineExceeded as e:
+        logger.error(
+            f'Прервано вычисление статистик объекта {request.object_name} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(status_code=504, detail=f'{e}')
+    except AdmissionRejected as e:
+        logger.warning(
+            f'Отклонен запрос статистик объекта {request.object_name} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(
+            status_code=503,
+            detail=f'{e}',
+            headers={'Retry-After': f'{e.retry_after:g}'},
+        )
+    except Exception as e:
+        logger.exception(
+            f'Ошибка получения статистик объекта {request.object_name} из источника id={request.data_source.id}'
+        )
+        raise HTTPException(status_code=500, detail=f'{e}')
+
+    if etag is not None:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = settings.metadata_cache_control
+
+    logger.debug(
+        f'Ответ на запрос /data-source/object-stats:\n{object_stats.model_dump_json(indent=2)}'
+    )
+
+    return object_stats
@@ -3,12 +3,19 @@ from typing import Annotated
 import logging
 import json
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Response
 
 from aw_connector_example.dto import ObjectListRequest, DataSourceObject
 from aw_connector_example.routers.data_source import router
 from aw_connector_example.services.repo import DataRepository, DataRepositoryError
-from aw_connector_example.dependencies import get_data_repository, get_logger
+from aw_connector_example.services.etag import make_etag, etag_matches
+from aw_connector_example.settings import Settings
+from aw_connector_example.dependencies import (
+    get_data_repository,
+    get_if_none_match,
+    get_logger,
+    get_settings,
+)
 
 
 @router.post(
@@ -21,30 +28,44 @@ from aw_connector_example.dependencies import get_data_repository, get_logger
             'description': '',
             'content': {
                 'application/json': {
-                    "examples": {
-                        "В плоском виде (flat: true)": {
+                    'examples': {
+                        'В плоском виде (flat: true)': {
                             'value': [
-                                {'schema': 'public', 'name': 'products', 'type': 'table'}, 
-                                {'schema': 'public', 'name': 'product_sales', 'type': 'table'}, 
-                                {'schema': 'work', 'name': 'staff', 'type': 'table'}, 
+                                {
+                                    'schema': 'public',
+                                    'name': 'products',
+                                    'type': 'table',
+                                },
+                                {
+                                    'schema': 'public',
+                                    'name': 'product_sales',
+                                    'type': 'table',
+                                },
+                                {'schema': 'work', 'name': 'staff', 'type': 'table'},
                             ],
                         },
-                        "В иерархическом виде (flat: false)": {
+                        'В иерархическом виде (flat: false)': {
                             'value': {
                                 'public': ['products', 'product_sales'],
-                                'work': ['staff']
+                                'work': ['staff'],
                             },
                         },
                     }
                 }
-            }
-        }
-    }
+            },
+        },
+        304: {
+            'description': 'Список объектов не изменился (ETag совпадает с If-None-Match)'
+        },
+    },
 )
 async def objects(
     request: ObjectListRequest,
     data_repo: Annotated[DataRepository, Depends(get_data_repository)],
     logger: Annotated[logging.Logger, Depends(get_logger)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    if_none_match: Annotated[str | None, Depends(get_if_none_match)],
+    response: Response,
 ):
     """
     Возвращает список объектов в источнике. 
@@ -74,8 +95,28 @@ async def objects(
       "схема 2": ["таблица 3"]
     }
     ```
+
+    В ответе возвращается заголовок ETag, который меняется при изменении списка объектов. Если ETag
+    передан в заголовке If-None-Match повторного запроса, и список не изменился, то возвращается HTTP 304
+    без тела ответа.
     """
     logger.debug(f'Запрос списка объектов из источника /data-source/objects:\n{request.model_dump_json(indent=2)}')
+
+    try:
+        etag = make_etag(
+            request.model_dump_json(),
+            await data_repo.get_version(request.data_source),
+        )
+    except Exception:
+        # версию данных определить не удалось, ответ возвращается без ETag
+        etag = None
+
+    if etag is not None and etag_matches(if_none_match, etag):
+        # данные не изменились, ответ у клиента актуален
+        return Response(
+            status_code=304,
+            headers={'ETag': etag, 'Cache-Control': settings.metadata_cache_control},
+        )
     try:
         data_source_objects = await data_repo.get_objects(
             request.data_source, query_string=request.query_string
@@ -87,6 +128,10 @@ async def objects(
         logger.exception(f'Ошибка получения списка объектов источника id={request.data_source.id}')
         raise HTTPException(status_code=500, detail=f'{e}')
 
+    if etag is not None:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = settings.metadata_cache_control
+
     if request.flat is None or request.flat:
         logger.debug(f'Ответ на запрос /data-source/objects:\n{json.dumps([o.model_dump(by_alias=True) for o in data_source_objects], indent=2, ensure_ascii=False)}')
         return data_source_objects
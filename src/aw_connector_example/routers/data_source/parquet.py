@@ -1,26 +1,39 @@
-from typing import Annotated
+from typing import Annotated, TYPE_CHECKING
 import logging
 import uuid
 import asyncio
-from urllib.parse import urlparse
 
 from fastapi import Depends, Body, Path, HTTPException, BackgroundTasks, Response
-from s3fs import S3FileSystem
 
 from aw_connector_example.dto import ParquetRequest
 from aw_connector_example.services.repo import DataRepository, DataRepositoryError
 from aw_connector_example.services.parquet import ParquetService
 from aw_connector_example.services.parquet_queue import ParquetQueue
+from aw_connector_example.services.watermark import Watermark, WatermarkStore
+from aw_connector_example.services.fingerprint import FingerprintStore
+from aw_connector_example.services.deadline import Deadline, DeadlineExceeded
+from aw_connector_example.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
 from aw_connector_example.settings import Settings
 from aw_connector_example.dependencies import (
     get_data_repository,
     get_parquet_service,
     get_parquet_queue_service,
+    get_watermark_store,
+    get_fingerprint_store,
     get_logger,
     get_settings,
+    get_s3_filesystem,
+    get_request_timeout,
+    get_admission,
 )
 from aw_connector_example.routers.data_source import router
 
+if TYPE_CHECKING:
+    from s3fs import S3FileSystem
+
 
 @router.post(
     path='/parquet',
@@ -43,8 +56,12 @@ async def parquet(
     data_repo: Annotated[DataRepository, Depends(get_data_repository)],
     parquet_service: Annotated[ParquetService, Depends(get_parquet_service)],
     parquet_queue: Annotated[ParquetQueue, Depends(get_parquet_queue_service)],
+    watermark_store: Annotated[WatermarkStore, Depends(get_watermark_store)],
+    fingerprint_store: Annotated[FingerprintStore, Depends(get_fingerprint_store)],
     logger: Annotated[logging.Logger, Depends(get_logger)],
     settings: Annotated[Settings, Depends(get_settings)],
+    request_timeout: Annotated[str | None, Depends(get_request_timeout)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
     background_tasks: BackgroundTasks,
     response: Response,
 ):
@@ -65,97 +82,47 @@ async def parquet(
         f'Запрос на выгрузку данных в parquet /data-source/parquet:\n{request.model_dump_json(indent=2)}'
     )
 
-    async def export_to_parquet():
-        if request.object.type == 'sql':
-            if not request.object.query_text:
-                raise Exception(
-                    'Для объекта с типом sql не указан текст sql-запроса (параметр query_text)'
-                )
-
-            object_data = await data_repo.get_sql_data(
-                data_source=request.object.data_source,
-                sql_text=request.object.query_text,
-                offset=0,
-                limit=request.limit,
-                filters=request.filters,
-            )
-        else:
-            object_data = await data_repo.get_object_data(
-                data_source=request.object.data_source,
-                object_name=request.object.name,
-                offset=0,
-                limit=request.limit,
-                filters=request.filters,
-            )
-
-        parquet_table = await parquet_service.read_table(object_data)
-
-        if request.object.fields:
-            # указан явный список столбцов, оставляем в таблице для выгрузки только их
-            parquet_table = parquet_table.drop_columns(
-                {c for c in parquet_table.column_names}
-                - {f.name for f in request.object.fields}
-            )
-
-        if request.folder.startswith('s3://'):
-            # Выгрузка в S3
-            s3_parsed_url = urlparse(settings.etl_s3_url)
-
-            s3fs = S3FileSystem(
-                endpoint_url=f'{s3_parsed_url.scheme}://{s3_parsed_url.hostname}:{s3_parsed_url.port}',
-                key=s3_parsed_url.username,
-                secret=s3_parsed_url.password,
-                use_ssl=s3_parsed_url.scheme == 'https',
-            )
-
-            s3_path = settings.etl_s3_bucket + '/' + request.folder.lstrip('s3://')
-
-            try:
-                await parquet_service.write_table_s3(
-                    table=parquet_table,
-                    s3_path=s3_path,
-                    s3fs=s3fs,
-                )
-            except Exception as e:
-                logger.exception(
-                    f'Ошибка выгрузки данных в S3 для {request.object.name} из источника id={request.object.data_source.id}'
-                )
-                raise Exception(
-                    f'Не удалось выгрузить данные для {request.object.name}: {e}'
-                )
-        else:
-            # Выгрузка в файловую систему
-            fs_path = f'/file_storage/{request.folder}'
-
-            try:
-                await parquet_service.write_table_fs(
-                    table=parquet_table,
-                    fs_path=fs_path,
-                )
-            except Exception as e:
-                logger.exception(
-                    f'Ошибка выгрузки данных в файловую систему для {request.object.name} из источника id={request.object.data_source.id}'
-                )
-                raise Exception(
-                    f'Не удалось выгрузить данные для {request.object.name}: {e}'
-                )
-
-    async def export_parquet_background(task_id: str):
+    async def export_parquet_background(task_id: str, deadline: Deadline | None):
         """ """
         await asyncio.sleep(2)
+        await parquet_queue.run_task(task_id)
         try:
-            await export_to_parquet()
+            # срок мог истечь, пока задача ожидала запуска: тогда выгрузку не начинаем
+            if deadline is not None:
+                deadline.check()
+            async with admission.admit(
+                request.object.data_source.id,
+                await estimate_export_memory(request, data_repo),
+                deadline,
+            ):
+                await export_to_parquet(
+                    request,
+                    data_repo,
+                    parquet_service,
+                    watermark_store,
+                    fingerprint_store,
+                    settings,
+                    logger,
+                    deadline,
+                )
         except Exception as e:
             await parquet_queue.error_task(task_id, error=f'{e}')
         else:
             await parquet_queue.finish_task(task_id)
 
+    try:
+        deadline = data_repo.get_deadline(request.object.data_source, request_timeout)
+    except DataRepositoryError as e:
+        raise HTTPException(status_code=400, detail=f'{e}')
+
     if request.object.data_source.extra and 'async' in request.object.data_source.extra:
         # запускаем задачу выгрузки данных в фоновом режиме
         task_id = uuid.uuid4().hex
 
         await parquet_queue.start_task(task_id)
-        background_tasks.add_task(export_parquet_background, task_id=task_id)
+        background_tasks.add_task(
+            export_parquet_background, task_id=task_id, deadline=deadline
+        )
 
         response.headers['Location'] = f'data-source/parquet/queue/{task_id}'
         response.headers['Retry-After'] = '0.5'
@@ -163,7 +130,31 @@ async def parquet(
 
     else:
         try:
-            await export_to_parquet()
+            async with admission.admit(
+                request.object.data_source.id,
+                await estimate_export_memory(request, data_repo),
+                deadline,
+            ):
+                await export_to_parquet(
+                    request,
+                    data_repo,
+                    parquet_service,
+                    watermark_store,
+                    fingerprint_store,
+                    settings,
+                    logger,
+                    deadline,
+                )
+        except DeadlineExceeded as e:
+            logger.error(f'Прервана выгрузка данных в parquet: {e}')
+            raise HTTPException(status_code=504, detail=f'{e}')
+        except AdmissionRejected as e:
+            logger.warning(f'Отклонен запрос на выгрузку данных в parquet: {e}')
+            raise HTTPException(
+                status_code=503,
+                detail=f'{e}',
+                headers={'Retry-After': f'{e.retry_after:g}'},
+            )
         except Exception as e:
             logger.exception('Ошибка выгрузки данных в parquet')
             raise HTTPException(status_code=500, detail=f'{e}')
@@ -196,7 +187,7 @@ async def parquet_queue(
     """
     task_status = await parquet_queue.get_task_status(task_id)
 
-    if task_status == 'started':
+    if task_status in ('started', 'running'):
         response.headers['Location'] = f'data-source/parquet/queue/{task_id}'
         response.headers['Retry-After'] = '0.5'
         response.status_code = 202
@@ -213,3 +204,325 @@ async def parquet_queue(
             logger.exception(f'Не удалось очистить информацию по задаче {task_id}')
 
     return
+
+
+async def export_to_parquet(
+    request: ParquetRequest,
+    data_repo: DataRepository,
+    parquet_service: ParquetService,
+    watermark_store: WatermarkStore,
+    fingerprint_store: FingerprintStore,
+    settings: Settings,
+    logger: logging.Logger,
+    deadline: Deadline | None,
+):
+    """
+    Выгружает данные объекта источника (или SQL-запроса к источнику) в parquet.
+
+    Если отпечаток выгрузки (параметры запроса и содержимое файлов таблиц) совпадает
+    с отпечатком прошлой выгрузки в эту же папку, и все файлы прошлой выгрузки
+    на месте, то данные не выгружаются повторно
+    """
+    if not settings.parquet_skip_unchanged or (
+        request.object.type == 'sql' and not request.object.query_text
+    ):
+        await export_object(
+            request,
+            data_repo,
+            parquet_service,
+            watermark_store,
+            settings,
+            logger,
+            deadline,
+        )
+        return
+
+    folder, filesystem = get_export_folder(request, settings)
+    fingerprint_key = fingerprint_store.get_key(request)
+    async with fingerprint_store.lock(fingerprint_key):
+        previous = await fingerprint_store.get(fingerprint_key)
+        fingerprint = await fingerprint_store.build(
+            request,
+            await data_repo.get_table_paths(
+                request.object.data_source,
+                object_name=request.object.name,
+                sql_text=(
+                    request.object.query_text if request.object.type == 'sql' else None
+                ),
+            ),
+            previous,
+            storage=data_repo.storage,
+        )
+
+        if previous is not None and previous.matches(fingerprint):
+            files = await parquet_service.list_dataset(folder, filesystem)
+            if all(files.get(path) == size for path, size in previous.files.items()):
+                logger.info(
+                    f'Данные {request.object.name} из источника id={request.object.data_source.id} '
+                    f'не изменились с прошлой выгрузки в {request.folder}, выгрузка пропущена'
+                )
+                # сохраняются новые версии файлов таблиц, чтобы не считать их хэши заново
+                fingerprint.files = previous.files
+                await fingerprint_store.put(fingerprint_key, fingerprint)
+                return
+
+        await export_object(
+            request,
+            data_repo,
+            parquet_service,
+            watermark_store,
+            settings,
+            logger,
+            deadline,
+        )
+
+        # отпечаток сохраняется только после успешной выгрузки
+        fingerprint.files = await parquet_service.list_dataset(folder, filesystem)
+        await fingerprint_store.put(fingerprint_key, fingerprint)
+
+
+async def export_object(
+    request: ParquetRequest,
+    data_repo: DataRepository,
+    parquet_service: ParquetService,
+    watermark_store: WatermarkStore,
+    settings: Settings,
+    logger: logging.Logger,
+    deadline: Deadline | None,
+):
+    """
+    Выгружает данные в parquet. Если указан столбец инкрементальной выгрузки,
+    то выгружаются только новые строки
+    """
+    incremental_column = watermark_store.get_column(request)
+    if not incremental_column:
+        await write_parquet(
+            request, data_repo, parquet_service, settings, logger, deadline
+        )
+        return
+
+    # инкрементальная выгрузка: выгружаются только строки, в которых значение
+    # incremental_column больше отметки прошлой выгрузки в эту же папку
+    watermark_key = watermark_store.get_key(request)
+    async with watermark_store.lock(watermark_key):
+        watermark = await watermark_store.get(watermark_key)
+        if watermark is not None and watermark.column != incremental_column:
+            # столбец изменился, выгружаем все строки заново
+            watermark = None
+
+        watermark_value = await write_parquet(
+            request,
+            data_repo,
+            parquet_service,
+            settings,
+            logger,
+            deadline,
+            incremental_column,
+            watermark,
+        )
+
+        # отметка сохраняется только после успешной записи данных
+        if watermark_value is not None:
+            await watermark_store.put(
+                watermark_key,
+                Watermark(
+                    column=incremental_column,
+                    value=watermark_store.to_json_value(watermark_value),
+                ),
+            )
+
+
+async def write_parquet(
+    request: ParquetRequest,
+    data_repo: DataRepository,
+    parquet_service: ParquetService,
+    settings: Settings,
+    logger: logging.Logger,
+    deadline: Deadline | None,
+    incremental_column: str | None = None,
+    watermark: Watermark | None = None,
+):
+    """
+    Выгружает данные в новый parquet-файл. При инкрементальной выгрузке
+    возвращает максимальное значение incremental_column среди выгруженных строк
+    """
+    # указан явный список столбцов, читаем из источника только их
+    columns = [f.name for f in request.object.fields] if request.object.fields else None
+    filters = list(request.filters or [])
+
+    # столбец отметки читается, даже если его нет среди выгружаемых столбцов
+    extra_column = None
+    order_by = None
+    if incremental_column:
+        if columns is not None and incremental_column not in columns:
+            extra_column = incremental_column
+            columns = [*columns, extra_column]
+        if request.limit is not None:
+            # при ограничении количества строк выгружаются самые ранние строки,
+            # чтобы следующая выгрузка продолжила с отметки без пропусков
+            order_by = incremental_column
+
+    if request.object.type == 'sql':
+        if not request.object.query_text:
+            raise Exception(
+                'Для объекта с типом sql не указан текст sql-запроса (параметр query_text)'
+            )
+
+        streaming = await data_repo.use_streaming(
+            request.object.data_source, sql_text=request.object.query_text
+        )
+        query = await data_repo.query_sql(
+            data_source=request.object.data_source,
+            sql_text=request.object.query_text,
+            offset=0,
+            limit=request.limit,
+            filters=filters or None,
+            columns=columns,
+            deadline=deadline,
+            streaming=streaming,
+            order_by=order_by,
+            watermark=watermark,
+        )
+    else:
+        streaming = await data_repo.use_streaming(
+            request.object.data_source,
+            object_name=request.object.name,
+            filters=filters or None,
+        )
+        query = await data_repo.query_object(
+            data_source=request.object.data_source,
+            object_name=request.object.name,
+            offset=0,
+            limit=request.limit,
+            filters=filters or None,
+            columns=columns,
+            deadline=deadline,
+            streaming=streaming,
+            order_by=order_by,
+            watermark=watermark,
+        )
+
+    watermark_value = None
+    # отметка при потоковом выполнении (см. ниже)
+    watermark_column, drop_columns = None, None
+    if streaming:
+        # большой результат не материализуется в памяти: запрос выполняется
+        # потоковым движком при записи в parquet, а отметка определяется
+        # по записанным строкам, без повторного выполнения запроса
+        if incremental_column:
+            if incremental_column not in query.collect_schema():
+                raise DataRepositoryError(
+                    f'Столбец {incremental_column} не найден в данных объекта'
+                )
+            watermark_column = incremental_column
+        if extra_column:
+            drop_columns = [extra_column]
+        parquet_table = query
+    else:
+        object_frame = await data_repo.collect(query, deadline=deadline)
+        if incremental_column:
+            watermark_value = await data_repo.get_column_max(
+                object_frame, incremental_column
+            )
+        if extra_column:
+            object_frame = object_frame.drop(extra_column)
+        parquet_table = await parquet_service.read_table(object_frame)
+
+        if incremental_column and watermark_value is None:
+            log_no_new_rows(request, logger)
+            return None
+
+    if deadline is not None:
+        deadline.check()
+
+    if request.folder.startswith('s3://'):
+        # Выгрузка в S3
+        s3_path, s3fs = get_export_folder(request, settings)
+
+        try:
+            written_watermark = await parquet_service.write_table_s3(
+                table=parquet_table,
+                s3_path=s3_path,
+                s3fs=s3fs,
+                deadline=deadline,
+                options=request.writer_options,
+                watermark_column=watermark_column,
+                drop_columns=drop_columns,
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.exception(
+                f'Ошибка выгрузки данных в S3 для {request.object.name} из источника id={request.object.data_source.id}'
+            )
+            raise Exception(
+                f'Не удалось выгрузить данные для {request.object.name}: {e}'
+            )
+    else:
+        # Выгрузка в файловую систему
+        fs_path, _ = get_export_folder(request, settings)
+
+        try:
+            written_watermark = await parquet_service.write_table_fs(
+                table=parquet_table,
+                fs_path=fs_path,
+                deadline=deadline,
+                options=request.writer_options,
+                watermark_column=watermark_column,
+                drop_columns=drop_columns,
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.exception(
+                f'Ошибка выгрузки данных в файловую систему для {request.object.name} из источника id={request.object.data_source.id}'
+            )
+            raise Exception(
+                f'Не удалось выгрузить данные для {request.object.name}: {e}'
+            )
+
+    if watermark_column is not None:
+        watermark_value = written_watermark
+        if watermark_value is None:
+            # файл без строк не записан
+            log_no_new_rows(request, logger)
+
+    return watermark_value
+
+
+def log_no_new_rows(request: ParquetRequest, logger: logging.Logger):
+    logger.info(
+        f'Нет новых строк для инкрементальной выгрузки {request.object.name} из источника id={request.object.data_source.id}'
+    )
+
+
+def get_export_folder(
+    request: ParquetRequest, settings: Settings
+) -> tuple[str, 'S3FileSystem | None']:
+    """
+    Возвращает путь к папке выгрузки и файловую систему S3 (или None при выгрузке
+    в файловую систему)
+    """
+    if request.folder.startswith('s3://'):
+        s3_path = settings.etl_s3_bucket + '/' + request.folder.lstrip('s3://')
+        return s3_path, get_s3_filesystem(settings)
+
+    return f'/file_storage/{request.folder}', None
+
+
+async def estimate_export_memory(
+    request: ParquetRequest, data_repo: DataRepository
+) -> int:
+    """
+    Оценка памяти для выгрузки (для ограничения одновременных выгрузок)
+    """
+    data_source = request.object.data_source
+    if request.object.type != 'sql':
+        return await data_repo.estimate_memory(
+            data_source, object_name=request.object.name, filters=request.filters
+        )
+    if request.object.query_text:
+        return await data_repo.estimate_memory(
+            data_source, sql_text=request.object.query_text
+        )
+    return 0
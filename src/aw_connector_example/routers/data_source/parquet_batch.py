@@ -0,0 +1,220 @@
+from typing import Annotated
+import logging
+import uuid
+import asyncio
+
+from fastapi import Depends, Body, Path, HTTPException, BackgroundTasks, Response
+
+from aw_connector_example.dto import (
+    ParquetRequest,
+    ParquetBatchRequest,
+    ParquetBatchObjectStatus,
+    ParquetBatchStatus,
+)
+from aw_connector_example.services.repo import DataRepository, DataRepositoryError
+from aw_connector_example.services.parquet import ParquetService
+from aw_connector_example.services.parquet_queue import ParquetQueue
+from aw_connector_example.services.watermark import WatermarkStore
+from aw_connector_example.services.fingerprint import FingerprintStore
+from aw_connector_example.services.deadline import Deadline
+from aw_connector_example.services.admission import AdmissionController
+from aw_connector_example.settings import Settings
+from aw_connector_example.dependencies import (
+    get_data_repository,
+    get_parquet_service,
+    get_parquet_queue_service,
+    get_watermark_store,
+    get_fingerprint_store,
+    get_logger,
+    get_settings,
+    get_request_timeout,
+    get_admission,
+)
+from aw_connector_example.routers.data_source import router
+from aw_connector_example.routers.data_source.parquet import (
+    export_to_parquet,
+    estimate_export_memory,
+)
+
+
+@router.post(
+    path='/parquet/batch',
+    summary='Пакетная выгрузка данных нескольких объектов в parquet',
+    tags=['async'],
+    status_code=202,
+    response_model=ParquetBatchStatus,
+    responses={
+        202: {
+            'description': 'Выгрузка начата. Состояние выгрузки каждого объекта можно получить по URL из Location '
+            'через Retry-After секунд (Retry-After и Location указываются в заголовках ответа)',
+        },
+    },
+)
+async def parquet_batch(
+    request: Annotated[ParquetBatchRequest, Body()],
+    data_repo: Annotated[DataRepository, Depends(get_data_repository)],
+    parquet_service: Annotated[ParquetService, Depends(get_parquet_service)],
+    parquet_queue: Annotated[ParquetQueue, Depends(get_parquet_queue_service)],
+    watermark_store: Annotated[WatermarkStore, Depends(get_watermark_store)],
+    fingerprint_store: Annotated[FingerprintStore, Depends(get_fingerprint_store)],
+    logger: Annotated[logging.Logger, Depends(get_logger)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    request_timeout: Annotated[str | None, Depends(get_request_timeout)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+    background_tasks: BackgroundTasks,
+    response: Response,
+):
+    """
+    Выгружает данные нескольких объектов источника (например, всех объектов модели AW BI)
+    в parquet одной задачей.
+
+    Таблицы источника загружаются один раз для всех объектов пакета (в том числе
+    для SQL-объектов, которые к ним обращаются). Объекты выгружаются параллельно,
+    начиная с самых больших, поэтому общее время выгрузки близко ко времени выгрузки
+    самого большого объекта, а не к сумме времени всех выгрузок.
+
+    Выгрузка всегда выполняется в фоновом режиме: в ответе возвращается HTTP 202,
+    а в заголовках указываются:
+    * Location: URL, по которому можно получить состояние выгрузки каждого объекта;
+    * Retry-After: cделать запрос по URL из Location через столько секунд.
+    """
+    logger.debug(
+        f'Запрос на пакетную выгрузку данных в parquet /data-source/parquet/batch:\n{request.model_dump_json(indent=2)}'
+    )
+
+    async def export_batch(batch_id: str, deadlines: list[Deadline | None]):
+        """ """
+        # списки объектов и таблицы источника загружаются один раз для всего пакета
+        batch_repo = data_repo.share_loads()
+
+        async def estimate(export: ParquetRequest) -> int:
+            try:
+                return await estimate_export_memory(export, batch_repo)
+            except Exception:
+                # ошибка будет получена и записана при выгрузке объекта
+                return 0
+
+        memory = await asyncio.gather(*(estimate(e) for e in request.exports))
+        semaphore = asyncio.Semaphore(
+            request.max_parallel or settings.parquet_batch_max_parallel
+        )
+
+        async def export_object(index: int):
+            export = request.exports[index]
+            deadline = deadlines[index]
+            task_id = parquet_queue.get_batch_task_id(batch_id, index)
+
+            async with semaphore:
+                await parquet_queue.run_task(task_id)
+                try:
+                    if deadline is not None:
+                        deadline.check()
+                    async with admission.admit(
+                        export.object.data_source.id, memory[index], deadline
+                    ):
+                        await export_to_parquet(
+                            export,
+                            batch_repo,
+                            parquet_service,
+                            watermark_store,
+                            fingerprint_store,
+                            settings,
+                            logger,
+                            deadline,
+                        )
+                except Exception as e:
+                    logger.error(
+                        f'Ошибка выгрузки {export.object.name} в пакете {batch_id}: {e}'
+                    )
+                    await parquet_queue.error_task(task_id, error=f'{e}')
+                else:
+                    await parquet_queue.finish_task(task_id)
+
+        # самые большие объекты запускаются первыми, чтобы в конце пакета
+        # не выгружался один большой объект
+        order = sorted(range(len(request.exports)), key=lambda i: -memory[i])
+        await asyncio.gather(*(export_object(i) for i in order))
+
+    try:
+        deadlines = [
+            data_repo.get_deadline(export.object.data_source, request_timeout)
+            for export in request.exports
+        ]
+    except DataRepositoryError as e:
+        raise HTTPException(status_code=400, detail=f'{e}')
+
+    batch_id = uuid.uuid4().hex
+    objects = [
+        {'name': export.object.name, 'folder': export.folder}
+        for export in request.exports
+    ]
+    await parquet_queue.start_batch(batch_id, objects)
+    background_tasks.add_task(export_batch, batch_id=batch_id, deadlines=deadlines)
+
+    response.headers['Location'] = f'data-source/parquet/batch/{batch_id}'
+    response.headers['Retry-After'] = '0.5'
+
+    return ParquetBatchStatus(
+        status='running',
+        objects=[ParquetBatchObjectStatus(**o, status='started') for o in objects],
+    )
+
+
+@router.get(
+    path='/parquet/batch/{batch_id}',
+    summary='Состояние пакетной выгрузки данных в parquet',
+    tags=['async'],
+    response_model=ParquetBatchStatus,
+    responses={
+        202: {'description': 'Выгрузка еще не завершена'},
+        404: {'description': 'Пакетная выгрузка не найдена'},
+    },
+)
+async def parquet_batch_status(
+    batch_id: Annotated[str, Path()],
+    parquet_queue: Annotated[ParquetQueue, Depends(get_parquet_queue_service)],
+    logger: Annotated[logging.Logger, Depends(get_logger)],
+    response: Response,
+):
+    """
+    Возвращает состояние выгрузки каждого объекта пакета.
+
+    Если выгрузка ещё не завершена, то возвращается HTTP 202 и в заголовках ответа указывается:
+    * Location: URL, по которому нужно проверить состояние выгрузки в следующий раз;
+    * Retry-After: cделать запрос по URL из Location через столько секунд.
+
+    Если выгрузка всех объектов завершена, то возвращается HTTP 200 (статус пакета error,
+    если хотя бы один объект не выгружен), и информация о пакете удаляется.
+    """
+    objects = await parquet_queue.get_batch(batch_id)
+    if objects is None:
+        raise HTTPException(
+            status_code=404, detail=f'Пакетная выгрузка {batch_id} не найдена'
+        )
+
+    statuses = []
+    for index, o in enumerate(objects):
+        task_status = await parquet_queue.get_task_status(
+            parquet_queue.get_batch_task_id(batch_id, index)
+        )
+        error = None
+        if task_status.startswith('error'):
+            task_status, error = 'error', task_status.removeprefix('error: ')
+        statuses.append(ParquetBatchObjectStatus(**o, status=task_status, error=error))
+
+    if any(s.status in ('started', 'running') for s in statuses):
+        response.headers['Location'] = f'data-source/parquet/batch/{batch_id}'
+        response.headers['Retry-After'] = '0.5'
+        response.status_code = 202
+        return ParquetBatchStatus(status='running', objects=statuses)
+
+    # почистим за собой
+    try:
+        await parquet_queue.clear_batch(batch_id)
+    except Exception:
+        logger.exception(f'Не удалось очистить информацию по пакету {batch_id}')
+
+    return ParquetBatchStatus(
+        status='error' if any(s.status == 'error' for s in statuses) else 'finished',
+        objects=statuses,
+    )
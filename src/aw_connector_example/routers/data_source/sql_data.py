@@ -5,7 +5,17 @@ from fastapi import Depends, HTTPException, Body
 
 from aw_connector_example.dto import SqlDataRequest, ObjectData
 from aw_connector_example.services.repo import DataRepository, DataRepositoryError
-from aw_connector_example.dependencies import get_data_repository, get_logger
+from aw_connector_example.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+from aw_connector_example.services.deadline import DeadlineExceeded
+from aw_connector_example.dependencies import (
+    get_admission,
+    get_data_repository,
+    get_logger,
+    get_request_timeout,
+)
 from aw_connector_example.routers.data_source import router
 
 
@@ -19,6 +29,8 @@ async def sql_data(
     request: Annotated[SqlDataRequest, Body()],
     repo: Annotated[DataRepository, Depends(get_data_repository)],
     logger: Annotated[logging.Logger, Depends(get_logger)],
+    request_timeout: Annotated[str | None, Depends(get_request_timeout)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
 ):
     """ 
     Предварительный просмотр (preview) данных SQL-запроса к источнику.
@@ -32,17 +44,37 @@ async def sql_data(
         limit, offset = request.page_size, (request.page - 1) * request.page_size
 
     try:
-        rows = await repo.get_sql_data(
-            data_source=request.data_source,
-            sql_text=request.sql_text,
-            limit=limit,
-            offset=offset,
+        deadline = repo.get_deadline(request.data_source, request_timeout)
+        memory = await repo.estimate_memory(
+            request.data_source, sql_text=request.sql_text
         )
+        async with admission.admit(request.data_source.id, memory, deadline):
+            rows = await repo.get_sql_data(
+                data_source=request.data_source,
+                sql_text=request.sql_text,
+                limit=limit,
+                offset=offset,
+                deadline=deadline,
+            )
     except DataRepositoryError as e:
         logger.error(
             f'Не удалось получить данные SQL запроса {request.sql_text} из источника id={request.data_source.id}: {e}'
         )
         raise HTTPException(status_code=400, detail=f'{e}')
+    except DeadlineExceeded as e:
+        logger.error(
+            f'Прервано получение данных SQL запроса {request.sql_text} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(status_code=504, detail=f'{e}')
+    except AdmissionRejected as e:
+        logger.warning(
+            f'Отклонен запрос данных SQL запроса {request.sql_text} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(
+            status_code=503,
+            detail=f'{e}',
+            headers={'Retry-After': f'{e.retry_after:g}'},
+        )
     except Exception as e:
         logger.exception(
             f'Ошибка получения данных SQL запроса {request.sql_text} из источника id={request.data_source.id}'
@@ -1,11 +1,25 @@
 from typing import Annotated
 import logging
 
-from fastapi import Depends, HTTPException, Body
+from fastapi import Depends, HTTPException, Body, Response
 
 from aw_connector_example.dto import SqlMetaRequest, ObjectMeta
 from aw_connector_example.services.repo import DataRepository, DataRepositoryError
-from aw_connector_example.dependencies import get_data_repository, get_logger
+from aw_connector_example.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+from aw_connector_example.services.deadline import DeadlineExceeded
+from aw_connector_example.services.etag import make_etag, etag_matches
+from aw_connector_example.settings import Settings
+from aw_connector_example.dependencies import (
+    get_admission,
+    get_data_repository,
+    get_if_none_match,
+    get_logger,
+    get_request_timeout,
+    get_settings,
+)
 from aw_connector_example.routers.data_source import router
 
 
@@ -14,34 +28,89 @@ from aw_connector_example.routers.data_source import router
     summary='Метаданные SQL запросу к источнику',
     tags=['data source'],
     response_model=ObjectMeta,
+    responses={
+        304: {
+            'description': 'Метаданные не изменились (ETag совпадает с If-None-Match)'
+        },
+    },
 )
 async def sql_meta(
     request: Annotated[SqlMetaRequest, Body()],
     repo: Annotated[DataRepository, Depends(get_data_repository)],
     logger: Annotated[logging.Logger, Depends(get_logger)],
+    request_timeout: Annotated[str | None, Depends(get_request_timeout)],
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    if_none_match: Annotated[str | None, Depends(get_if_none_match)],
+    response: Response,
 ):
     """
     Возвращает метаданные результата выполнения SQL запроса к объектам источника: список столбцов и их типы.
+
+    В ответе возвращается заголовок ETag, который меняется при изменении файлов таблиц из запроса. Если ETag
+    передан в заголовке If-None-Match повторного запроса, и таблицы не изменились, то возвращается HTTP 304
+    без тела ответа.
     """
     logger.debug(
         f'Запрос метаданных SQL запроса /data-source/sql-meta:\n{request.model_dump_json(indent=2)}'
     )
 
     try:
-        sql_meta = await repo.get_sql_meta(
-            data_source=request.data_source, sql_text=request.sql_text
+        etag = make_etag(
+            request.model_dump_json(),
+            await repo.get_version(request.data_source, sql_text=request.sql_text),
         )
+    except Exception:
+        # версию данных определить не удалось, ответ возвращается без ETag
+        etag = None
+
+    if etag is not None and etag_matches(if_none_match, etag):
+        # данные не изменились, ответ у клиента актуален
+        return Response(
+            status_code=304,
+            headers={'ETag': etag, 'Cache-Control': settings.metadata_cache_control},
+        )
+
+    try:
+        deadline = repo.get_deadline(request.data_source, request_timeout)
+        memory = await repo.estimate_memory(
+            request.data_source, sql_text=request.sql_text
+        )
+        async with admission.admit(request.data_source.id, memory, deadline):
+            sql_meta = await repo.get_sql_meta(
+                data_source=request.data_source,
+                sql_text=request.sql_text,
+                deadline=deadline,
+            )
     except DataRepositoryError as e:
         logger.error(
             f'Не удалось получить метаданные SQL запроса {request.sql_text} из источника id={request.data_source.id}: {e}'
         )
         raise HTTPException(status_code=400, detail=f'{e}')
+    except DeadlineExceeded as e:
+        logger.error(
+            f'Прервано получение метаданных SQL запроса {request.sql_text} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(status_code=504, detail=f'{e}')
+    except AdmissionRejected as e:
+        logger.warning(
+            f'Отклонен запрос метаданных SQL запроса {request.sql_text} из источника id={request.data_source.id}: {e}'
+        )
+        raise HTTPException(
+            status_code=503,
+            detail=f'{e}',
+            headers={'Retry-After': f'{e.retry_after:g}'},
+        )
     except Exception as e:
         logger.exception(
             f'Ошибка получения метаданных SQL запроса {request.sql_text} из источника id={request.data_source.id}'
         )
         raise HTTPException(status_code=500, detail=f'{e}')
 
+    if etag is not None:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = settings.metadata_cache_control
+
     logger.debug(
         f'Ответ на запрос /data-source/sql-meta:\n{sql_meta.model_dump_json(indent=2)}'
     )
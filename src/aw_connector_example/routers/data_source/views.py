@@ -0,0 +1,123 @@
+from typing import Annotated
+import logging
+
+from fastapi import Depends, HTTPException, Body, BackgroundTasks
+
+from aw_connector_example.dto import (
+    MaterializedViewRequest,
+    MaterializedViewListRequest,
+    MaterializedViewDropRequest,
+    MaterializedViewInfo,
+)
+from aw_connector_example.services.repo import DataRepository, DataRepositoryError
+from aw_connector_example.services.views import ViewDefinition
+from aw_connector_example.dependencies import get_data_repository, get_logger
+from aw_connector_example.routers.data_source import router
+
+
+@router.post(
+    path='/views',
+    summary='Создание материализованного представления',
+    tags=['data source'],
+    response_model=MaterializedViewInfo,
+)
+async def create_view(
+    request: Annotated[MaterializedViewRequest, Body()],
+    repo: Annotated[DataRepository, Depends(get_data_repository)],
+    logger: Annotated[logging.Logger, Depends(get_logger)],
+    background_tasks: BackgroundTasks,
+):
+    """
+    Создает (или заменяет) материализованное представление - именованный SQL запрос
+    к таблицам источника.
+
+    Представление возвращается в списке объектов источника (`/data-source/objects`) с типом `view`,
+    и с ним можно работать как с таблицей. Результат запроса хранится на диске и пересчитывается
+    в фоне при изменении таблиц, к которым обращается запрос, поэтому тяжелый запрос выполняется
+    один раз на каждое изменение данных, а не при каждом запросе к объекту.
+
+    Запрос проверяется, но не выполняется: первый расчет представления запускается в фоне.
+    """
+    logger.debug(
+        f'Запрос на создание представления /data-source/views:\n{request.model_dump_json(indent=2)}'
+    )
+
+    view = ViewDefinition(
+        schema=request.schema_name, name=request.name, query_text=request.query_text
+    )
+
+    try:
+        await repo.register_view(request.data_source, view)
+    except DataRepositoryError as e:
+        logger.error(f'Не удалось создать представление {view.object_name}: {e}')
+        raise HTTPException(status_code=400, detail=f'{e}')
+    except Exception as e:
+        logger.exception(f'Ошибка создания представления {view.object_name}')
+        raise HTTPException(status_code=500, detail=f'{e}')
+
+    async def refresh_view():
+        try:
+            await repo.load_view(request.data_source, view)
+        except Exception as e:
+            logger.warning(
+                f'Не удалось рассчитать представление {view.object_name}: {e}'
+            )
+
+    background_tasks.add_task(refresh_view)
+
+    return MaterializedViewInfo(
+        schema=view.schema, name=view.name, query_text=view.query_text, fresh=False
+    )
+
+
+@router.post(
+    path='/views/list',
+    summary='Список материализованных представлений',
+    tags=['data source'],
+    response_model=list[MaterializedViewInfo],
+)
+async def list_views(
+    request: Annotated[MaterializedViewListRequest, Body()],
+    repo: Annotated[DataRepository, Depends(get_data_repository)],
+    logger: Annotated[logging.Logger, Depends(get_logger)],
+):
+    """
+    Возвращает материализованные представления источника: запрос, время последнего расчета
+    (refreshed_at) и признак того, что результат рассчитан по текущим данным таблиц (fresh).
+    """
+    try:
+        return await repo.get_views_info(request.data_source)
+    except DataRepositoryError as e:
+        logger.error(f'Не удалось получить список представлений: {e}')
+        raise HTTPException(status_code=400, detail=f'{e}')
+    except Exception as e:
+        logger.exception('Ошибка получения списка представлений')
+        raise HTTPException(status_code=500, detail=f'{e}')
+
+
+@router.post(
+    path='/views/drop',
+    summary='Удаление материализованного представления',
+    tags=['data source'],
+    responses={
+        200: {'description': '', 'content': {'application/json': {'example': {}}}},
+    },
+)
+async def drop_view(
+    request: Annotated[MaterializedViewDropRequest, Body()],
+    repo: Annotated[DataRepository, Depends(get_data_repository)],
+    logger: Annotated[logging.Logger, Depends(get_logger)],
+):
+    """
+    Удаляет материализованное представление и его сохраненный результат.
+    """
+    try:
+        await repo.drop_view(request.data_source, request.object_name)
+    except DataRepositoryError as e:
+        logger.error(f'Не удалось удалить представление {request.object_name}: {e}')
+        raise HTTPException(status_code=400, detail=f'{e}')
+    except Exception as e:
+        logger.exception(f'Ошибка удаления представления {request.object_name}')
+        raise HTTPException(status_code=500, detail=f'{e}')
+
+    return {}
@@ -1,13 +1,13 @@
 from typing import Annotated
-import logging
-from urllib.parse import urlparse
+from datetime import datetime, timezone
+import time
 
 from fastapi import Depends, HTTPException
-from s3fs import S3FileSystem
 
 from aw_connector_example.routers import router
 from aw_connector_example.settings import Settings
-from aw_connector_example.dependencies import get_settings, get_logger
+from aw_connector_example.services.health import HealthProber
+from aw_connector_example.dependencies import get_settings, get_health_prober
 
 
 @router.get(
@@ -17,7 +17,16 @@ from aw_connector_example.dependencies import get_settings, get_logger
     responses={
         200: {
             'description': '',
-            'content': {'application/json': {'example': {'success': True}}},
+            'content': {
+                'application/json': {
+                    'example': {
+                        'success': True,
+                        'checked_at': '2025-08-01T10:00:00.000000+00:00',
+                        'age': 2.5,
+                        'latency_ms': 12.3,
+                    }
+                }
+            },
         },
         400: {},
         422: {},
@@ -35,13 +44,18 @@ from aw_connector_example.dependencies import get_settings, get_logger
 )
 async def health(
     settings: Annotated[Settings, Depends(get_settings)],
-    logger: Annotated[logging.Logger, Depends(get_logger)],
+    health_prober: Annotated[HealthProber | None, Depends(get_health_prober)],
 ):
     """
     Проверяет работоспособность коннектора.
 
     Если с коннектором все хорошо и соединение к S3 хранилищу установлено успешно,
     то возвращается HTTP 200. Иначе HTTP 500.
+
+    Доступ к S3 хранилищу проверяется в фоне (раз в HEALTH_CHECK_INTERVAL секунд),
+    здесь возвращается результат последней проверки: время проверки (checked_at),
+    сколько секунд назад она выполнена (age) и длительность запроса к S3 (latency_ms).
+    Если результат старше HEALTH_CHECK_STALE_AFTER секунд, то возвращается HTTP 500.
     """
     if not settings.etl_s3_url:
         raise HTTPException(
@@ -52,24 +66,32 @@ async def health(
         raise HTTPException(
             status_code=500, detail='Не указана переменная окружения ETL_S3_BUCKET'
         )
-    
-    try:
-        s3_parsed_url = urlparse(settings.etl_s3_url)
 
-        s3fs = S3FileSystem(
-            endpoint_url=f'{s3_parsed_url.scheme}://{s3_parsed_url.hostname}:{s3_parsed_url.port}',
-            key=s3_parsed_url.username,
-            secret=s3_parsed_url.password,
-            use_ssl=s3_parsed_url.scheme == 'https',
+    state = health_prober.state if health_prober else None
+    if state is None:
+        raise HTTPException(
+            status_code=500,
+            detail='Проверка доступа к S3 хранилищу AW BI еще не выполнена',
         )
 
-        s3fs.ls(settings.etl_s3_bucket)
-    except Exception as e:
-        logger.exception(
-            f'Ошибка доступа к S3 хранилищу AW BI, s3 url: {settings.etl_s3_url}, bucket: {settings.etl_s3_bucket}'
+    age = time.time() - state.checked_at
+    if age > settings.health_check_stale_after:
+        raise HTTPException(
+            status_code=500,
+            detail=f'Результат проверки доступа к S3 хранилищу AW BI устарел: последняя проверка {age:.0f} с назад',
         )
+
+    if not state.ok:
         raise HTTPException(
-            status_code=500, detail=f'Ошибка доступа к S3 хранилищу AW BI: {e}'
+            status_code=500,
+            detail=f'Ошибка доступа к S3 хранилищу AW BI: {state.error}',
         )
 
-    return {'success': True}
+    return {
+        'success': True,
+        'checked_at': datetime.fromtimestamp(
+            state.checked_at, tz=timezone.utc
+        ).isoformat(),
+        'age': round(age, 3),
+        'latency_ms': round(state.latency_ms, 1),
+    }
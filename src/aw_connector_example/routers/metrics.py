@@ -0,0 +1,52 @@
+from typing import Annotated
+
+from fastapi import Depends
+
+from aw_connector_example.routers import router
+from aw_connector_example.services.compression import ResponseCompressor
+from aw_connector_example.dependencies import get_compressor
+
+
+@router.get(
+    path='/metrics',
+    summary='Метрики коннектора',
+    tags=['default'],
+    responses={
+        200: {
+            'description': '',
+            'content': {
+                'application/json': {
+                    'example': {
+                        'compression': {
+                            'encodings': {
+                                'gzip': {
+                                    'responses': 10,
+                                    'bytes_in': 5242880,
+                                    'bytes_out': 524288,
+                                    'cpu_seconds': 0.25,
+                                    'ratio': 10.0,
+                                    'cpu_ms_per_mb': 50.0,
+                                }
+                            },
+                            'skipped_small': 3,
+                        }
+                    }
+                }
+            },
+        },
+        400: {},
+        422: {},
+    },
+)
+async def metrics(
+    compressor: Annotated[ResponseCompressor | None, Depends(get_compressor)],
+):
+    """
+    Возвращает метрики процесса коннектора.
+
+    compression - статистика сжатия ответов по алгоритмам: количество сжатых ответов,
+    объем до и после сжатия (в байтах), степень сжатия (ratio) и процессорное время
+    сжатия (cpu_seconds и cpu_ms_per_mb - миллисекунды на 1 МБ исходных данных).
+    Если сжатие ответов отключено (COMPRESSION_ENCODINGS пустая), то compression = null
+    """
+    return {'compression': compressor.get_stats() if compressor else None}
@@ -0,0 +1,47 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException
+
+from aw_connector_example.routers import router
+from aw_connector_example.services.warmup import Warmup
+from aw_connector_example.dependencies import get_warmup
+
+
+@router.get(
+    path='/ready',
+    summary='Проверка готовности коннектора к обработке запросов',
+    tags=['default'],
+    responses={
+        200: {
+            'description': '',
+            'content': {
+                'application/json': {'example': {'success': True, 'errors': []}}
+            },
+        },
+        400: {},
+        422: {},
+        503: {
+            'description': '',
+            'content': {
+                'application/json': {
+                    'example': {'detail': 'Коннектор не готов: выполняется прогрев'}
+                }
+            },
+        },
+    },
+)
+async def ready(warmup: Annotated[Warmup, Depends(get_warmup)]):
+    """
+    Проверяет готовность коннектора к обработке запросов.
+
+    После запуска коннектор выполняет прогрев (читает каталог объектов, строит колоночные
+    копии "горячих" таблиц, открывает соединение к S3 хранилищу). Пока прогрев не
+    закончен, возвращается HTTP 503. После прогрева возвращается HTTP 200 и список
+    ошибок прогрева (если они были)
+    """
+    if not warmup.ready:
+        raise HTTPException(
+            status_code=503, detail='Коннектор не готов: выполняется прогрев'
+        )
+
+    return {'success': True, 'errors': warmup.errors}
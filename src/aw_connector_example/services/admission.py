@@ -0,0 +1,231 @@
+from typing import Any, AsyncIterator
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import asyncio
+
+from aw_connector_example.services.deadline import Deadline
+
+
+class AdmissionRejected(Exception):
+    """
+    Исключение, выбрасываемое, если запрос не принят в работу: очередь заполнена
+    или время ожидания в очереди истекло
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class Usage:
+    """
+    Ресурсы, занятые выполняющимися запросами
+    """
+
+    requests: int = 0
+    memory: int = 0
+
+
+@dataclass
+class Waiter:
+    """
+    Запрос, ожидающий в очереди
+    """
+
+    source_id: Any
+    memory: int
+    future: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+
+class AdmissionController:
+    """
+    Ограничение количества одновременно выполняемых запросов к данным.
+
+    Ограничения задаются для всего процесса и для каждого источника данных
+    (DataSource.id): количество запросов и оценка занятой ими памяти. Лимит 0
+    означает, что ограничения нет.
+
+    Запросы, которые нельзя выполнить сразу, ждут в очереди. Очередь справедливая:
+    источники обслуживаются по кругу, поэтому много запросов к одному источнику
+    не задерживают запросы к другим. Если очередь заполнена или время ожидания
+    истекло, запрос отклоняется исключением AdmissionRejected (HTTP 503)
+    """
+
+    def __init__(
+        self,
+        max_requests: int = 0,
+        source_max_requests: int = 0,
+        memory_limit: int = 0,
+        source_memory_limit: int = 0,
+        queue_size: int = 0,
+        queue_timeout: float = 30,
+        retry_after: float = 1,
+    ):
+        self.max_requests = max_requests
+        self.source_max_requests = source_max_requests
+        self.memory_limit = memory_limit
+        self.source_memory_limit = source_memory_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.usage = Usage()
+        self.source_usage: dict[Any, Usage] = {}
+        # очереди запросов по источникам, порядок ключей - порядок обслуживания
+        self.queues: dict[Any, deque[Waiter]] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @asynccontextmanager
+    async def admit(
+        self, source_id: Any, memory: int = 0, deadline: Deadline | None = None
+    ) -> AsyncIterator[None]:
+        """
+        Ожидает очереди на выполнение запроса к источнику source_id, которому
+        понадобится memory байт памяти. Ресурсы освобождаются при выходе из контекста,
+        а если по истечении срока deadline в потоках еще выполняется брошенная работа
+        запроса - после ее завершения
+        """
+        # запрос, которому нужно больше памяти, чем позволяет лимит, выполняется,
+        # когда других запросов нет (иначе он не выполнится никогда)
+        if self.memory_limit:
+            memory = min(memory, self.memory_limit)
+        if self.source_memory_limit:
+            memory = min(memory, self.source_memory_limit)
+
+        waiter = Waiter(source_id, memory)
+        self.queues.setdefault(source_id, deque()).append(waiter)
+        self.dispatch()
+
+        if not waiter.future.done():
+            if self.queue_size and self.queued > self.queue_size:
+                self.remove(waiter)
+                raise AdmissionRejected(
+                    'Коннектор перегружен: очередь запросов заполнена',
+                    self.retry_after,
+                )
+            await self.wait(waiter, deadline)
+
+        try:
+            yield
+        finally:
+            work = deadline.pending_work() if deadline is not None else None
+            if work is None:
+                self.release(source_id, memory)
+            else:
+                work.add_done_callback(lambda _: self.release(source_id, memory))
+
+    async def wait(self, waiter: Waiter, deadline: Deadline | None):
+        """
+        Ожидает, пока запрос будет взят в работу
+        """
+        timeout = self.queue_timeout or None
+        if deadline is not None:
+            timeout = min(timeout or deadline.remaining(), deadline.remaining())
+
+        try:
+            await asyncio.wait({waiter.future}, timeout=timeout)
+        except BaseException:
+            # запрос отменен (например, клиент закрыл соединение)
+            self.cancel(waiter)
+            raise
+
+        if waiter.future.done():
+            return
+
+        self.cancel(waiter)
+        if deadline is not None:
+            deadline.check()
+        raise AdmissionRejected(
+            f'Коннектор перегружен: запрос ожидал в очереди больше {self.queue_timeout:g} с',
+            self.retry_after,
+        )
+
+    def cancel(self, waiter: Waiter):
+        """
+        Убирает запрос из очереди. Если запрос уже взят в работу, то освобождает
+        занятые им ресурсы
+        """
+        if waiter.future.done():
+            self.release(waiter.source_id, waiter.memory)
+        else:
+            waiter.future.cancel()
+            self.remove(waiter)
+
+    def remove(self, waiter: Waiter):
+        queue = self.queues.get(waiter.source_id)
+        if queue is None:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self.queues[waiter.source_id]
+        # запрос мог задерживать следующие за ним запросы
+        self.dispatch()
+
+    def dispatch(self):
+        """
+        Берет в работу запросы из очереди, пока хватает ресурсов. Источники
+        перебираются по кругу: после выбора запроса его источник переносится в конец
+        """
+        while True:
+            for source_id, queue in self.queues.items():
+                waiter = queue[0]
+                source_usage = self.source_usage.get(source_id)
+                if not self.fits(source_usage, waiter.memory, source=True):
+                    # источник исчерпал свои лимиты, запросы других источников
+                    # могут выполняться
+                    continue
+                if not self.fits(self.usage, waiter.memory, source=False):
+                    # общих ресурсов не хватает первому запросу в очереди,
+                    # следующие запросы не обгоняют его
+                    return
+
+                queue.popleft()
+                del self.queues[source_id]
+                if queue:
+                    self.queues[source_id] = queue
+
+                self.acquire(source_id, waiter.memory)
+                waiter.future.set_result(None)
+                break
+            else:
+                return
+
+    def fits(self, usage: Usage | None, memory: int, source: bool) -> bool:
+        """
+        Проверяет, можно ли выполнить еще один запрос в пределах лимитов
+        """
+        if usage is None or usage.requests == 0:
+            return True
+
+        max_requests = self.source_max_requests if source else self.max_requests
+        memory_limit = self.source_memory_limit if source else self.memory_limit
+
+        if max_requests and usage.requests >= max_requests:
+            return False
+        if memory_limit and usage.memory + memory > memory_limit:
+            return False
+        return True
+
+    def acquire(self, source_id: Any, memory: int):
+        source_usage = self.source_usage.setdefault(source_id, Usage())
+        for usage in (self.usage, source_usage):
+            usage.requests += 1
+            usage.memory += memory
+
+    def release(self, source_id: Any, memory: int):
+        source_usage = self.source_usage[source_id]
+        for usage in (self.usage, source_usage):
+            usage.requests -= 1
+            usage.memory -= memory
+        if source_usage.requests == 0:
+            del self.source_usage[source_id]
+
+        self.dispatch()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from dataclasses import dataclass, asdict
+
+import asyncio
+import gzip
+import time
+
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+else:
+    pa = lazy_import('pyarrow')
+
+
+@dataclass
+class CompressionStats:
+    """
+    Статистика сжатия ответов одним алгоритмом
+    """
+
+    responses: int = 0
+    # объем ответов до и после сжатия (в байтах)
+    bytes_in: int = 0
+    bytes_out: int = 0
+    # процессорное время сжатия (в секундах)
+    cpu_seconds: float = 0
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            'ratio': round(self.bytes_in / self.bytes_out, 3)
+            if self.bytes_out
+            else None,
+            'cpu_ms_per_mb': (
+                round(self.cpu_seconds * 1000 / (self.bytes_in / 1024 / 1024), 3)
+                if self.bytes_in
+                else None
+            ),
+        }
+
+
+class ResponseCompressor:
+    """
+    Сжатие тел HTTP-ответов (gzip и zstd).
+
+    Алгоритм выбирается по заголовку Accept-Encoding запроса в порядке encodings.
+    Ответы меньше min_size байт не сжимаются. Ответы от thread_threshold байт
+    сжимаются в отдельном потоке, чтобы не блокировать обработку других запросов.
+    Для каждого алгоритма собирается статистика: степень сжатия и процессорное время
+    """
+
+    def __init__(
+        self,
+        encodings: list[str],
+        min_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        thread_threshold: int = 256 * 1024,
+    ):
+        unknown = [e for e in encodings if e not in ('gzip', 'zstd')]
+        if unknown:
+            raise ValueError(f'Неизвестные алгоритмы сжатия: {", ".join(unknown)}')
+
+        self.encodings = encodings
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.thread_threshold = thread_threshold
+
+        self.stats = {encoding: CompressionStats() for encoding in encodings}
+        # ответы, которые не сжимались, так как они меньше min_size
+        self.skipped_small = 0
+
+    def choose_encoding(self, accept_encoding: str | None) -> str | None:
+        """
+        Возвращает алгоритм сжатия, который принимает клиент (или None). Алгоритмы,
+        указанные с q=0, не выбираются, даже если клиент принимает любой алгоритм (*)
+        """
+        if not accept_encoding:
+            return None
+
+        accepted, refused = set(), set()
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            name = name.strip().lower()
+            quality = params.strip().removeprefix('q=')
+            try:
+                if params and float(quality) <= 0:
+                    refused.add(name)
+                    continue
+            except ValueError:
+                continue
+            accepted.add(name)
+
+        for encoding in self.encodings:
+            if encoding in refused:
+                continue
+            if encoding in accepted or '*' in accepted:
+                return encoding
+        return None
+
+    async def compress(self, body: bytes, encoding: str) -> bytes | None:
+        """
+        Сжимает тело ответа. Возвращает None, если ответ слишком мал для сжатия
+        """
+        if len(body) < self.min_size:
+            self.skipped_small += 1
+            return None
+
+        if len(body) >= self.thread_threshold:
+            compressed, cpu_seconds = await asyncio.to_thread(
+                self.compress_body, body, encoding
+            )
+        else:
+            compressed, cpu_seconds = self.compress_body(body, encoding)
+
+        stats = self.stats[encoding]
+        stats.responses += 1
+        stats.bytes_in += len(body)
+        stats.bytes_out += len(compressed)
+        stats.cpu_seconds += cpu_seconds
+
+        return compressed
+
+    def compress_body(self, body: bytes, encoding: str) -> tuple[bytes, float]:
+        """
+        Сжимает тело ответа и возвращает его вместе с затраченным процессорным временем
+        """
+        started = time.thread_time()
+        if encoding == 'zstd':
+            compressed = pa.Codec('zstd', compression_level=self.zstd_level).compress(
+                body, asbytes=True
+            )
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+        return compressed, time.thread_time() - started
+
+    def get_stats(self) -> dict:
+        """ """
+        return {
+            'encodings': {e: s.to_dict() for e, s in self.stats.items()},
+            'skipped_small': self.skipped_small,
+        }
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+
+from aw_connector_example.services.admission import AdmissionController
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.parquet import ParquetService
+from aw_connector_example.services.parquet_queue import ParquetQueue
+from aw_connector_example.services.warmup import Warmup
+from aw_connector_example.services.watermark import WatermarkStore
+from aw_connector_example.services.fingerprint import FingerprintStore
+from aw_connector_example.services.health import HealthProber
+from aw_connector_example.services.compression import ResponseCompressor
+from aw_connector_example.services.views import ViewRefresher
+from aw_connector_example.services.storage import ObjectStorage
+
+
+logger = logging.getLogger('uvicorn')
+
+
+class ServiceContainer:
+    """
+    Сервисы приложения, которые создаются один раз при запуске (в lifespan) и
+    используются всеми запросами процесса до его остановки. В этих сервисах можно
+    хранить кэши, пулы соединений, фоновые задачи и т.п.
+    """
+
+    def __init__(
+        self,
+        data_repo: DataRepository,
+        parquet_service: ParquetService,
+        parquet_queue: ParquetQueue,
+        watermark_store: WatermarkStore,
+        fingerprint_store: FingerprintStore,
+        warmup: Warmup,
+        admission: AdmissionController,
+        health_prober: HealthProber | None = None,
+        compressor: ResponseCompressor | None = None,
+        view_refresher: ViewRefresher | None = None,
+        object_storage: ObjectStorage | None = None,
+    ):
+        self.data_repo = data_repo
+        self.parquet_service = parquet_service
+        self.parquet_queue = parquet_queue
+        self.watermark_store = watermark_store
+        self.fingerprint_store = fingerprint_store
+        self.warmup = warmup
+        self.admission = admission
+        self.health_prober = health_prober
+        self.compressor = compressor
+        self.view_refresher = view_refresher
+        self.object_storage = object_storage
+
+        self.tasks: set[asyncio.Task] = set()
+
+    async def start(self):
+        """
+        Запускает фоновые задачи сервисов (прогрев коннектора, проверка доступа
+        к S3 хранилищу, пересчет материализованных представлений, обновление списка
+        файлов в объектном хранилище).
+
+        Список файлов объектного хранилища читается до начала обработки запросов,
+        чтобы первые запросы не ждали его чтения в цикле событий
+        """
+        if self.object_storage is not None:
+            try:
+                await self.object_storage.refresh()
+            except Exception as e:
+                logger.warning(
+                    f'Не удалось прочитать список объектов {self.object_storage.url}: {e}'
+                )
+
+        self.run_in_background(self.warmup.run())
+        if self.health_prober is not None:
+            self.run_in_background(self.health_prober.run())
+        if self.view_refresher is not None:
+            self.run_in_background(self.view_refresher.run())
+        if self.object_storage is not None:
+            self.run_in_background(self.object_storage.run())
+
+    def run_in_background(self, coro) -> asyncio.Task:
+        """
+        Запускает фоновую задачу, которая будет отменена при остановке приложения
+        """
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def close(self):
+        """
+        Останавливает фоновые задачи и освобождает ресурсы сервисов
+        """
+        for task in list(self.tasks):
+            task.cancel()
+
+        for result in await asyncio.gather(*self.tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f'Ошибка фоновой задачи при остановке: {result}')
@@ -0,0 +1,140 @@
+from typing import Any, Awaitable, Callable
+
+import asyncio
+import time
+
+
+class DeadlineExceeded(Exception):
+    """
+    Исключение, выбрасываемое при превышении времени выполнения запроса
+    """
+
+
+class Deadline:
+    """
+    Крайний срок выполнения запроса.
+
+    Срок отсчитывается от получения запроса. Долгие операции (чтение таблиц, запись
+    parquet по группам строк) проверяют его между порциями данных и прерываются
+    исключением DeadlineExceeded, если AW BI уже перестал ждать ответ
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        # работа в потоках, которую перестали ждать по истечении срока
+        self.abandoned: set[asyncio.Future] = set()
+
+    @classmethod
+    def from_timeouts(cls, *timeouts: float | None) -> 'Deadline | None':
+        """
+        Возвращает срок по наименьшему из указанных таймаутов (или None, если
+        ни один таймаут не указан)
+        """
+        timeouts = [t for t in timeouts if t]
+        return cls(min(timeouts)) if timeouts else None
+
+    @staticmethod
+    def parse_timeout(value: Any) -> float | None:
+        """
+        Разбирает значение таймаута в секундах. Пустое значение и 0 означают,
+        что таймаут не задан
+        """
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+
+        timeout = float(value)
+        if timeout < 0:
+            raise ValueError(f'таймаут не может быть отрицательным: {value}')
+
+        return timeout or None
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def remaining(self) -> float:
+        """
+        Оставшееся время (в секундах)
+        """
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def check(self):
+        """
+        Выбрасывает DeadlineExceeded, если срок истек
+        """
+        if self.expired:
+            raise DeadlineExceeded(
+                f'Превышено время выполнения запроса ({self.timeout:g} с)'
+            )
+
+    def abandon(self, work: asyncio.Future):
+        """
+        Запоминает работу в потоке, результат которой больше не ждут. Поток нельзя
+        прервать, поэтому работа выполняется до конца (или до ближайшей проверки срока)
+        """
+        self.abandoned.add(work)
+        work.add_done_callback(self.abandoned.discard)
+        # исключение брошенной работы никто не получит, не выводим его в лог asyncio
+        work.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def pending_work(self) -> asyncio.Future | None:
+        """
+        Возвращает future, который завершится вместе с брошенной работой в потоках
+        (или None, если такой работы нет)
+        """
+        pending = [work for work in self.abandoned if not work.done()]
+        if not pending:
+            return None
+        return asyncio.gather(*pending, return_exceptions=True)
+
+    async def wait(self, awaitable: Awaitable) -> Any:
+        """
+        Ожидает результат не дольше оставшегося времени. Если awaitable выполняется
+        в потоке, то ожидание прекращается сразу, а сама работа прерывается
+        на ближайшей проверке срока
+        """
+        if self.expired and asyncio.iscoroutine(awaitable):
+            # работа еще не начата, поэтому и не запускаем ее
+            awaitable.close()
+        self.check()
+
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except TimeoutError:
+            raise DeadlineExceeded(
+                f'Превышено время выполнения запроса ({self.timeout:g} с)'
+            )
+
+
+async def run_in_thread(
+    deadline: Deadline | None,
+    func,
+    *args,
+    cancel: Callable[[], Any] | None = None,
+) -> Any:
+    """
+    Выполняет блокирующую функцию в потоке. Если указан срок deadline, то
+    результат ожидается не дольше оставшегося времени.
+
+    Если ожидание прекращено (срок истек или запрос отменен), то вызывается cancel,
+    чтобы прервать саму работу, а незавершенная работа запоминается в deadline:
+    занятые запросом ресурсы освобождаются только после ее завершения
+    (см. AdmissionController.admit)
+    """
+    if deadline is not None:
+        # работа еще не начата, поэтому и не запускаем ее
+        deadline.check()
+
+    work = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        if deadline is None:
+            return await asyncio.shield(work)
+        return await deadline.wait(asyncio.shield(work))
+    except BaseException:
+        if not work.done():
+            if cancel is not None:
+                cancel()
+            if deadline is not None:
+                deadline.abandon(work)
+        raise
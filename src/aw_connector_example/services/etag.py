@@ -0,0 +1,23 @@
+import hashlib
+
+
+def make_etag(*parts: str) -> str:
+    """
+    Возвращает ETag ответа по частям, от которых он зависит (тело запроса, версия
+    данных источника и т.п.)
+    """
+    digest = hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Проверяет, что ETag совпадает с одним из значений заголовка If-None-Match
+    (слабые ETag вида W/"..." сравниваются без префикса)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    return etag in (t.strip().removeprefix('W/') for t in if_none_match.split(','))
@@ -0,0 +1,547 @@
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
+from dataclasses import dataclass, field
+import re
+
+from aw_connector_example.dto import ParquetFilterExpr
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import sqlglot
+    from sqlglot import exp
+    import polars
+else:
+    sqlglot = lazy_import('sqlglot')
+    exp = lazy_import('sqlglot.expressions')
+    polars = lazy_import('polars')
+
+
+class FilterError(Exception):
+    """
+    Исключение, выбрасываемое при разборе условий фильтрации
+    """
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """
+    Простое условие вида "столбец оператор значение".
+
+    Такие условия можно проверять без чтения данных (например, по статистикам min/max
+    фрагментов таблицы). Поддерживаются операторы =, !=, <, <=, >, >=, in, is null, is not null
+    """
+
+    column: str
+    operator: str
+    value: Any = None
+
+
+@dataclass
+class CompiledFilter:
+    """
+    Результат компиляции списка условий ParquetFilterExpr
+    """
+
+    expr: polars.Expr
+    predicates: list[Predicate] = field(default_factory=list)
+    columns: set[str] = field(default_factory=set)
+
+
+# Операторы сравнения из ParquetFilterExpr.operator -> классы выражений sqlglot
+# (классы и типы указаны названиями, чтобы не импортировать sqlglot и polars
+# при импорте модуля)
+_COMPARISON_OPERATORS: dict[str, str] = {
+    '=': 'EQ',
+    '==': 'EQ',
+    '!=': 'NEQ',
+    '<>': 'NEQ',
+    '<': 'LT',
+    '<=': 'LTE',
+    '>': 'GT',
+    '>=': 'GTE',
+    'like': 'Like',
+    'ilike': 'ILike',
+}
+
+_PREDICATE_OPERATORS: dict[str, str] = {
+    'EQ': '=',
+    'NEQ': '!=',
+    'LT': '<',
+    'LTE': '<=',
+    'GT': '>',
+    'GTE': '>=',
+}
+
+# Зеркальные операторы, когда литерал стоит слева: 1 < id -> id > 1
+_MIRRORED_OPERATORS = {'=': '=', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+# Типы sqlglot в CAST -> типы Polars
+_CAST_TYPES: dict[str, str] = {
+    'TINYINT': 'Int64',
+    'SMALLINT': 'Int64',
+    'INT': 'Int64',
+    'BIGINT': 'Int64',
+    'FLOAT': 'Float64',
+    'DOUBLE': 'Float64',
+    'DECIMAL': 'Float64',
+    'BOOLEAN': 'Boolean',
+    'CHAR': 'String',
+    'VARCHAR': 'String',
+    'TEXT': 'String',
+    'DATE': 'Date',
+    'DATETIME': 'Datetime',
+    'TIMESTAMP': 'Datetime',
+}
+
+
+class FilterCompiler:
+    """
+    Компилирует условия ParquetFilterExpr в выражения Polars.
+
+    Условия вида {field_name, operator, value} собираются напрямую из частей, поэтому
+    value всегда трактуется как значение (литерал), а не как фрагмент SQL: строка
+    приводится к типу столбца как есть (например, '0008' остается строкой '0008').
+    Значение в кавычках SQL ("'2025-01-15'") принимается без кавычек. Для операторов
+    in и between строка - это значения через запятую (для between также через and),
+    к каждому из которых применяются те же правила. Если значение нельзя привести
+    к типу столбца, выбрасывается FilterError.
+    Условия, заданные только через value, разбираются парсером sqlglot, после чего
+    допускаются только выражения из белого списка (столбцы, литералы, сравнения,
+    логические операторы, IN, BETWEEN, LIKE, IS NULL, арифметика и CAST).
+    Подзапросы, вызовы функций и несколько выражений через ";" запрещены.
+    """
+
+    def __init__(
+        self, schema: polars.Schema | dict[str, polars.DataType] | None = None
+    ):
+        self.schema = dict(schema or {})
+
+    def compile(self, filters: list[ParquetFilterExpr]) -> CompiledFilter | None:
+        """
+        Компилирует список условий (соединяются через AND). Для пустого списка возвращает None
+        """
+        if not filters:
+            return None
+
+        conditions = [self.parse_filter(f) for f in filters]
+
+        compiled = CompiledFilter(expr=polars.lit(True))
+        exprs = []
+        for condition in conditions:
+            exprs.append(self.to_expr(condition))
+            compiled.predicates.extend(self.to_predicates(condition))
+            compiled.columns.update(c.name for c in condition.find_all(exp.Column))
+
+        compiled.expr = polars.all_horizontal(exprs) if len(exprs) > 1 else exprs[0]
+        return compiled
+
+    # --------------------------------------------------------------------
+    # Разбор условий в AST sqlglot
+    # --------------------------------------------------------------------
+    def parse_filter(self, f: ParquetFilterExpr) -> exp.Expression:
+        """
+        Возвращает AST условия
+        """
+        if not f.field_name:
+            if not isinstance(f.value, str) or not f.value.strip():
+                raise FilterError(f'Не указано условие фильтра: {f.value!r}')
+            return self.parse_condition(f.value)
+
+        operator = (f.operator or '=').strip().lower()
+        column = exp.column(f.field_name, quoted=True)
+
+        match operator:
+            case 'in' | 'not in':
+                values = self.parse_values(f.value, 'in')
+                node = exp.In(this=column, expressions=values)
+                return exp.Not(this=node) if operator == 'not in' else node
+            case 'is' | 'is not':
+                if f.value is not None and str(f.value).strip().lower() != 'null':
+                    raise FilterError(
+                        f'Оператор {f.operator} допустим только со значением null'
+                    )
+                node = exp.Is(this=column, expression=exp.Null())
+                return exp.Not(this=node) if operator == 'is not' else node
+            case 'between':
+                values = self.parse_values(f.value, 'between')
+                if len(values) != 2:
+                    raise FilterError(
+                        'Для оператора between нужно указать два значения'
+                    )
+                return exp.Between(this=column, low=values[0], high=values[1])
+            case _ if operator in _COMPARISON_OPERATORS:
+                return getattr(exp, _COMPARISON_OPERATORS[operator])(
+                    this=column, expression=self.parse_value(f.value)
+                )
+
+        raise FilterError(f'Неподдерживаемый оператор фильтра: {f.operator}')
+
+    @staticmethod
+    def parse_condition(text: str) -> exp.Expression:
+        """
+        Разбирает условие, заданное текстом SQL (например, "id < 5")
+        """
+        try:
+            statements = [s for s in sqlglot.parse(text) if s is not None]
+        except sqlglot.errors.ParseError as e:
+            raise FilterError(f'Не удалось разобрать условие фильтра "{text}": {e}')
+
+        if len(statements) != 1:
+            raise FilterError(f'Условие фильтра должно быть одним выражением: {text}')
+
+        return statements[0]
+
+    def parse_value(self, value: Any) -> exp.Expression:
+        """
+        Возвращает литерал для значения из ParquetFilterExpr.value. Строка не
+        разбирается как SQL, а приводится к типу столбца при компиляции условия
+        """
+        if isinstance(value, str):
+            return exp.Literal.string(self.unquote(value))
+
+        if isinstance(value, (list, tuple)):
+            raise FilterError(f'Ожидалось одно значение, а не список: {value!r}')
+
+        return exp.convert(value)
+
+    def parse_values(self, value: Any, operator: str = 'in') -> list[exp.Expression]:
+        """
+        Возвращает список литералов для операторов in и between
+        """
+        if isinstance(value, (list, tuple)):
+            return [self.parse_value(v) for v in value]
+
+        if isinstance(value, str):
+            return [
+                self.parse_value(v)
+                for v in self.split_values(value, between=operator == 'between')
+            ]
+
+        return [self.parse_value(value)]
+
+    @staticmethod
+    def split_values(text: str, between: bool = False) -> list[str]:
+        """
+        Разбивает строку со списком значений ("1, 2", "('a', 'b')", для between также
+        "2 and 3") на значения. Разделители внутри кавычек не учитываются
+        """
+        text = text.strip()
+        if text.startswith('(') and text.endswith(')'):
+            text = text[1:-1]
+
+        separator = r',|\s+and\s+' if between else ','
+        values, start, quoted = [], 0, False
+        for match in re.finditer(rf"'|{separator}", text, flags=re.IGNORECASE):
+            if match.group() == "'":
+                quoted = not quoted
+            elif not quoted:
+                values.append(text[start : match.start()])
+                start = match.end()
+        values.append(text[start:])
+
+        values = [v.strip() for v in values]
+        if not all(values):
+            raise FilterError(f'Некорректный список значений: {text!r}')
+        return values
+
+    @staticmethod
+    def unquote(value: str) -> str:
+        """
+        Убирает кавычки SQL у строкового литерала ('it''s' -> it's). Строка без
+        кавычек возвращается как есть
+        """
+        text = value.strip()
+        if len(text) >= 2 and text[0] == text[-1] == "'":
+            inner = text[1:-1]
+            if "'" not in inner.replace("''", ''):
+                return inner.replace("''", "'")
+        return value
+
+    @staticmethod
+    def is_literal(node: exp.Expression) -> bool:
+        node = node.unnest()
+        if isinstance(node, exp.Neg):
+            node = node.this
+        return isinstance(node, (exp.Literal, exp.Null, exp.Boolean))
+
+    # --------------------------------------------------------------------
+    # Компиляция AST в выражения Polars
+    # --------------------------------------------------------------------
+    def to_expr(self, node: exp.Expression) -> polars.Expr:
+        """
+        Рекурсивно переводит AST условия в выражение Polars
+        """
+        match node:
+            case exp.Paren():
+                return self.to_expr(node.this)
+            case exp.Column():
+                if not isinstance(node.this, exp.Identifier):
+                    raise FilterError(f'Недопустимое имя столбца: {node.sql()}')
+                return polars.col(node.name)
+            case exp.Literal() | exp.Null() | exp.Boolean() | exp.Neg() if (
+                self.is_literal(node)
+            ):
+                return polars.lit(self.literal_value(node))
+            case exp.And():
+                return self.to_expr(node.this) & self.to_expr(node.expression)
+            case exp.Or():
+                return self.to_expr(node.this) | self.to_expr(node.expression)
+            case exp.Not():
+                return ~self.to_expr(node.this)
+            case exp.Neg():
+                return -self.to_expr(node.this)
+            case exp.EQ() | exp.NEQ() | exp.LT() | exp.LTE() | exp.GT() | exp.GTE():
+                left, right = self.typed_operands(node.this, node.expression)
+                match node:
+                    case exp.EQ():
+                        return left == right
+                    case exp.NEQ():
+                        return left != right
+                    case exp.LT():
+                        return left < right
+                    case exp.LTE():
+                        return left <= right
+                    case exp.GT():
+                        return left > right
+                    case _:
+                        return left >= right
+            case exp.Add() | exp.Sub() | exp.Mul() | exp.Div() | exp.Mod():
+                left, right = self.to_expr(node.this), self.to_expr(node.expression)
+                match node:
+                    case exp.Add():
+                        return left + right
+                    case exp.Sub():
+                        return left - right
+                    case exp.Mul():
+                        return left * right
+                    case exp.Div():
+                        return left / right
+                    case _:
+                        return left % right
+            case exp.Is():
+                if not isinstance(node.expression, exp.Null):
+                    raise FilterError(f'Недопустимое условие: {node.sql()}')
+                return self.to_expr(node.this).is_null()
+            case exp.In():
+                if node.args.get('query') or node.args.get('unnest'):
+                    raise FilterError(
+                        f'Подзапросы в условиях фильтра не поддерживаются: {node.sql()}'
+                    )
+                if not all(self.is_literal(v) for v in node.expressions):
+                    raise FilterError(f'Недопустимый список значений: {node.sql()}')
+                values, dtype = self.typed_values(
+                    [self.literal_value(v) for v in node.expressions],
+                    self.column_dtype(node.this),
+                )
+                return self.typed_column(node.this, dtype).is_in(values)
+            case exp.Between():
+                this = node.this
+                low, _ = self.typed_operands(node.args['low'], this)
+                high, column = self.typed_operands(node.args['high'], this)
+                return column.is_between(low, high)
+            case exp.Like() | exp.ILike():
+                pattern = node.expression.unnest()
+                if not isinstance(pattern, exp.Literal) or not pattern.is_string:
+                    raise FilterError(f'Шаблон LIKE должен быть строкой: {node.sql()}')
+                regex = self.like_to_regex(pattern.this)
+                if isinstance(node, exp.ILike):
+                    regex = '(?i)' + regex
+                return self.to_expr(node.this).cast(polars.String).str.contains(regex)
+            case exp.Cast():
+                dtype_name = _CAST_TYPES.get(node.to.this.name)
+                if dtype_name is None:
+                    raise FilterError(f'Неподдерживаемый тип в CAST: {node.to.sql()}')
+                return self.to_expr(node.this).cast(getattr(polars, dtype_name)())
+
+        raise FilterError(f'Недопустимое выражение в условии фильтра: {node.sql()}')
+
+    def typed_operands(
+        self, left: exp.Expression, right: exp.Expression
+    ) -> tuple[polars.Expr, polars.Expr]:
+        """
+        Возвращает операнды сравнения. Литерал приводится к типу столбца, с которым
+        он сравнивается (например, '2025-01-01' для столбца с типом Date). Если
+        значение нельзя привести к типу без потерь (например, 2.5 для целочисленного
+        столбца), то столбец и значение сравниваются как Float64
+        """
+        for literal, column in ((left, right), (right, left)):
+            column_dtype = self.column_dtype(column)
+            if column_dtype is None or not self.is_literal(literal):
+                continue
+
+            values, dtype = self.typed_values(
+                [self.literal_value(literal)], column_dtype
+            )
+            value = polars.lit(values[0], dtype=dtype)
+            column_expr = self.typed_column(column, dtype)
+            return (value, column_expr) if literal is left else (column_expr, value)
+
+        return self.to_expr(left), self.to_expr(right)
+
+    def typed_column(
+        self, node: exp.Expression, dtype: polars.DataType | None
+    ) -> polars.Expr:
+        """
+        Возвращает выражение столбца, приведенное к типу сравнения dtype
+        (если тип сравнения отличается от типа столбца)
+        """
+        column_dtype = self.column_dtype(node)
+        if dtype is None or column_dtype is None or dtype == column_dtype:
+            return self.to_expr(node)
+        return self.to_expr(node).cast(dtype)
+
+    def to_predicates(self, node: exp.Expression) -> list[Predicate]:
+        """
+        Выделяет из условия простые предикаты, соединенные через AND
+        """
+        node = node.unnest()
+
+        match node:
+            case exp.And():
+                return self.to_predicates(node.this) + self.to_predicates(
+                    node.expression
+                )
+            case exp.EQ() | exp.NEQ() | exp.LT() | exp.LTE() | exp.GT() | exp.GTE():
+                operator = _PREDICATE_OPERATORS[type(node).__name__]
+                left, right = node.this.unnest(), node.expression.unnest()
+                if isinstance(right, exp.Column) and self.is_literal(left):
+                    left, right = right, left
+                    operator = _MIRRORED_OPERATORS[operator]
+                if isinstance(left, exp.Column) and self.is_literal(right):
+                    value = self.literal_value(right)
+                    if value is None:
+                        return []
+                    values, _ = self.typed_values([value], self.column_dtype(left))
+                    return [
+                        Predicate(column=left.name, operator=operator, value=values[0])
+                    ]
+            case exp.Between() if isinstance(node.this, exp.Column):
+                return self.to_predicates(
+                    exp.GTE(this=node.this, expression=node.args['low'])
+                ) + self.to_predicates(
+                    exp.LTE(this=node.this, expression=node.args['high'])
+                )
+            case exp.In() if isinstance(node.this, exp.Column) and not node.args.get(
+                'query'
+            ):
+                if all(self.is_literal(v) for v in node.expressions):
+                    values, _ = self.typed_values(
+                        [self.literal_value(v) for v in node.expressions],
+                        self.column_dtype(node.this),
+                    )
+                    return [
+                        Predicate(column=node.this.name, operator='in', value=values)
+                    ]
+            case exp.Is() if isinstance(node.this, exp.Column):
+                return [Predicate(column=node.this.name, operator='is null')]
+            case exp.Not() if isinstance(node.this, exp.Is) and isinstance(
+                node.this.this, exp.Column
+            ):
+                return [Predicate(column=node.this.this.name, operator='is not null')]
+
+        return []
+
+    def column_dtype(self, node: exp.Expression) -> polars.DataType | None:
+        node = node.unnest()
+        if isinstance(node, exp.Column):
+            return self.schema.get(node.name)
+        return None
+
+    @staticmethod
+    def literal_value(node: exp.Expression) -> Any:
+        node = node.unnest()
+        match node:
+            case exp.Null():
+                return None
+            case exp.Boolean():
+                return node.this
+            case exp.Neg():
+                return -FilterCompiler.literal_value(node.this)
+            case exp.Literal() if node.is_string:
+                return node.this
+            case exp.Literal():
+                text = node.this
+                try:
+                    return int(text)
+                except ValueError:
+                    return float(text)
+
+        raise FilterError(f'Ожидалось значение: {node.sql()}')
+
+    @staticmethod
+    def typed_values(
+        values: list[Any], dtype: polars.DataType | None
+    ) -> tuple[list[Any], polars.DataType | None]:
+        """
+        Приводит значения к типу столбца dtype и возвращает их вместе с типом, в
+        котором нужно сравнивать столбец и значения: dtype, Float64 (если числовой
+        столбец нельзя сравнить со значениями без потерь) или None (если тип
+        столбца неизвестен, значения сравниваются как есть). Если значения нельзя
+        привести к типу столбца, выбрасывается FilterError
+        """
+        if dtype is None:
+            return values, None
+
+        candidates = [dtype]
+        if dtype.is_numeric() and dtype != polars.Float64:
+            candidates.append(polars.Float64)
+
+        error = None
+        for candidate in candidates:
+            try:
+                return [FilterCompiler.coerce(v, candidate) for v in values], candidate
+            except FilterError as e:
+                error = error or e
+
+        raise error
+
+    @staticmethod
+    def coerce(value: Any, dtype: polars.DataType) -> Any:
+        """
+        Приводит значение к типу столбца. Если значение нельзя привести к типу
+        без потерь (например, 2.5 к Int64), выбрасывается FilterError
+        """
+        if value is None:
+            return None
+        try:
+            series = polars.Series([value])
+            if isinstance(value, str) and dtype == polars.Date:
+                coerced = series.str.to_date()[0]
+            elif isinstance(value, str) and isinstance(dtype, polars.Datetime):
+                coerced = series.str.to_datetime(time_unit=dtype.time_unit)[0]
+            else:
+                coerced = series.cast(dtype, strict=True)[0]
+        except Exception as e:
+            raise FilterError(f'Значение {value!r} нельзя привести к типу {dtype}: {e}')
+
+        # значение должно сохраниться при приведении (строки разбираются по формату типа)
+        if coerced is None or (not isinstance(value, str) and coerced != value):
+            raise FilterError(f'Значение {value!r} нельзя привести к типу {dtype}')
+        return coerced
+
+    @staticmethod
+    def like_to_regex(pattern: str) -> str:
+        """
+        Переводит шаблон SQL LIKE в регулярное выражение
+        """
+        parts = []
+        for char in pattern:
+            match char:
+                case '%':
+                    parts.append('.*')
+                case '_':
+                    parts.append('.')
+                case _:
+                    parts.append(re.escape(char))
+        return '^' + ''.join(parts) + '$'
+
+
+def compile_filters(
+    filters: list[ParquetFilterExpr] | None,
+    schema: polars.Schema | dict[str, polars.DataType] | None = None,
+) -> CompiledFilter | None:
+    """
+    Компилирует список условий ParquetFilterExpr в выражение Polars
+    """
+    return FilterCompiler(schema).compile(filters or [])
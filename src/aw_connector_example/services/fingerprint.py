@@ -0,0 +1,166 @@
+from pathlib import Path
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+
+import asyncio
+import hashlib
+import json
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+import aiofiles
+import aiofiles.os
+
+from aw_connector_example.dto import ParquetRequest
+from aw_connector_example.services.storage import LocalStorage, ObjectStorage
+
+
+@dataclass
+class ExportFingerprint:
+    """
+    Отпечаток выгрузки в parquet: хэш параметров запроса (объект, SQL запрос,
+    столбцы, фильтры и т.д.), версии файлов таблиц источника (размер, время
+    изменения и хэш содержимого) и файлы в папке выгрузки после нее (путь и размер)
+    """
+
+    request: str
+    tables: dict[str, dict] = field(default_factory=dict)
+    files: dict[str, int] = field(default_factory=dict)
+
+    def matches(self, other: 'ExportFingerprint') -> bool:
+        """
+        Проверяет, что выгрузка с этим отпечатком даст те же данные, что и other:
+        совпадают параметры запроса и содержимое файлов таблиц
+        """
+        return self.request == other.request and {
+            p: t['hash'] for p, t in self.tables.items()
+        } == {p: t['hash'] for p, t in other.tables.items()}
+
+
+class FingerprintStore:
+    """
+    Хранилище отпечатков выгрузок в parquet.
+
+    Отпечаток хранится для каждой комбинации (источник, объект, папка выгрузки)
+    в отдельном файле в папке root. Если отпечаток повторной выгрузки в ту же папку
+    совпадает с сохраненным, и файлы прошлой выгрузки на месте, то выгрузку можно
+    не выполнять.
+
+    Хэш содержимого файла таблицы вычисляется, только если изменились его размер
+    или время изменения. Если при этом содержимое не изменилось (например, файл
+    перезаписан теми же данными), то выгрузка тоже не выполняется. Для файлов
+    в объектном хранилище хэшем содержимого служит ETag объекта, и файл не скачивается
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    @staticmethod
+    def get_key(request: ParquetRequest) -> str:
+        """
+        Возвращает ключ отпечатка для источника, объекта (или текста SQL запроса)
+        и папки выгрузки
+        """
+        obj = request.object
+        object_key = obj.query_text if obj.type == 'sql' else obj.name
+        key = f'{obj.data_source.id}\n{object_key}\n{request.folder}'
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    async def build(
+        self,
+        request: ParquetRequest,
+        table_paths: list[Path],
+        previous: ExportFingerprint | None = None,
+        storage: LocalStorage | ObjectStorage | None = None,
+    ) -> ExportFingerprint:
+        """
+        Вычисляет отпечаток выгрузки. Хэши файлов, размер и время изменения которых
+        не изменились с прошлой выгрузки (previous), берутся из нее.
+        storage - хранилище файлов таблиц (по умолчанию - локальный диск)
+        """
+        storage = storage or LocalStorage(Path('/'))
+
+        tables = {}
+        for table_path in table_paths:
+            stat = await asyncio.to_thread(storage.stat, table_path)
+            version = {'size': stat.size, 'mtime_ns': stat.mtime_ns}
+
+            known = previous.tables.get(str(table_path)) if previous else None
+            if known is not None and all(known[k] == v for k, v in version.items()):
+                version['hash'] = known['hash']
+            elif stat.etag is not None:
+                version['hash'] = f'etag:{stat.etag}'
+            else:
+                version['hash'] = await asyncio.to_thread(
+                    self.hash_file, await storage.fetch(table_path)
+                )
+
+            tables[str(table_path)] = version
+
+        return ExportFingerprint(request=self.hash_request(request), tables=tables)
+
+    async def get(self, key: str) -> ExportFingerprint | None:
+        """
+        Возвращает сохраненный отпечаток (или None, если выгрузок еще не было)
+        """
+        fingerprint_file = self.root / f'{key}.json'
+        if not await aiofiles.os.path.exists(fingerprint_file):
+            return None
+
+        async with aiofiles.open(fingerprint_file, mode='r') as f:
+            return ExportFingerprint(**json.loads(await f.read()))
+
+    async def put(self, key: str, fingerprint: ExportFingerprint):
+        """
+        Сохраняет отпечаток
+        """
+        await aiofiles.os.makedirs(self.root, exist_ok=True)
+
+        tmp_fingerprint_file = self.root / f'{key}.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp_fingerprint_file, mode='w') as f:
+            await f.write(json.dumps(asdict(fingerprint), ensure_ascii=False))
+        await aiofiles.os.replace(tmp_fingerprint_file, self.root / f'{key}.json')
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        """
+        Межпроцессная блокировка выгрузки по ключу отпечатка, чтобы проверка
+        отпечатка, выгрузка и сохранение нового отпечатка не пересекались
+        с такой же выгрузкой в другом запросе
+        """
+        await aiofiles.os.makedirs(self.root, exist_ok=True)
+
+        with open(self.root / f'{key}.lock', mode='w') as f:
+            if fcntl is None:
+                yield
+                return
+
+            await asyncio.to_thread(fcntl.flock, f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def hash_request(request: ParquetRequest) -> str:
+        """
+        Хэш параметров запроса, от которых зависят выгружаемые данные (все,
+        кроме папки выгрузки)
+        """
+        params = request.model_dump(mode='json', exclude={'folder'})
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def hash_file(path: Path) -> str:
+        """ """
+        digest = hashlib.sha256()
+        with open(path, mode='rb') as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
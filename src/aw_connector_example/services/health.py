@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
+from dataclasses import dataclass
+
+import asyncio
+import logging
+import time
+
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import s3fs
+else:
+    s3fs = lazy_import('s3fs')
+
+
+logger = logging.getLogger('uvicorn')
+
+
+@dataclass(frozen=True)
+class HealthState:
+    """
+    Результат последней проверки доступа к S3 хранилищу
+    """
+
+    ok: bool
+    # время проверки (unix time)
+    checked_at: float
+    # длительность запроса к S3 хранилищу (в миллисекундах)
+    latency_ms: float
+    error: str | None = None
+
+
+class HealthProber:
+    """
+    Фоновая проверка доступа к S3 хранилищу AW BI.
+
+    Раз в interval секунд выполняется запрос списка объектов бакета (с ограничением
+    по времени timeout) и запоминается результат. /health отвечает по последнему
+    результату и не обращается к S3 хранилищу сам, поэтому медленный S3 не задерживает
+    ни проверку состояния, ни другие запросы
+    """
+
+    def __init__(
+        self,
+        storage_options: dict[str, Any],
+        bucket: str,
+        interval: float = 10,
+        timeout: float = 5,
+    ):
+        self.storage_options = storage_options
+        self.bucket = bucket
+        self.interval = interval
+        self.timeout = timeout
+
+        self.state: HealthState | None = None
+
+    async def run(self):
+        """
+        Периодически проверяет доступ к S3 хранилищу (до отмены задачи)
+        """
+        fs = None
+        try:
+            while True:
+                try:
+                    if fs is None:
+                        fs = self.create_filesystem()
+                        await fs.set_session()
+                    await self.probe(fs)
+                except Exception as e:
+                    # клиент создается заново на следующей проверке, а сессия
+                    # текущего клиента закрывается
+                    await self.close_filesystem(fs)
+                    fs = None
+                    self.state = HealthState(
+                        ok=False, checked_at=time.time(), latency_ms=0, error=f'{e}'
+                    )
+                await asyncio.sleep(self.interval)
+        finally:
+            await self.close_filesystem(fs)
+
+    @staticmethod
+    async def close_filesystem(fs: s3fs.S3FileSystem | None):
+        """
+        Закрывает сессию клиента S3 (и ее соединения)
+        """
+        client = getattr(fs, '_s3', None)
+        if client is None:
+            return
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f'Не удалось закрыть сессию клиента S3: {e}')
+
+    def create_filesystem(self) -> s3fs.S3FileSystem:
+        """
+        Создает отдельный асинхронный клиент S3: запросы выполняются в цикле событий
+        приложения без потоков и прерываются по таймауту
+        """
+        return s3fs.S3FileSystem(
+            **self.storage_options,
+            asynchronous=True,
+            skip_instance_cache=True,
+            config_kwargs={
+                'connect_timeout': self.timeout,
+                'read_timeout': self.timeout,
+                'retries': {'max_attempts': 1},
+            },
+        )
+
+    async def probe(self, fs: s3fs.S3FileSystem) -> HealthState:
+        """
+        Выполняет одну проверку и сохраняет ее результат
+        """
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(fs._ls(self.bucket, refresh=True), self.timeout)
+        except TimeoutError:
+            error = f'превышено время ожидания ответа ({self.timeout} с)'
+        except Exception as e:
+            error = f'{e}'
+
+        if error and (self.state is None or self.state.ok):
+            # в лог пишется только переход в состояние ошибки
+            logger.warning(
+                f'Ошибка доступа к S3 хранилищу AW BI, bucket: {self.bucket}: {error}'
+            )
+
+        self.state = HealthState(
+            ok=error is None,
+            checked_at=time.time(),
+            latency_ms=(time.perf_counter() - started) * 1000,
+            error=error,
+        )
+
+        return self.state
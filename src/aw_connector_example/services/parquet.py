@@ -1,19 +1,585 @@
-import pyarrow as pa
-import pyarrow.parquet as pq
-from s3fs import S3FileSystem
+from __future__ import annotations
 
-from aw_connector_example.dto import ObjectMeta
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterable
+from pathlib import Path
+from dataclasses import dataclass, field
+from urllib.parse import quote
+
+import asyncio
+import shutil
+import tempfile
+import uuid
+
+from aw_connector_example.dto import ParquetWriterOptions
+from aw_connector_example.lazy import lazy_import
+from aw_connector_example.services.deadline import Deadline, run_in_thread
+
+if TYPE_CHECKING:
+    import polars
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    from s3fs import S3FileSystem
+else:
+    polars = lazy_import('polars')
+    pa = lazy_import('pyarrow')
+    pc = lazy_import('pyarrow.compute')
+    pq = lazy_import('pyarrow.parquet')
+
+
+# название подпапки для пустого значения столбца секционирования (как в pyarrow)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+@dataclass
+class DatasetFile:
+    """
+    Открытый на запись файл в папке выгрузки
+    """
+
+    path: str
+    f: BinaryIO
+    writer: pq.ParquetWriter
+    rows: int = 0
+
+
+@dataclass
+class DatasetPartition:
+    """
+    Подпапка выгрузки для одного набора значений столбцов секционирования
+    """
+
+    folder: str
+    buffer: list[pa.Table] = field(default_factory=list)
+    buffered_rows: int = 0
+    file: DatasetFile | None = None
+
+
+class ParquetDatasetWriter:
+    """
+    Запись данных в папку выгрузки (parquet dataset).
+
+    Данные разбиваются на подпапки вида column=value по столбцам partition_cols
+    (как у pyarrow.parquet.write_to_dataset) и на файлы не больше max_rows_per_file
+    строк. Строки каждой подпапки накапливаются и записываются группами строк
+    по max_rows_per_group. Перед записью каждой группы проверяется срок выполнения
+    запроса.
+
+    Файлы в S3 публикуются только после записи всех данных, при ошибке их загрузка
+    прерывается. Локальные файлы при ошибке удаляются
+    """
+
+    def __init__(
+        self,
+        root: str,
+        schema: pa.Schema,
+        options: ParquetWriterOptions,
+        filesystem: S3FileSystem | None = None,
+        deadline: Deadline | None = None,
+    ):
+        self.root = root.rstrip('/')
+        self.options = options
+        self.filesystem = filesystem
+        self.deadline = deadline
+
+        self.partition_cols = options.partition_cols or []
+        missing = [c for c in self.partition_cols if c not in schema.names]
+        if missing:
+            raise ValueError(
+                f'Столбцы секционирования не найдены в данных: {", ".join(missing)}'
+            )
+        self.file_schema = pa.schema(
+            [f for f in schema if f.name not in self.partition_cols]
+        )
+
+        self.max_rows_per_group = options.max_rows_per_group or 1024 * 1024
+        # вычисляется по первой порции данных
+        self.max_rows_per_file: int | None = None
+
+        self.name = uuid.uuid4().hex
+        self.file_index = 0
+        self.partitions: dict[tuple, DatasetPartition] = {}
+        self.closed_files: list[DatasetFile] = []
+
+    def write(self, batches: Iterable[pa.RecordBatch]):
+        """
+        Записывает все порции данных и публикует файлы. При ошибке запись
+        прерывается, и файлы не появляются
+        """
+        try:
+            for batch in batches:
+                self.write_batch(batch)
+            self.close()
+            if self.deadline is not None:
+                self.deadline.check()
+            self.commit()
+        except BaseException:
+            self.abort()
+            raise
+
+    def write_batch(self, batch: pa.RecordBatch):
+        """
+        Добавляет порцию данных в папку выгрузки
+        """
+        if batch.num_rows == 0:
+            return
+
+        if self.max_rows_per_file is None:
+            self.max_rows_per_file = self.get_max_rows_per_file(batch)
+
+        for key, table in self.split(pa.Table.from_batches([batch])):
+            partition = self.partitions.get(key)
+            if partition is None:
+                partition = self.partitions[key] = DatasetPartition(
+                    folder=self.get_partition_folder(key)
+                )
+            partition.buffer.append(table)
+            partition.buffered_rows += table.num_rows
+            if partition.buffered_rows >= self.max_rows_per_group:
+                self.flush(partition)
+
+    def close(self):
+        """
+        Записывает накопленные строки и закрывает файлы
+        """
+        for partition in self.partitions.values():
+            self.flush(partition, final=True)
+            if partition.file is not None:
+                self.close_file(partition.file)
+                partition.file = None
+
+    def commit(self):
+        """
+        Публикует записанные файлы (для S3)
+        """
+        if self.filesystem is None:
+            return
+        for file in self.closed_files:
+            file.f.commit()
+
+    def abort(self):
+        """
+        Прерывает запись: загрузки в S3 прерываются, локальные файлы удаляются
+        """
+        files = self.closed_files + [
+            p.file for p in self.partitions.values() if p.file is not None
+        ]
+        for file in files:
+            if self.filesystem is None:
+                file.f.close()
+                Path(file.path).unlink(missing_ok=True)
+            else:
+                file.f.discard()
+                # буфер файла отброшен, дописывать файл при закрытии не нужно
+                file.f.closed = True
+
+    def flush(self, partition: DatasetPartition, final: bool = False):
+        """
+        Записывает накопленные строки подпапки полными группами строк
+        (при final - все строки)
+        """
+        if not partition.buffered_rows:
+            return
+
+        table = pa.concat_tables(partition.buffer)
+        rows = table.num_rows
+        if not final:
+            rows -= rows % self.max_rows_per_group
+
+        offset = 0
+        while offset < rows:
+            if self.deadline is not None:
+                self.deadline.check()
+
+            if partition.file is None:
+                partition.file = self.open_file(partition.folder)
+            file = partition.file
+
+            length = min(rows - offset, self.max_rows_per_group)
+            if self.max_rows_per_file:
+                length = min(length, self.max_rows_per_file - file.rows)
+
+            file.writer.write_table(table.slice(offset, length), row_group_size=length)
+            file.rows += length
+            offset += length
+
+            if self.max_rows_per_file and file.rows >= self.max_rows_per_file:
+                self.close_file(file)
+                partition.file = None
+
+        rest = table.slice(rows)
+        partition.buffer = [rest] if rest.num_rows else []
+        partition.buffered_rows = rest.num_rows
+
+    def open_file(self, folder: str) -> DatasetFile:
+        # имена файлов такие же, как у pyarrow.parquet.write_to_dataset
+        path = f'{folder}/{self.name}-{self.file_index}.parquet'
+        self.file_index += 1
+
+        if self.filesystem is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            f = open(path, mode='wb')
+        else:
+            # файл публикуется в S3 только после commit, до этого загруженные части
+            # не видны и удаляются хранилищем при прерывании загрузки
+            f = self.filesystem.open(path, mode='wb', autocommit=False)
+
+        options = self.options
+        writer = pq.ParquetWriter(
+            f,
+            self.file_schema,
+            compression=options.compression or 'snappy',
+            compression_level=options.compression_level,
+            use_dictionary=(
+                True if options.use_dictionary is None else options.use_dictionary
+            ),
+            data_page_size=options.data_page_size,
+        )
+        return DatasetFile(path=path, f=f, writer=writer)
+
+    def close_file(self, file: DatasetFile):
+        file.writer.close()
+        file.f.close()
+        self.closed_files.append(file)
+
+    def split(self, table: pa.Table):
+        """
+        Разбивает строки по значениям столбцов секционирования
+        """
+        if not self.partition_cols:
+            yield (), table
+            return
+
+        keys = (
+            table.select(self.partition_cols)
+            .group_by(self.partition_cols)
+            .aggregate([])
+        )
+        for key in keys.to_pylist():
+            mask = None
+            for column, value in key.items():
+                condition = (
+                    pc.is_null(table[column])
+                    if value is None
+                    else pc.equal(table[column], value)
+                )
+                mask = condition if mask is None else pc.and_(mask, condition)
+
+            yield (
+                tuple(key.values()),
+                table.filter(mask).drop_columns(self.partition_cols),
+            )
+
+    def get_partition_folder(self, key: tuple) -> str:
+        parts = [
+            f'{column}={NULL_PARTITION if value is None else quote(str(value), safe="")}'
+            for column, value in zip(self.partition_cols, key)
+        ]
+        return '/'.join([self.root, *parts])
+
+    def get_max_rows_per_file(self, batch: pa.RecordBatch) -> int:
+        """
+        Максимальное количество строк в файле (0 - без ограничения): по параметру
+        max_rows_per_file и по размеру target_file_size_mb (размер строки
+        оценивается по объему несжатых данных первой порции)
+        """
+        limits = []
+        if self.options.max_rows_per_file:
+            limits.append(self.options.max_rows_per_file)
+        if self.options.target_file_size_mb:
+            row_size = max(batch.nbytes / batch.num_rows, 1)
+            limits.append(
+                max(int(self.options.target_file_size_mb * 1024 * 1024 / row_size), 1)
+            )
+        return min(limits) if limits else 0
 
 
 class ParquetService:
-    """ """
-    async def read_table(self, rows: list[dict]) -> pa.Table:
-        return pa.Table.from_pylist(rows)
-    
-    async def write_table_s3(self, table: pa.Table, s3_path: str, s3fs: S3FileSystem):
+    """
+    Запись данных в parquet.
+
+    Данные записываются в новые файлы в папке выгрузки с параметрами options
+    (сжатие, словарное кодирование, размер групп строк и файлов, секционирование).
+    Параметры из запроса переопределяют параметры по умолчанию. Между группами строк
+    проверяется срок выполнения запроса: если он истек, то запись прерывается,
+    а недописанные файлы удаляются (для S3 прерывается multipart-загрузка).
+
+    Вместо таблицы можно передать ленивый фрейм: тогда запрос выполняется потоковым
+    движком Polars, и результат пишется в файл в папке spill_folder по частям,
+    не занимая память целиком. Затем файл переносится в папку выгрузки, а если нужно
+    секционирование или разбиение на файлы, то читается по группам строк
+    и записывается заново
+    """
+
+    def __init__(
+        self,
+        spill_folder: Path | None = None,
+        options: ParquetWriterOptions | None = None,
+    ):
+        self.spill_folder = spill_folder or Path(tempfile.gettempdir())
+        self.options = options or ParquetWriterOptions()
+
+    def get_options(self, options: ParquetWriterOptions | None) -> ParquetWriterOptions:
+        """
+        Возвращает параметры записи: параметры по умолчанию, переопределенные
+        указанными в options
+        """
+        if options is None:
+            return self.options
+        return self.options.model_copy(update=options.model_dump(exclude_none=True))
+
+    async def read_table(self, frame: polars.DataFrame) -> pa.Table:
+        """
+        Возвращает arrow-таблицу для выгрузки данных в parquet
+        """
+        return frame.to_arrow(compat_level=polars.CompatLevel.oldest())
+
+    async def write_table_s3(
+        self,
+        table: pa.Table | polars.LazyFrame,
+        s3_path: str,
+        s3fs: S3FileSystem,
+        deadline: Deadline | None = None,
+        options: ParquetWriterOptions | None = None,
+        watermark_column: str | None = None,
+        drop_columns: list[str] | None = None,
+    ) -> Any:
         """ """
-        pq.write_to_dataset(table, root_path=s3_path, filesystem=s3fs)
+        return await self.write(
+            table, s3_path, s3fs, deadline, options, watermark_column, drop_columns
+        )
 
-    async def write_table_fs(self, table: pa.Table, fs_path: str):
+    async def write_table_fs(
+        self,
+        table: pa.Table | polars.LazyFrame,
+        fs_path: str,
+        deadline: Deadline | None = None,
+        options: ParquetWriterOptions | None = None,
+        watermark_column: str | None = None,
+        drop_columns: list[str] | None = None,
+    ) -> Any:
         """ """
-        pq.write_to_dataset(table, root_path=fs_path)
\ No newline at end of file
+        return await self.write(
+            table, fs_path, None, deadline, options, watermark_column, drop_columns
+        )
+
+    async def write(
+        self,
+        table: pa.Table | polars.LazyFrame,
+        folder: str,
+        filesystem: S3FileSystem | None,
+        deadline: Deadline | None,
+        options: ParquetWriterOptions | None,
+        watermark_column: str | None = None,
+        drop_columns: list[str] | None = None,
+    ) -> Any:
+        """
+        Записывает данные в папку folder: arrow-таблицу по группам строк в потоке,
+        ленивый запрос Polars - потоковым движком.
+
+        Для ленивого запроса можно указать столбец отметки инкрементальной выгрузки
+        watermark_column: тогда возвращается его максимальное значение в записанных
+        строках, а если строк нет, то файл не записывается и возвращается None.
+        Столбцы drop_columns (например, столбец отметки, который не выгружается)
+        не записываются в папку folder
+        """
+        if isinstance(table, polars.LazyFrame):
+            return await self.sink_dataset(
+                table,
+                folder,
+                filesystem,
+                deadline,
+                self.get_options(options),
+                watermark_column,
+                drop_columns,
+            )
+
+        if watermark_column is not None or drop_columns:
+            raise ValueError(
+                'Столбец отметки и исключаемые столбцы указываются только '
+                'для ленивого запроса'
+            )
+        await run_in_thread(
+            deadline, self.write_dataset, table, folder, filesystem, deadline, options
+        )
+
+    async def list_dataset(
+        self, folder: str, filesystem: S3FileSystem | None = None
+    ) -> dict[str, int]:
+        """
+        Возвращает parquet-файлы в папке выгрузки: путь относительно папки и размер
+        """
+        folder = folder.rstrip('/')
+
+        if filesystem is None:
+
+            def list_files():
+                root = Path(folder)
+                if not root.exists():
+                    return {}
+                return {
+                    str(p.relative_to(root)): p.stat().st_size
+                    for p in root.rglob('*.parquet')
+                }
+
+        else:
+
+            def list_files():
+                # список файлов в S3 кэшируется s3fs, поэтому читается заново
+                filesystem.invalidate_cache(folder)
+                if not filesystem.exists(folder):
+                    return {}
+                return {
+                    path[len(folder) + 1 :]: info['size']
+                    for path, info in filesystem.find(folder, detail=True).items()
+                    if path.endswith('.parquet')
+                }
+
+        return await asyncio.to_thread(list_files)
+
+    def write_dataset(
+        self,
+        table: pa.Table,
+        folder: str,
+        filesystem: S3FileSystem | None = None,
+        deadline: Deadline | None = None,
+        options: ParquetWriterOptions | None = None,
+    ):
+        """
+        Записывает данные в новые parquet-файлы в папке folder (в S3, если указана
+        filesystem, иначе в локальной файловой системе)
+        """
+        options = self.get_options(options)
+
+        writer = ParquetDatasetWriter(
+            folder, table.schema, options, filesystem, deadline
+        )
+        writer.write(table.to_batches(max_chunksize=writer.max_rows_per_group))
+
+    async def sink_dataset(
+        self,
+        frame: polars.LazyFrame,
+        folder: str,
+        filesystem: S3FileSystem | None,
+        deadline: Deadline | None,
+        options: ParquetWriterOptions,
+        watermark_column: str | None = None,
+        drop_columns: list[str] | None = None,
+    ) -> Any:
+        """
+        Выполняет запрос потоковым движком и записывает результат в папку folder.
+        Возвращает максимальное значение watermark_column в записанных строках
+        """
+        self.spill_folder.mkdir(parents=True, exist_ok=True)
+        spill_path = self.spill_folder / f'{uuid.uuid4().hex}.parquet'
+        try:
+            await self.sink(frame, spill_path, deadline, options)
+
+            watermark_value = None
+            if watermark_column is not None:
+                # отметка определяется по записанным строкам, а не повторным
+                # выполнением запроса
+                watermark_value = await run_in_thread(
+                    deadline, self.get_spill_max, spill_path, watermark_column
+                )
+                if watermark_value is None:
+                    return None
+
+            await run_in_thread(
+                deadline,
+                self.publish_spill,
+                spill_path,
+                folder,
+                filesystem,
+                deadline,
+                options,
+                drop_columns,
+            )
+            return watermark_value
+        finally:
+            # брошенная по сроку работа еще может писать или читать файл,
+            # поэтому он удаляется после ее завершения
+            pending = deadline.pending_work() if deadline is not None else None
+            if pending is None:
+                spill_path.unlink(missing_ok=True)
+            else:
+                pending.add_done_callback(lambda _: spill_path.unlink(missing_ok=True))
+
+    @staticmethod
+    def get_spill_max(spill_path: Path, column: str) -> Any:
+        """
+        Возвращает максимальное значение столбца в записанном файле (None, если
+        строк нет). Читается только этот столбец
+        """
+        return (
+            polars.scan_parquet(spill_path).select(polars.col(column).max()).collect()
+        ).item()
+
+    def publish_spill(
+        self,
+        spill_path: Path,
+        folder: str,
+        filesystem: S3FileSystem | None,
+        deadline: Deadline | None,
+        options: ParquetWriterOptions,
+        drop_columns: list[str] | None = None,
+    ):
+        """
+        Переносит записанный потоковым движком файл в папку folder, при необходимости
+        разбивая его на партиции и файлы (или исключая столбцы drop_columns)
+        """
+        if (
+            options.partition_cols
+            or options.max_rows_per_file
+            or options.target_file_size_mb
+            or drop_columns
+        ):
+            spill_file = pq.ParquetFile(spill_path)
+            schema = spill_file.schema_arrow
+            if drop_columns:
+                for name in drop_columns:
+                    schema = schema.remove(schema.get_field_index(name))
+
+            writer = ParquetDatasetWriter(folder, schema, options, filesystem, deadline)
+            writer.write(
+                spill_file.iter_batches(
+                    batch_size=writer.max_rows_per_group, columns=schema.names
+                )
+            )
+            return
+
+        file_path = f'{folder.rstrip("/")}/{uuid.uuid4().hex}-0.parquet'
+        if filesystem is None:
+            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(spill_path, file_path)
+        else:
+            # при ошибке загрузки multipart-загрузка прерывается,
+            # и файл в хранилище не появляется
+            filesystem.put_file(str(spill_path), file_path)
+
+    async def sink(
+        self,
+        frame: polars.LazyFrame,
+        path: Path,
+        deadline: Deadline | None,
+        options: ParquetWriterOptions,
+    ):
+        """
+        Выполняет запрос потоковым движком Polars и пишет результат в parquet-файл.
+        Словарное кодирование Polars выбирает сам, параметр use_dictionary
+        не используется
+        """
+        if deadline is not None:
+            # запрос еще не запущен, поэтому и не запускаем его
+            deadline.check()
+
+        compression = options.compression or 'snappy'
+        query = frame.sink_parquet(
+            path,
+            compression='uncompressed' if compression == 'none' else compression,
+            compression_level=options.compression_level,
+            row_group_size=options.max_rows_per_group,
+            data_page_size=options.data_page_size,
+            lazy=True,
+        ).collect(background=True, engine='streaming')
+        await run_in_thread(deadline, query.fetch_blocking, cancel=query.cancel)
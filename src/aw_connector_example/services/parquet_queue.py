@@ -1,11 +1,20 @@
 from pathlib import Path
 
+import json
+import uuid
+
 import aiofiles
 import aiofiles.os
 
 
 class ParquetQueue:
-    """ """
+    """
+    Очередь задач асинхронной выгрузки в parquet.
+
+    Статусы задач хранятся в файлах в папке root. Если эта папка общая (например,
+    volume, подключенный ко всем контейнерам коннектора), то статус задачи можно
+    получить в любом процессе, а не только в том, который принял запрос на выгрузку
+    """
     def __init__(self, root: Path):
         self.root = root
 
@@ -17,11 +26,19 @@ class ParquetQueue:
             return
         
         task_folder = self.root / task_id
-        await aiofiles.os.makedirs(task_folder)
-        async with aiofiles.open(task_folder / 'status', mode='w') as f:
-            await f.write('started')
+        await aiofiles.os.makedirs(task_folder, exist_ok=True)
+        await self.write_status(task_folder, 'started')
 
         return
+
+    async def run_task(self, task_id: str):
+        """
+        Отмечает, что задача взята в работу (ожидание в очереди закончилось)
+        """
+        task_folder = self.root / task_id
+
+        if await aiofiles.os.path.exists(task_folder):
+            await self.write_status(task_folder, 'running')
     
     async def finish_task(self, task_id: str):
         """ 
@@ -29,15 +46,13 @@ class ParquetQueue:
         task_folder = self.root / task_id
         
         if await aiofiles.os.path.exists(task_folder):
-            async with aiofiles.open(task_folder / 'status', mode='w') as f:
-                await f.write('finished')
+            await self.write_status(task_folder, 'finished')
 
     async def error_task(self, task_id: str, error: str):
         task_folder = self.root / task_id
         
         if await aiofiles.os.path.exists(task_folder):
-            async with aiofiles.open(task_folder / 'status', mode='w') as f:
-                await f.write(f'error: {error}')
+            await self.write_status(task_folder, f'error: {error}')
 
     async def clear_task(self, task_id: str):
         """ 
@@ -58,3 +73,62 @@ class ParquetQueue:
             async with aiofiles.open(task_status_file, mode='r') as f:
                 return await f.read()
         return 'not found'
+
+    async def start_batch(self, batch_id: str, objects: list[dict]):
+        """
+        Создает пакетную задачу: сохраняет описание объектов пакета и создает задачу
+        выгрузки для каждого объекта (см. get_batch_task_id)
+        """
+        batch_folder = self.root / batch_id
+        await aiofiles.os.makedirs(batch_folder, exist_ok=True)
+
+        tmp_batch_file = batch_folder / f'batch.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp_batch_file, mode='w') as f:
+            await f.write(json.dumps(objects, ensure_ascii=False))
+        await aiofiles.os.replace(tmp_batch_file, batch_folder / 'batch.json')
+
+        for index in range(len(objects)):
+            await self.start_task(self.get_batch_task_id(batch_id, index))
+
+    async def get_batch(self, batch_id: str) -> list[dict] | None:
+        """
+        Возвращает описание объектов пакетной задачи (или None, если ее нет)
+        """
+        batch_file = self.root / batch_id / 'batch.json'
+        if not await aiofiles.os.path.exists(batch_file):
+            return None
+
+        async with aiofiles.open(batch_file, mode='r') as f:
+            return json.loads(await f.read())
+
+    async def clear_batch(self, batch_id: str):
+        """ """
+        objects = await self.get_batch(batch_id)
+        for index in range(len(objects or [])):
+            await self.clear_task(self.get_batch_task_id(batch_id, index))
+
+        batch_folder = self.root / batch_id
+        batch_file = batch_folder / 'batch.json'
+        if await aiofiles.os.path.exists(batch_file):
+            await aiofiles.os.remove(batch_file)
+
+        if await aiofiles.os.path.exists(batch_folder):
+            await aiofiles.os.rmdir(batch_folder)
+
+    @staticmethod
+    def get_batch_task_id(batch_id: str, index: int) -> str:
+        """
+        Возвращает идентификатор задачи выгрузки объекта с номером index в пакете
+        """
+        return f'{batch_id}-{index}'
+
+    @staticmethod
+    async def write_status(task_folder: Path, status: str):
+        """
+        Записывает статус задачи. Файл сначала пишется во временный и затем
+        переименовывается, чтобы другие процессы не прочитали недописанный статус
+        """
+        tmp_status_file = task_folder / f'status.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp_status_file, mode='w') as f:
+            await f.write(status)
+        await aiofiles.os.replace(tmp_status_file, task_folder / 'status')
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+from typing import BinaryIO, Callable, Iterator, TYPE_CHECKING
+from pathlib import Path
+from abc import ABC, abstractmethod
+
+import io
+import itertools
+
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import polars
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+    from polars.io import plugins as polars_plugins
+else:
+    polars = lazy_import('polars')
+    pa = lazy_import('pyarrow')
+    pq = lazy_import('pyarrow.parquet')
+    polars_plugins = lazy_import('polars.io.plugins')
+
+
+class TableReader(ABC):
+    """
+    Чтение файлов таблиц источника одного формата.
+
+    Если формат можно читать сканером Polars (scannable, см. ScanReader), то таблица
+    читается лениво: проекция, условия фильтров и ограничение на количество строк
+    проталкиваются в чтение файла, и файл не загружается в память целиком. Иначе
+    файл читается целиком (см. DataRepository.read_table_file) и хранится в кэше
+    таблиц как колоночная копия
+    """
+
+    # расширения файлов формата (с точкой)
+    suffixes: tuple[str, ...] = ()
+    scannable: bool = False
+    # во сколько раз данные больше файла (для оценки памяти запроса по размеру файла)
+    compression_ratio: float = 1
+    # схема хранится в метаданных файла и читается без чтения данных (read_schema,
+    # см. MetadataSchemaReader)
+    schema_in_metadata: bool = False
+    # формат набора данных pyarrow, если файл в объектном хранилище читается
+    # диапазонами байтов без загрузки (scan_dataset), иначе None
+    dataset_format: str | None = None
+
+    def read(self, path: Path) -> bytes:
+        """
+        Возвращает содержимое файла (для форматов, которые читаются целиком)
+        """
+        return path.read_bytes()
+
+
+class ScanReader(TableReader):
+    """
+    Формат, который читается сканером Polars
+    """
+
+    scannable = True
+
+    def infer_schema(self, path: Path, sample_rows: int | None = None) -> polars.Schema:
+        """
+        Определяет схему таблицы по файлу: по первым sample_rows строкам или, если
+        sample_rows = None, по всем строкам (если схема не хранится в самом файле).
+
+        Сканер читает значения сразу в типы схемы, поэтому схема для чтения
+        таблицы определяется по всем строкам: иначе значение другого типа или новый
+        столбец после выборки приводят к ошибке чтения или теряются
+        """
+        return self.scan(path).collect_schema()
+
+    @abstractmethod
+    def scan(
+        self,
+        path: Path,
+        schema: polars.Schema | None = None,
+        n_rows: int | None = None,
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм с данными файла. Если указана схема schema, то
+        значения читаются сразу в типы этой схемы. Если указано n_rows, то читаются
+        только первые n_rows строк файла
+        """
+
+    def scan_dataset(
+        self, dataset: pads.Dataset, n_rows: int | None = None
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм с данными файла, открытого как набор данных pyarrow
+        (если указан dataset_format). Проекция и условия фильтров проталкиваются
+        в чтение набора данных
+        """
+        frame = polars.scan_pyarrow_dataset(dataset)
+        return frame if n_rows is None else frame.head(n_rows)
+
+
+class MetadataSchemaReader(ScanReader):
+    """
+    Формат, в котором схема хранится в метаданных файла
+    """
+
+    schema_in_metadata = True
+
+    @abstractmethod
+    def read_schema(self, file: BinaryIO) -> polars.Schema:
+        """
+        Читает схему таблицы из метаданных файла. Файл открыт с произвольным
+        доступом, и читаются только нужные диапазоны байтов
+        """
+
+
+class JsonReader(TableReader):
+    """
+    JSON-массив объектов. Файл разбирается целиком, поэтому читается один раз
+    и хранится в кэше таблиц
+    """
+
+    suffixes = ('.json',)
+
+
+class CompressedJsonReader(JsonReader):
+    """
+    JSON-массив объектов, сжатый gzip или zstd. Файл распаковывается потоком
+    один раз при построении колоночной копии таблицы
+    """
+
+    suffixes = ('.json.gz', '.json.zst')
+    compression_ratio = 10
+
+    def read(self, path: Path) -> bytes:
+        with pa.input_stream(str(path), compression='detect') as stream:
+            return stream.read()
+
+
+class NdjsonReader(ScanReader):
+    """
+    JSON-объекты по одному на строку (NDJSON)
+    """
+
+    suffixes = ('.ndjson', '.jsonl')
+
+    def infer_schema(self, path: Path, sample_rows: int | None = None) -> polars.Schema:
+        return polars.scan_ndjson(
+            path, infer_schema_length=sample_rows
+        ).collect_schema()
+
+    def scan(
+        self,
+        path: Path,
+        schema: polars.Schema | None = None,
+        n_rows: int | None = None,
+    ) -> polars.LazyFrame:
+        return polars.scan_ndjson(path, schema=schema, n_rows=n_rows)
+
+
+class CompressedNdjsonReader(ScanReader):
+    """
+    NDJSON, сжатый gzip или zstd.
+
+    Файл распаковывается потоком по частям, и каждая часть (целые строки) разбирается
+    отдельно, поэтому в памяти находится только одна распакованная часть. Первые части
+    небольшие и растут до max_chunk_size, поэтому для предпросмотра первых строк
+    распаковывается только начало файла
+    """
+
+    suffixes = ('.ndjson.gz', '.ndjson.zst', '.jsonl.gz', '.jsonl.zst')
+    compression_ratio = 10
+
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 8 * 1024 * 1024
+
+    def infer_schema(self, path: Path, sample_rows: int | None = None) -> polars.Schema:
+        if sample_rows is not None:
+            lines = list(itertools.islice(self.iter_lines(path), sample_rows))
+            if not lines:
+                return polars.Schema()
+            return polars.read_ndjson(
+                io.BytesIO(b''.join(lines)), infer_schema_length=None
+            ).schema
+
+        # схема по всем строкам: части файла разбираются по очереди, и типы
+        # столбцов объединяются в общий супертип
+        schemas = [
+            polars.DataFrame(
+                schema=polars.read_ndjson(
+                    io.BytesIO(chunk), infer_schema_length=None
+                ).schema
+            )
+            for chunk in self.iter_chunks(path)
+        ]
+        if not schemas:
+            return polars.Schema()
+        return polars.concat(schemas, how='diagonal_relaxed').schema
+
+    def scan(
+        self,
+        path: Path,
+        schema: polars.Schema | None = None,
+        n_rows: int | None = None,
+    ) -> polars.LazyFrame:
+        if schema is None:
+            schema = self.infer_schema(path)
+
+        def source(
+            with_columns: list[str] | None,
+            predicate: polars.Expr | None,
+            limit: int | None,
+            batch_size: int | None,
+        ) -> Iterator[polars.DataFrame]:
+            # Polars не применяет повторно условие и ограничение, переданные источнику
+            limits = [n for n in (limit, n_rows) if n is not None]
+            remaining = min(limits) if limits else None
+
+            for chunk in self.iter_chunks(path):
+                frame = polars.read_ndjson(io.BytesIO(chunk), schema=schema)
+                if predicate is not None:
+                    frame = frame.filter(predicate)
+                if with_columns is not None:
+                    frame = frame.select(with_columns)
+                if remaining is not None:
+                    frame = frame.head(remaining)
+                    remaining -= frame.height
+                yield frame
+                if remaining is not None and remaining <= 0:
+                    return
+
+        return polars_plugins.register_io_source(source, schema=schema)
+
+    def iter_chunks(self, path: Path) -> Iterator[bytes]:
+        """
+        Распаковывает файл потоком и возвращает части, состоящие из целых строк
+        """
+        chunk_size = self.min_chunk_size
+        with pa.input_stream(str(path), compression='detect') as stream:
+            tail = b''
+            while True:
+                data = stream.read(chunk_size)
+                if not data:
+                    break
+                chunk_size = min(chunk_size * 2, self.max_chunk_size)
+
+                data = tail + data
+                end = data.rfind(b'\n') + 1
+                if end == 0:
+                    tail = data
+                    continue
+                tail = data[end:]
+                yield data[:end]
+
+            if tail.strip():
+                yield tail
+
+    def iter_lines(self, path: Path) -> Iterator[bytes]:
+        """
+        Возвращает непустые строки распакованного файла
+        """
+        for chunk in self.iter_chunks(path):
+            for line in chunk.splitlines(keepends=True):
+                if line.strip():
+                    yield line if line.endswith(b'\n') else line + b'\n'
+
+
+class CsvReader(ScanReader):
+    """
+    CSV с заголовком (разделитель - запятая)
+    """
+
+    suffixes = ('.csv',)
+
+    def infer_schema(self, path: Path, sample_rows: int | None = None) -> polars.Schema:
+        return polars.scan_csv(path, infer_schema_length=sample_rows).collect_schema()
+
+    def scan(
+        self,
+        path: Path,
+        schema: polars.Schema | None = None,
+        n_rows: int | None = None,
+    ) -> polars.LazyFrame:
+        return polars.scan_csv(path, schema=schema, n_rows=n_rows)
+
+
+class ParquetReader(MetadataSchemaReader):
+    """
+    Parquet. Схема хранится в файле, а группы строк, которые не могут удовлетворять
+    условиям фильтров, пропускаются по статистикам файла
+    """
+
+    suffixes = ('.parquet',)
+    dataset_format = 'parquet'
+
+    def read_schema(self, file: BinaryIO) -> polars.Schema:
+        return polars.from_arrow(pq.read_schema(file).empty_table()).schema
+
+    def scan(
+        self,
+        path: Path,
+        schema: polars.Schema | None = None,
+        n_rows: int | None = None,
+    ) -> polars.LazyFrame:
+        return polars.scan_parquet(path, n_rows=n_rows)
+
+
+class ArrowReader(MetadataSchemaReader):
+    """
+    Arrow IPC (Feather v2). Файл отображается в память
+    """
+
+    suffixes = ('.arrow', '.feather', '.ipc')
+    dataset_format = 'ipc'
+
+    def read_schema(self, file: BinaryIO) -> polars.Schema:
+        return polars.from_arrow(pa.ipc.open_file(file).schema.empty_table()).schema
+
+    def scan(
+        self,
+        path: Path,
+        schema: polars.Schema | None = None,
+        n_rows: int | None = None,
+    ) -> polars.LazyFrame:
+        return polars.scan_ipc(path, memory_map=True, n_rows=n_rows)
+
+
+class ReaderRegistry:
+    """
+    Реестр форматов файлов таблиц: по расширению файла определяется, как его читать.
+    В каталоге источника показываются только файлы зарегистрированных форматов.
+    Новый формат добавляется методом register
+    """
+
+    def __init__(self, readers: list[TableReader] | None = None):
+        self.readers: list[TableReader] = []
+        for reader in (
+            readers
+            if readers is not None
+            else [
+                JsonReader(),
+                NdjsonReader(),
+                CsvReader(),
+                ParquetReader(),
+                ArrowReader(),
+                CompressedJsonReader(),
+                CompressedNdjsonReader(),
+            ]
+        ):
+            self.register(reader)
+
+    def register(self, reader: TableReader):
+        """
+        Добавляет формат. Если файлы таблицы есть в нескольких форматах, то читается
+        файл формата, зарегистрированного раньше
+        """
+        self.readers.append(reader)
+
+    @property
+    def suffixes(self) -> list[str]:
+        """
+        Расширения файлов всех форматов в порядке регистрации
+        """
+        return [suffix for reader in self.readers for suffix in reader.suffixes]
+
+    def get(self, path: Path) -> TableReader | None:
+        """
+        Возвращает формат файла таблицы (или None, если формат не поддерживается)
+        """
+        match = self.split_name(path.name)
+        return match[1] if match is not None else None
+
+    def split_name(self, file_name: str) -> tuple[str, TableReader] | None:
+        """
+        Возвращает название таблицы (имя файла без расширения) и формат файла.
+        Если подходит несколько расширений, то выбирается самое длинное
+        (например, .json.gz, а не .gz)
+        """
+        matches = [
+            (suffix, reader)
+            for reader in self.readers
+            for suffix in reader.suffixes
+            if file_name.endswith(suffix) and len(file_name) > len(suffix)
+        ]
+        if not matches:
+            return None
+
+        suffix, reader = max(matches, key=lambda m: len(m[0]))
+        return file_name[: -len(suffix)], reader
+
+    def find(
+        self,
+        folder: Path,
+        table_name: str,
+        is_file: Callable[[Path], bool] = Path.is_file,
+    ) -> Path | None:
+        """
+        Возвращает путь к файлу таблицы table_name в папке схемы (или None).
+        Наличие файла проверяется функцией is_file (например, по списку объектов
+        в объектном хранилище)
+        """
+        for suffix in self.suffixes:
+            path = folder / f'{table_name}{suffix}'
+            if is_file(path):
+                return path
+        return None
@@ -1,23 +1,51 @@
-from typing import Any
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
 from pathlib import Path
 
-import os
-import json
+import copy
+import asyncio
+import hashlib
 import datetime
 
-import aiofiles.os
-from sqlglot import parse_one, exp
-import polars
-from polars.sql import SQLContext
-
 from aw_connector_example.dto import (
     DataSource,
     DataSourceObject,
+    MaterializedViewInfo,
     ObjectMeta,
     ObjectColumnMeta,
+    ObjectColumnStats,
+    ObjectStats,
     SimpleType,
     ParquetFilterExpr,
 )
+from aw_connector_example.services.filters import (
+    CompiledFilter,
+    FilterCompiler,
+    FilterError,
+    Predicate,
+    compile_filters,
+)
+from aw_connector_example.services.deadline import Deadline, run_in_thread
+from aw_connector_example.services.readers import ReaderRegistry
+from aw_connector_example.services.schema import SchemaInference, TableSchema
+from aw_connector_example.services.shared_loads import SharedLoads
+from aw_connector_example.services.sql_pushdown import analyze_sql
+from aw_connector_example.services.statistics import TableStatistics
+from aw_connector_example.services.storage import LocalStorage, ObjectStorage
+from aw_connector_example.services.table_cache import CachedTable, TableCache
+from aw_connector_example.services.views import ViewDefinition, ViewStore
+from aw_connector_example.services.watermark import Watermark
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import sqlglot
+    from sqlglot import exp
+    import polars
+else:
+    sqlglot = lazy_import('sqlglot')
+    exp = lazy_import('sqlglot.expressions')
+    polars = lazy_import('polars')
 
 
 class DataRepositoryError(Exception):
@@ -31,8 +59,52 @@ class DataRepository:
     Репозиторий доступа к данным
     """
 
-    def __init__(self, root_folder: Path):
+    # во сколько раз объем памяти для чтения таблицы больше размера ее файла
+    # (содержимое файла и декодированный фрейм)
+    memory_factor = 2
+
+    def __init__(
+        self,
+        root_folder: Path,
+        table_cache: TableCache | None = None,
+        schema_inference: SchemaInference | None = None,
+        streaming_threshold: int = 0,
+        views: ViewStore | None = None,
+        readers: ReaderRegistry | None = None,
+        storage: LocalStorage | ObjectStorage | None = None,
+        stats_precision: int = 14,
+    ):
         self.root = root_folder
+        self.table_cache = table_cache
+        self.schema_inference = schema_inference or SchemaInference()
+        # начиная с какой оценки памяти (в байтах) запросы выполняются потоковым
+        # движком Polars (0 - не использовать потоковое выполнение)
+        self.streaming_threshold = streaming_threshold
+        # материализованные представления (None - представления отключены)
+        self.views = views
+        # форматы файлов таблиц
+        self.readers = readers or ReaderRegistry()
+        # хранилище файлов таблиц: локальная папка root_folder или объектное хранилище
+        # (тогда root_folder - логический путь к корню хранилища)
+        self.storage = storage or LocalStorage(root_folder)
+        # точность оценки количества различных значений в статистиках столбцов
+        # (HyperLogLog с 2^stats_precision регистрами)
+        self.stats_precision = stats_precision
+        # общие загрузки таблиц и списков объектов (см. share_loads)
+        self.shared_loads: SharedLoads | None = None
+        # схемы таблиц, если кэш таблиц отключен: ключ файла -> (версия, схема)
+        self.schemas: dict[str, tuple[str, TableSchema]] = {}
+
+    def share_loads(self) -> DataRepository:
+        """
+        Возвращает репозиторий, в котором списки объектов источника и таблицы
+        загружаются один раз для всех запросов к нему (например, для всех объектов
+        пакетной выгрузки). Загруженные данные хранятся, пока используется
+        возвращенный репозиторий
+        """
+        repo = copy.copy(self)
+        repo.shared_loads = SharedLoads()
+        return repo
 
     async def ping_data_source(self, data_source: DataSource):
         """
@@ -45,7 +117,7 @@ class DataRepository:
             Описание источника данных, к которому проверяется подключение
         """
         db_name, db_path = self.get_db(data_source)
-        if not db_path.exists():
+        if not self.storage.exists(db_path):
             raise DataRepositoryError(f'База данных {db_name} не найдена')
 
     async def get_objects(
@@ -62,6 +134,19 @@ class DataRepository:
             Возвратить только те объекты источника, в названии которых есть
             эта подстрока
         """
+        if self.shared_loads is not None:
+            return await self.shared_loads.get(
+                ('objects', data_source.params.get('db'), query_string),
+                lambda: self.list_objects(data_source, query_string),
+            )
+        return await self.list_objects(data_source, query_string)
+
+    async def list_objects(
+        self, data_source: DataSource, query_string: str | None = None
+    ) -> list[DataSourceObject]:
+        """
+        Читает список объектов из папки базы данных источника
+        """
         objects = []
 
         if 'db' not in data_source.params:
@@ -69,12 +154,21 @@ class DataRepository:
 
         db_name = str(data_source.params['db'])
         db_path = self.root / db_name
-        if not db_path.exists():
+        if not await asyncio.to_thread(self.storage.exists, db_path):
             raise DataRepositoryError(f'База данных {db_name} не найдена')
 
-        for schema in await aiofiles.os.listdir(db_path):
-            for file in await aiofiles.os.listdir(db_path / schema):
-                table_name = os.path.splitext(file)[0]
+        for schema in await asyncio.to_thread(self.storage.listdir, db_path):
+            # в каталоге показываются только файлы поддерживаемых форматов (таблица,
+            # которая есть в нескольких форматах, показывается один раз)
+            table_names = []
+            for file in sorted(
+                await asyncio.to_thread(self.storage.listdir, db_path / schema)
+            ):
+                match = self.readers.split_name(file)
+                if match is not None and match[0] not in table_names:
+                    table_names.append(match[0])
+
+            for table_name in table_names:
                 if not query_string or query_string in table_name:
                     objects.append(
                         DataSourceObject(
@@ -84,6 +178,15 @@ class DataRepository:
                         )
                     )
 
+        if self.views is not None:
+            for view in await self.views.list(db_name):
+                if not query_string or query_string in view.name:
+                    objects.append(
+                        DataSourceObject(
+                            schema=view.schema, name=view.name, type='view'
+                        )
+                    )
+
         return objects
 
     async def get_object_meta(
@@ -92,10 +195,44 @@ class DataRepository:
         """
         Возвращает метаданные источника данных
         """
-        rows = await self.get_rows(data_source, object_name)
+        view = await self.get_view(data_source, object_name)
+        if view is not None:
+            return await self.get_sql_meta(data_source, view.query_text)
+
+        table_path = self.get_table_path(data_source, object_name)
+        schema = await self.get_table_schema(table_path)
 
         return ObjectMeta(
-            columns=self.get_columns_meta_for_row(rows[0]), foreign_keys=[]
+            columns=self.get_columns_meta_for_schema(schema), foreign_keys=[]
+        )
+
+    async def get_object_stats(
+        self,
+        data_source: DataSource,
+        object_name: str,
+        deadline: Deadline | None = None,
+    ) -> ObjectStats:
+        """
+        Возвращает статистики объекта источника: количество строк, количество null,
+        оценку количества различных значений и min/max каждого столбца
+        """
+        stats = await self.load_stats(data_source, object_name, deadline)
+
+        return ObjectStats(
+            row_count=stats.row_count,
+            size=stats.size,
+            columns=[
+                ObjectColumnStats(
+                    name=name,
+                    type=column.type,
+                    null_count=column.null_count,
+                    distinct_count=column.distinct_count,
+                    min=column.min,
+                    max=column.max,
+                    size=column.size,
+                )
+                for name, column in stats.columns.items()
+            ],
         )
 
     async def get_object_data(
@@ -105,27 +242,120 @@ class DataRepository:
         limit: int | None = None,
         offset: int | None = None,
         filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
     ) -> list[dict]:
         """ """
-        rows = await self.get_rows(data_source, object_name)
+        frame = await self.get_object_frame(
+            data_source,
+            object_name,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            columns=columns,
+            deadline=deadline,
+        )
+        return frame.to_dicts()
 
-        if filters:
-            rows = self.apply_filters(rows, filters)
+    async def get_object_frame(
+        self,
+        data_source: DataSource,
+        object_name: str,
+        limit: int | None = None,
+        offset: int | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
+    ) -> polars.DataFrame:
+        """
+        Возвращает данные объекта источника в виде DataFrame. Фильтры и ограничение
+        на количество строк применяются до материализации данных.
+
+        Если указан список столбцов columns, то читаются только эти столбцы
+        (и столбцы, участвующие в фильтрах). Несуществующие столбцы игнорируются
+        """
+        streaming = await self.use_streaming(
+            data_source, object_name=object_name, filters=filters
+        )
+        frame = await self.query_object(
+            data_source,
+            object_name,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            columns=columns,
+            deadline=deadline,
+            streaming=streaming,
+        )
+
+        return await self.collect(frame, deadline=deadline, streaming=streaming)
+
+    async def query_object(
+        self,
+        data_source: DataSource,
+        object_name: str,
+        limit: int | None = None,
+        offset: int | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
+        streaming: bool = False,
+        order_by: str | None = None,
+        watermark: Watermark | None = None,
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм с данными объекта источника, к которому применены
+        фильтры, проекция и ограничение на количество строк.
 
-        return (
-            rows[offset : offset + limit]
-            if limit is not None and offset is not None
-            else rows
+        Если указана отметка watermark, то выбираются только строки, в которых
+        значение столбца отметки больше значения отметки
+        """
+        # без фильтров и сортировки нужны только первые offset + limit строк файла
+        n_rows = (
+            offset + limit
+            if limit is not None
+            and offset is not None
+            and not filters
+            and watermark is None
+            and order_by is None
+            else None
+        )
+        frame = await self.scan_object(
+            data_source,
+            object_name,
+            filters=filters,
+            columns=self.with_watermark_column(columns, watermark),
+            deadline=deadline,
+            streaming=streaming,
+            n_rows=n_rows,
+            watermark=watermark,
+        )
+
+        return self.prepare(
+            frame,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            columns=columns,
+            order_by=order_by,
+            watermark=watermark,
         )
 
-    async def get_sql_meta(self, data_source: DataSource, sql_text: str) -> ObjectMeta:
+    async def get_sql_meta(
+        self,
+        data_source: DataSource,
+        sql_text: str,
+        deadline: Deadline | None = None,
+    ) -> ObjectMeta:
         """
-        Получение метаданных SQL запроса
+        Получение метаданных SQL запроса. Схема результата определяется по плану
+        запроса, сам запрос не выполняется
         """
-        rows = await self.get_sql_rows(data_source, sql_text)
+        frame = await self.scan_sql(data_source, sql_text, deadline=deadline)
 
         return ObjectMeta(
-            columns=self.get_columns_meta_for_row(rows[0]), foreign_keys=[]
+            columns=self.get_columns_meta_for_schema(frame.collect_schema()),
+            foreign_keys=[],
         )
 
     async def get_sql_data(
@@ -135,21 +365,346 @@ class DataRepository:
         limit: int | None = None,
         offset: int | None = None,
         filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
     ) -> list[dict]:
         """
         Получение данных SQL запроса
         """
-        rows = await self.get_sql_rows(data_source, sql_text)
+        frame = await self.get_sql_frame(
+            data_source,
+            sql_text,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            columns=columns,
+            deadline=deadline,
+        )
+        return frame.to_dicts()
 
-        if filters:
-            rows = self.apply_filters(rows, filters)
+    async def get_sql_frame(
+        self,
+        data_source: DataSource,
+        sql_text: str,
+        limit: int | None = None,
+        offset: int | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
+    ) -> polars.DataFrame:
+        """
+        Возвращает результат SQL запроса в виде DataFrame. Если указан список столбцов
+        columns, то запрос оборачивается в проекцию на эти столбцы
+        """
+        streaming = await self.use_streaming(data_source, sql_text=sql_text)
+        frame = await self.query_sql(
+            data_source,
+            sql_text,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            columns=columns,
+            deadline=deadline,
+            streaming=streaming,
+        )
+
+        return await self.collect(frame, deadline=deadline, streaming=streaming)
+
+    async def query_sql(
+        self,
+        data_source: DataSource,
+        sql_text: str,
+        limit: int | None = None,
+        offset: int | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
+        streaming: bool = False,
+        order_by: str | None = None,
+        watermark: Watermark | None = None,
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм с результатом SQL запроса, к которому применены
+        фильтры, проекция и ограничение на количество строк.
 
-        return (
-            rows[offset : offset + limit]
-            if limit is not None and offset is not None
-            else rows
+        Если указана отметка watermark, то выбираются только строки, в которых
+        значение столбца отметки больше значения отметки
+        """
+        frame = await self.scan_sql(
+            data_source,
+            sql_text,
+            filters=filters,
+            columns=self.with_watermark_column(columns, watermark),
+            deadline=deadline,
+            streaming=streaming,
         )
 
+        return self.prepare(
+            frame,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            columns=columns,
+            order_by=order_by,
+            watermark=watermark,
+        )
+
+    async def use_streaming(
+        self,
+        data_source: DataSource,
+        object_name: str | None = None,
+        sql_text: str | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+    ) -> bool:
+        """
+        Проверяет, нужно ли выполнять запрос потоковым движком Polars: оценка памяти
+        для запроса не меньше streaming_threshold. Потоковое выполнение возможно только
+        при включенном кэше таблиц (таблицы читаются из колоночных копий по частям)
+        """
+        if not self.streaming_threshold or self.table_cache is None:
+            return False
+
+        memory = await self.estimate_memory(
+            data_source, object_name=object_name, sql_text=sql_text, filters=filters
+        )
+        return memory >= self.streaming_threshold
+
+    async def get_version(
+        self,
+        data_source: DataSource,
+        object_name: str | None = None,
+        sql_text: str | None = None,
+    ) -> str:
+        """
+        Возвращает версию данных, от которых зависят список объектов источника
+        и метаданные объекта (или SQL запроса): время изменения папок базы данных
+        и схем (меняется при добавлении и удалении таблиц), а также размер и время
+        изменения файла таблицы object_name или таблиц из SQL запроса и ревизия
+        их схем. Версия определяется по метаданным файлов, сами файлы не читаются
+        """
+        db_name, db_path = self.get_db(data_source)
+        if not await asyncio.to_thread(self.storage.exists, db_path):
+            raise DataRepositoryError(f'База данных {db_name} не найдена')
+
+        schemas = sorted(await asyncio.to_thread(self.storage.listdir, db_path))
+        version = []
+        for path in [db_path, *(db_path / schema for schema in schemas)]:
+            stat = await asyncio.to_thread(self.storage.stat, path)
+            version.append(f'{path.name}:{stat.version}')
+
+        if sql_text is not None:
+            # таблица ищется по названию во всех схемах (как в get_sql_objects)
+            tables = sqlglot.parse_one(sql_text).find_all(exp.Table)
+            names = sorted({t.name for t in tables})
+            object_names = [f'{schema}.{name}' for schema in schemas for name in names]
+            views = [v for v in await self.list_views(data_source) if v.name in names]
+        else:
+            object_names = [object_name] if object_name else []
+            view = (
+                await self.get_view(data_source, object_name) if object_name else None
+            )
+            views = [view] if view is not None else []
+
+        for name in object_names:
+            schema, _, table = name.partition('.')
+            table_path = await asyncio.to_thread(
+                self.readers.find, db_path / schema, table, self.storage.is_file
+            )
+            try:
+                stat = (
+                    await asyncio.to_thread(self.storage.stat, table_path)
+                    if table_path
+                    else None
+                )
+            except FileNotFoundError:
+                stat = None
+            if stat is None:
+                continue
+            version.append(f'{table_path.name}:{stat.version}')
+
+            # схема по выборке строк заменяется после чтения всех строк файла
+            table_schema = await asyncio.to_thread(self.find_saved_schema, table_path)
+            if table_schema is not None and table_schema.revision:
+                version.append(f'schema:{table_schema.revision}')
+
+        # список представлений меняет список объектов, а данные представления -
+        # его метаданные
+        all_views = await self.list_views(data_source)
+        version.append(f'views:{",".join(v.object_name for v in all_views)}')
+        for view in views:
+            view_version = await self.get_view_version(data_source, view)
+            version.append(f'{view.object_name}:{view_version}')
+
+        return '\n'.join(version)
+
+    # --------------------------------------------------------------------
+    # Материализованные представления
+    # --------------------------------------------------------------------
+    async def list_views(self, data_source: DataSource) -> list[ViewDefinition]:
+        """
+        Возвращает материализованные представления источника
+        """
+        if self.views is None:
+            return []
+
+        db_name, _ = self.get_db(data_source)
+        return await self.views.list(db_name)
+
+    async def get_view(
+        self, data_source: DataSource, object_name: str
+    ) -> ViewDefinition | None:
+        """
+        Возвращает материализованное представление по названию объекта (или None,
+        если такого представления нет)
+        """
+        if self.views is None:
+            return None
+
+        db_name, _ = self.get_db(data_source)
+        return await self.views.get(db_name, object_name)
+
+    async def register_view(self, data_source: DataSource, view: ViewDefinition):
+        """
+        Регистрирует материализованное представление (или заменяет существующее).
+        Запрос представления проверяется по плану, но не выполняется. Представление
+        может обращаться только к таблицам источника (не к другим представлениям)
+        """
+        if self.views is None:
+            raise DataRepositoryError('Материализованные представления отключены')
+
+        db_name, db_path = self.get_db(data_source)
+        if not await asyncio.to_thread(self.storage.exists, db_path):
+            raise DataRepositoryError(f'База данных {db_name} не найдена')
+
+        # таблицы в SQL запросах ищутся по названию без схемы, поэтому названия
+        # представлений не должны совпадать с названиями других объектов
+        for obj in await self.list_objects(data_source):
+            if obj.name == view.name and (
+                obj.type != 'view' or obj.schema_name != view.schema
+            ):
+                raise DataRepositoryError(
+                    f'В источнике уже есть объект {obj.schema_name}.{obj.name}'
+                )
+
+        for object_name in (
+            await self.get_sql_objects(data_source, view.query_text)
+        ).values():
+            if await self.get_view(data_source, object_name) is not None:
+                raise DataRepositoryError(
+                    f'Представление не может обращаться к другому представлению {object_name}'
+                )
+
+        try:
+            await self.get_sql_meta(data_source, view.query_text)
+        except DataRepositoryError:
+            raise
+        except Exception as e:
+            raise DataRepositoryError(f'Некорректный SQL запрос представления: {e}')
+
+        await self.views.put(db_name, view)
+
+    async def drop_view(self, data_source: DataSource, object_name: str):
+        """
+        Удаляет материализованное представление и его результат
+        """
+        db_name, _ = self.get_db(data_source)
+        if self.views is None or not await self.views.delete(db_name, object_name):
+            raise DataRepositoryError(f'Представление {object_name} не найдено')
+
+    async def get_views_info(
+        self, data_source: DataSource
+    ) -> list[MaterializedViewInfo]:
+        """
+        Возвращает представления источника и состояние их результатов
+        """
+        db_name, _ = self.get_db(data_source)
+
+        views_info = []
+        for view in await self.list_views(data_source):
+            try:
+                version = await self.get_view_version(data_source, view)
+                fresh = self.views.get_table(db_name, view, version) is not None
+            except DataRepositoryError:
+                # таблицы представления удалены
+                fresh = False
+            refreshed_at = self.views.get_refreshed_at(db_name, view)
+            views_info.append(
+                MaterializedViewInfo(
+                    schema=view.schema,
+                    name=view.name,
+                    query_text=view.query_text,
+                    fresh=fresh,
+                    refreshed_at=(
+                        datetime.datetime.fromtimestamp(
+                            refreshed_at, tz=datetime.timezone.utc
+                        )
+                        if refreshed_at is not None
+                        else None
+                    ),
+                )
+            )
+
+        return views_info
+
+    async def get_view_version(
+        self, data_source: DataSource, view: ViewDefinition
+    ) -> str:
+        """
+        Возвращает версию данных представления: хэш текста запроса и версий (размера
+        и времени изменения или ETag) файлов таблиц, к которым он обращается
+        """
+        parts = [view.query_text]
+        for table_path in await self.get_table_paths(
+            data_source, sql_text=view.query_text
+        ):
+            stat = await asyncio.to_thread(self.storage.stat, table_path)
+            parts.append(f'{table_path}:{stat.version}')
+
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+    async def load_view(
+        self,
+        data_source: DataSource,
+        view: ViewDefinition,
+        deadline: Deadline | None = None,
+    ) -> CachedTable:
+        """
+        Возвращает результат представления для текущей версии данных. Если таблицы
+        представления изменились, то запрос представления выполняется заново
+        (один раз для всех процессов, ожидающих результат)
+        """
+        if self.shared_loads is not None:
+            return await self.shared_loads.get(
+                ('view', data_source.params.get('db'), view.object_name),
+                lambda: self.build_view(data_source, view, deadline),
+            )
+        return await self.build_view(data_source, view, deadline)
+
+    async def build_view(
+        self,
+        data_source: DataSource,
+        view: ViewDefinition,
+        deadline: Deadline | None = None,
+    ) -> CachedTable:
+        """ """
+        db_name, _ = self.get_db(data_source)
+        version = await self.get_view_version(data_source, view)
+
+        cached_table = self.views.get_table(db_name, view, version)
+        if cached_table is None:
+            async with self.views.lock(db_name, view):
+                # пока ожидали блокировку, представление мог пересчитать другой процесс
+                cached_table = self.views.get_table(db_name, view, version)
+                if cached_table is None:
+                    frame = await self.get_sql_frame(
+                        data_source, view.query_text, deadline=deadline
+                    )
+                    cached_table = await asyncio.to_thread(
+                        self.views.put_table, db_name, view, version, frame
+                    )
+
+        return cached_table
+
     # --------------------------------------------------------------------
     # Внутренние методы
     # --------------------------------------------------------------------
@@ -166,13 +721,13 @@ class DataRepository:
 
         return db_name, db_path
 
-    async def get_rows(self, data_source: DataSource, object_name: str) -> list[dict]:
+    def get_table_path(self, data_source: DataSource, object_name: str) -> Path:
         """
-        Возвращает строки из базы данных
+        Возвращает путь к файлу с данными таблицы
         """
         db_name, db_path = self.get_db(data_source)
-        if not db_path.exists():
-            raise DataRepositoryError(f'База данных {db_name} не найдена')
+        if not self.storage.exists(db_path):
+            raise DataRepositoryError(f'База данных {db_name} не найдена')
 
         if '.' not in object_name:
             raise DataRepositoryError(
@@ -180,92 +735,732 @@ class DataRepository:
             )
 
         schema, table = object_name.split('.', maxsplit=1)
-        table_path = db_path / schema / f'{table}.json'
-        if not table_path.exists():
+        table_path = self.readers.find(db_path / schema, table, self.storage.is_file)
+        if table_path is None:
             raise DataRepositoryError(
-                f'Таблица {table} не найдена в базе данных {db_name}'
+                f'Таблица {table} не найдена в базе данных {db_name}'
+            )
+
+        return table_path
+
+    async def scan_object(
+        self,
+        data_source: DataSource,
+        object_name: str,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
+        streaming: bool = False,
+        n_rows: int | None = None,
+        watermark: Watermark | None = None,
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм (LazyFrame) с данными объекта источника.
+
+        Если включен кэш таблиц, то данные читаются из колоночной копии таблицы,
+        при этом фрагменты, которые не могут удовлетворять условиям filters
+        и отметке watermark, пропускаются,
+        а из остальных читаются только столбцы из columns и filters.
+        При потоковом выполнении (streaming) копия таблицы сканируется Polars
+        по частям во время выполнения запроса.
+        Сами условия к фрейму не применяются.
+
+        n_rows - сколько первых строк объекта нужно запросу (None - все строки).
+        Файлы, которые читаются сканерами Polars, читаются только до n_rows строк
+        """
+        if deadline is not None:
+            deadline.check()
+
+        view = await self.get_view(data_source, object_name)
+        if view is not None:
+            # результат представления хранится так же, как колоночная копия таблицы
+            cached_table = await self.load_view(data_source, view, deadline)
+        else:
+            table_path = self.get_table_path(data_source, object_name)
+
+            reader = self.readers.get(table_path)
+            if reader.scannable:
+                # проекция, фильтры и ограничение на количество строк проталкиваются
+                # в чтение файла сканером Polars
+                if (
+                    reader.dataset_format is not None
+                    and self.storage.get_local_path(table_path) is None
+                ):
+                    # файл из объектного хранилища не скачивается целиком: читаются
+                    # только нужные диапазоны байтов
+                    frame = reader.scan_dataset(
+                        await asyncio.to_thread(
+                            self.storage.open_dataset,
+                            table_path,
+                            reader.dataset_format,
+                        ),
+                        n_rows=n_rows,
+                    )
+                else:
+                    frame = reader.scan(
+                        await self.storage.fetch(table_path, deadline),
+                        schema=await self.get_table_schema(table_path),
+                        n_rows=n_rows,
+                    )
+                projection = self.get_projection(
+                    frame.collect_schema(), columns, filters
+                )
+                return frame if projection is None else frame.select(projection)
+
+            if self.table_cache is None:
+                frame = (await self.load_table(table_path, deadline)).lazy()
+                projection = self.get_projection(
+                    frame.collect_schema(), columns, filters
+                )
+                return frame if projection is None else frame.select(projection)
+
+            cached_table = await self.load_table(table_path, deadline)
+
+        schema = cached_table.schema
+        if streaming:
+            return cached_table.scan_file(
+                columns=self.get_projection(schema, columns, filters)
             )
 
-        async with aiofiles.open(table_path, mode='r') as f:
-            return json.loads(await f.read())
+        compiled = self.compile_filters(filters, schema)
+        predicates = list(compiled.predicates) if compiled else []
+        if watermark is not None:
+            predicates.append(self.get_watermark_predicate(schema, watermark))
 
-    async def get_sql_rows(self, data_source: DataSource, sql_text: str) -> list[dict]:
+        return cached_table.scan(
+            predicates=predicates or None,
+            columns=self.get_projection(schema, columns, filters),
+        )
+
+    async def get_object_schema(
+        self,
+        data_source: DataSource,
+        object_name: str,
+        deadline: Deadline | None = None,
+    ) -> polars.Schema:
+        """
+        Возвращает схему объекта источника (таблицы или представления)
+        """
+        view = await self.get_view(data_source, object_name)
+        if view is not None:
+            return (await self.load_view(data_source, view, deadline)).schema
+
+        return await self.get_table_schema(
+            self.get_table_path(data_source, object_name)
+        )
+
+    async def load_stats(
+        self,
+        data_source: DataSource,
+        object_name: str,
+        deadline: Deadline | None = None,
+    ) -> TableStatistics:
+        """
+        Возвращает статистики объекта источника. Статистики вычисляются один раз
+        для каждой версии таблицы (результата представления) и сохраняются рядом
+        с ее колоночной копией. Если кэш таблиц выключен, то статистики таблиц
+        вычисляются при каждом запросе
+        """
+        view = await self.get_view(data_source, object_name)
+        if view is not None:
+            cached_table = await self.load_view(data_source, view, deadline)
+            stats_path = cached_table.path.with_suffix('.stats.json')
+        elif self.table_cache is not None:
+            stats_path = await asyncio.to_thread(
+                self.table_cache.get_stats_path,
+                self.get_table_path(data_source, object_name),
+            )
+        else:
+            stats_path = None
+
+        if stats_path is not None:
+            stats = await asyncio.to_thread(TableCache.read_stats, stats_path)
+            if stats is not None:
+                return stats
+
+        # таблица сканируется по частям, поэтому в память не загружается целиком
+        frame = await self.scan_object(
+            data_source, object_name, deadline=deadline, streaming=True
+        )
+        try:
+            stats = await run_in_thread(
+                deadline, TableStatistics.compute, frame, self.stats_precision
+            )
+        except polars.exceptions.PolarsError as e:
+            raise DataRepositoryError(
+                f'Не удалось вычислить статистики объекта {object_name}: {e}'
+            )
+
+        if stats_path is not None:
+            await asyncio.to_thread(TableCache.write_stats, stats_path, stats)
+
+        return stats
+
+    def get_table_stats(self, table_path: Path) -> TableStatistics | None:
+        """
+        Возвращает сохраненные статистики текущей версии таблицы (статистики не
+        вычисляются, если их еще нет)
+        """
+        if self.table_cache is None:
+            return None
+        return self.table_cache.get_stats(table_path)
+
+    async def load_table(
+        self, table_path: Path, deadline: Deadline | None = None
+    ) -> CachedTable | polars.DataFrame:
+        """
+        Загружает таблицу: колоночную копию из кэша таблиц (копия строится, если
+        ее еще нет), а если кэш таблиц выключен - данные файла таблицы.
+        В репозитории с общими загрузками таблица загружается один раз
+        """
+        if self.shared_loads is not None:
+            return await self.shared_loads.get(
+                ('table', str(table_path)),
+                lambda: self.build_table(table_path, deadline),
+            )
+        return await self.build_table(table_path, deadline)
+
+    async def build_table(
+        self, table_path: Path, deadline: Deadline | None = None
+    ) -> CachedTable | polars.DataFrame:
         """ """
-        dfs = {}
+        if self.table_cache is None:
+            return await self.read_table_file(table_path, deadline)
+
+        cached_table = self.table_cache.get(table_path)
+        if cached_table is None:
+            async with self.table_cache.lock(table_path):
+                # пока ожидали блокировку, копию мог построить другой процесс
+                cached_table = self.table_cache.get(table_path)
+                if cached_table is None:
+                    cached_table = await asyncio.to_thread(
+                        self.table_cache.put,
+                        table_path,
+                        await self.read_table_file(table_path, deadline),
+                    )
+
+        return cached_table
+
+    async def read_table_file(
+        self, table_path: Path, deadline: Deadline | None = None
+    ) -> polars.DataFrame:
+        """
+        Читает файл с данными таблицы (сжатые файлы распаковываются). Схема,
+        определенная по выборке строк, заменяется схемой по всем строкам
+        (если схемы различаются, то увеличивается номер ревизии схемы)
+        """
+        content = await run_in_thread(
+            deadline,
+            self.readers.get(table_path).read,
+            await self.storage.fetch(table_path, deadline),
+        )
+
+        table_schema = await self.get_saved_schema(table_path, content)
+
+        frame = await run_in_thread(
+            deadline, self.schema_inference.decode, content, table_schema
+        )
+        if frame.schema != table_schema.schema:
+            # метаданные таблицы изменились, поэтому меняется и ревизия схемы
+            await self.save_schema(
+                table_path,
+                TableSchema(frame.schema, revision=table_schema.revision + 1),
+            )
+        elif table_schema.sampled:
+            await self.save_schema(
+                table_path, TableSchema(frame.schema, revision=table_schema.revision)
+            )
+
+        return frame
+
+    async def get_table_schema(
+        self, table_path: Path, content: bytes | None = None
+    ) -> polars.Schema:
+        """
+        Возвращает схему таблицы. Схема определяется один раз для каждой версии
+        файла таблицы и сохраняется в кэше таблиц (или в памяти процесса, если кэш
+        таблиц отключен): для JSON - по выборке строк, для форматов, которые читаются
+        сканером Polars, - по всем строкам файла
+        """
+        return (await self.get_saved_schema(table_path, content)).schema
+
+    async def get_saved_schema(
+        self, table_path: Path, content: bytes | None = None
+    ) -> TableSchema:
+        """
+        Возвращает сохраненную схему таблицы, а если ее нет - определяет
+        и сохраняет схему
+        """
+        table_schema = await asyncio.to_thread(self.find_saved_schema, table_path)
+        if table_schema is not None:
+            return table_schema
+
+        reader = self.readers.get(table_path)
+        try:
+            if reader.schema_in_metadata:
+                # схема читается из метаданных файла, и файл в объектном хранилище
+                # не скачивается (читаются только нужные диапазоны байтов)
+                schema = await asyncio.to_thread(self.read_schema, table_path)
+                table_schema = TableSchema(schema)
+            elif reader.scannable:
+                # сканер читает значения сразу в типы схемы, поэтому схема
+                # определяется по всем строкам
+                schema = await asyncio.to_thread(
+                    reader.infer_schema, await self.storage.fetch(table_path)
+                )
+                table_schema = TableSchema(schema)
+            else:
+                if content is None:
+                    content = await asyncio.to_thread(
+                        reader.read, await self.storage.fetch(table_path)
+                    )
+                schema = await asyncio.to_thread(self.schema_inference.infer, content)
+                table_schema = TableSchema(schema, sampled=True)
+        except (ValueError, polars.exceptions.PolarsError) as e:
+            raise DataRepositoryError(
+                f'Не удалось определить схему таблицы {table_path.name}: {e}'
+            )
+
+        await self.save_schema(table_path, table_schema)
+        return table_schema
+
+    def find_saved_schema(self, table_path: Path) -> TableSchema | None:
+        """
+        Возвращает сохраненную схему текущей версии таблицы (или None)
+        """
+        if self.table_cache is not None:
+            return self.table_cache.get_schema(table_path)
+
+        cached = self.schemas.get(self.storage.get_key(table_path))
+        if cached is not None and cached[0] == self.storage.stat(table_path).version:
+            return cached[1]
+        return None
+
+    async def save_schema(self, table_path: Path, table_schema: TableSchema):
+        """
+        Сохраняет схему текущей версии таблицы
+        """
+        if self.table_cache is not None:
+            await asyncio.to_thread(
+                self.table_cache.put_schema, table_path, table_schema
+            )
+        else:
+            version = (await asyncio.to_thread(self.storage.stat, table_path)).version
+            self.schemas[self.storage.get_key(table_path)] = (version, table_schema)
+
+    def read_schema(self, table_path: Path) -> polars.Schema:
+        """
+        Читает схему таблицы из метаданных файла (Parquet, Arrow IPC)
+        """
+        with self.storage.open(table_path) as f:
+            return self.readers.get(table_path).read_schema(f)
+
+    async def get_sql_objects(
+        self, data_source: DataSource, sql_text: str
+    ) -> dict[str, str]:
+        """
+        Возвращает объекты источника, используемые в SQL запросе: ключ - название
+        таблицы в запросе, значение - название объекта (schema.table)
+        """
+        data_source_objects = await self.get_objects(data_source)
+
+        sql_objects = {}
+        for table in sqlglot.parse_one(sql_text).find_all(exp.Table):
+            if table.name in sql_objects:
+                continue
 
-        for table in parse_one(sql_text).find_all(exp.Table):
             data_source_object = next(
-                (
-                    o
-                    for o in await self.get_objects(data_source)
-                    if o.name == table.name
-                ),
+                (o for o in data_source_objects if o.name == table.name),
                 None,
             )
             if data_source_object is None:
                 raise DataRepositoryError(
                     f'Таблица {table.name} из SQL запроса не найдена в источнике'
                 )
-            object_name = f'{data_source_object.schema_name}.{data_source_object.name}'
-            dfs[table.name] = polars.from_dicts(
-                await self.get_rows(data_source, object_name)
+            sql_objects[table.name] = (
+                f'{data_source_object.schema_name}.{data_source_object.name}'
             )
 
-        ctx = SQLContext()
-        for table_name, table_df in dfs.items():
-            ctx.register(table_name, table_df)
+        return sql_objects
 
-        return ctx.execute(sql_text).collect().to_dicts()
-    
-    @staticmethod
-    def apply_filters(rows: list[dict], filters: list[ParquetFilterExpr]) -> list[dict]:
-        """ 
-        Применяет список фильтров к строкам данных
-        """
-        ctx = SQLContext()
-        ctx.register('tbl', polars.from_dicts(rows))
-
-        where = ' and '.join(
-            [
-                (
-                    f'{f.field_name} {f.operator} {f.value}'
-                    if f.field_name
-                    else f.value
+    async def estimate_memory(
+        self,
+        data_source: DataSource,
+        object_name: str | None = None,
+        sql_text: str | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+    ) -> int:
+        """
+        Оценивает объем памяти (в байтах), который понадобится для чтения объекта
+        источника или выполнения SQL запроса, по размеру файлов используемых таблиц
+        (с учетом сжатия файлов).
+
+        Если для таблицы уже вычислены статистики, то вместо размера файла
+        используется объем ее данных в памяти, а для объекта с условиями filters -
+        доля этого объема по оценке количества строк, удовлетворяющих условиям
+        """
+        table_paths = await self.get_table_paths(
+            data_source, object_name=object_name, sql_text=sql_text
+        )
+
+        predicates = []
+        if filters and object_name is not None:
+            if await self.get_view(data_source, object_name) is None:
+                compiled = self.compile_filters(
+                    filters, await self.get_table_schema(table_paths[0])
+                )
+                predicates = compiled.predicates if compiled else []
+
+        size = 0
+        for table_path in table_paths:
+            stats = await asyncio.to_thread(self.get_table_stats, table_path)
+            if stats is not None:
+                size += stats.size * stats.selectivity(predicates)
+                continue
+
+            stat = await asyncio.to_thread(self.storage.stat, table_path)
+            size += stat.size * self.readers.get(table_path).compression_ratio
+
+        return int(size * self.memory_factor)
+
+    async def get_table_paths(
+        self,
+        data_source: DataSource,
+        object_name: str | None = None,
+        sql_text: str | None = None,
+    ) -> list[Path]:
+        """
+        Возвращает пути к файлам таблиц, из которых читается объект источника
+        или SQL запрос. Для представлений возвращаются таблицы их запросов
+        """
+        if sql_text is not None:
+            object_names = (await self.get_sql_objects(data_source, sql_text)).values()
+        else:
+            object_names = [object_name]
+
+        table_paths = []
+        for name in object_names:
+            view = await self.get_view(data_source, name)
+            if view is not None:
+                table_paths.extend(
+                    await self.get_table_paths(data_source, sql_text=view.query_text)
+                )
+            else:
+                table_paths.append(self.get_table_path(data_source, name))
+
+        return table_paths
+
+    async def scan_sql(
+        self,
+        data_source: DataSource,
+        sql_text: str,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        deadline: Deadline | None = None,
+        streaming: bool = False,
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм с результатом SQL запроса. Сам запрос выполняется
+        только при материализации фрейма.
+
+        Если указан список столбцов columns, то запрос оборачивается в проекцию
+        на эти столбцы (и столбцы из filters)
+        """
+        sql_objects = await self.get_sql_objects(data_source, sql_text)
+
+        # из каждой таблицы читаются только столбцы, к которым обращается запрос,
+        # а условия WHERE по одной таблице пропускают фрагменты ее колоночной копии
+        pushdown = analyze_sql(
+            sql_text,
+            {
+                table_name: await self.get_object_schema(
+                    data_source, object_name, deadline
                 )
-                for f in filters
-            ]
+                for table_name, object_name in sql_objects.items()
+            },
+        )
+
+        ctx = polars.SQLContext()
+        for table_name, object_name in sql_objects.items():
+            ctx.register(
+                table_name,
+                await self.scan_object(
+                    data_source,
+                    object_name,
+                    filters=pushdown[table_name].filters,
+                    columns=pushdown[table_name].columns,
+                    deadline=deadline,
+                    streaming=streaming,
+                ),
+            )
+
+        frame = ctx.execute(sql_text)
+
+        projection = self.get_projection(frame.collect_schema(), columns, filters)
+        if projection is None:
+            return frame
+
+        # проекция добавляется в сам SQL запрос, чтобы оптимизатор Polars
+        # не читал столбцы таблиц, которые не нужны в результате
+        select_list = ', '.join(exp.column(c, quoted=True).sql() for c in projection)
+        return ctx.execute(
+            f'select {select_list} from ({sql_text.strip().rstrip(";")}) as __projection'
         )
-        return ctx.execute(f'select * from tbl where {where}').collect().to_dicts()
+
+    def prepare(
+        self,
+        frame: polars.LazyFrame,
+        limit: int | None = None,
+        offset: int | None = None,
+        filters: list[ParquetFilterExpr] | None = None,
+        columns: list[str] | None = None,
+        order_by: str | None = None,
+        watermark: Watermark | None = None,
+    ) -> polars.LazyFrame:
+        """
+        Применяет к фрейму фильтры, условие отметки watermark, проекцию, сортировку
+        по столбцу order_by и ограничение на количество строк
+        """
+        if filters:
+            frame = self.apply_filters(frame, filters)
+
+        if watermark is not None:
+            frame = frame.filter(
+                self.get_watermark_expr(frame.collect_schema(), watermark)
+            )
+
+        if columns:
+            frame = frame.select(self.get_projection(frame.collect_schema(), columns))
+
+        if order_by is not None:
+            frame = frame.sort(order_by)
+
+        if limit is not None and offset is not None:
+            frame = frame.slice(offset, limit)
+
+        return frame
+
+    async def collect(
+        self,
+        frame: polars.LazyFrame,
+        deadline: Deadline | None = None,
+        streaming: bool = False,
+    ) -> polars.DataFrame:
+        """
+        Материализует фрейм. Запрос выполняется Polars в фоне и не блокирует
+        обработку других запросов, а при истечении срока прерывается. При потоковом
+        выполнении данные обрабатываются по частям, и в памяти одновременно находится
+        только результат
+        """
+        query = frame.collect(background=True, engine=self.get_engine(streaming))
+        return await run_in_thread(deadline, query.fetch_blocking, cancel=query.cancel)
+
+    async def get_column_max(
+        self,
+        frame: polars.LazyFrame | polars.DataFrame,
+        column: str,
+        deadline: Deadline | None = None,
+        streaming: bool = False,
+    ) -> Any:
+        """
+        Возвращает максимальное значение столбца (None, если строк нет)
+        """
+        if column not in frame.collect_schema():
+            raise DataRepositoryError(f'Столбец {column} не найден в данных объекта')
+
+        if isinstance(frame, polars.DataFrame):
+            return frame[column].max()
+
+        result = await self.collect(
+            frame.select(polars.col(column).max()),
+            deadline=deadline,
+            streaming=streaming,
+        )
+        return result.item()
 
     @staticmethod
-    def get_columns_meta_for_row(row: dict) -> list[ObjectColumnMeta]:
-        """
-        Возвращает метаданные по строке данных
-        """
-        columns: list[ObjectColumnMeta] = []
-        for key, value in row.items():
-            columns.append(
-                ObjectColumnMeta(
-                    name=key,
-                    type=type(value).__name__,
-                    simple_type=DataRepository.get_simple_type_by_value(value),
-                    comment=None,
-                )
+    def get_engine(streaming: bool) -> str:
+        """
+        Движок Polars для выполнения запроса
+        """
+        return 'streaming' if streaming else 'auto'
+
+    @staticmethod
+    def get_deadline(
+        data_source: DataSource, timeout: str | None = None
+    ) -> Deadline | None:
+        """
+        Возвращает срок выполнения запроса по таймауту источника (параметр 'Таймаут'
+        в extra) и таймауту из заголовка запроса. Используется меньший из них
+        """
+        extra = data_source.extra or {}
+        try:
+            return Deadline.from_timeouts(
+                Deadline.parse_timeout(extra.get('Таймаут')),
+                Deadline.parse_timeout(timeout),
             )
+        except ValueError as e:
+            raise DataRepositoryError(f'Некорректное значение таймаута: {e}')
+
+    @staticmethod
+    def apply_filters(
+        frame: polars.LazyFrame, filters: list[ParquetFilterExpr]
+    ) -> polars.LazyFrame:
+        """
+        Применяет список фильтров к ленивому фрейму. Условия компилируются в выражения
+        Polars, поэтому фильтрация выполняется до чтения лишних данных
+        """
+        compiled = DataRepository.compile_filters(filters, frame.collect_schema())
+        if compiled is None:
+            return frame
 
-        return columns
+        missing = compiled.columns - set(frame.collect_schema().names())
+        if missing:
+            raise DataRepositoryError(
+                f'В условии фильтра указаны несуществующие столбцы: {", ".join(sorted(missing))}'
+            )
+
+        return frame.filter(compiled.expr)
+
+    @staticmethod
+    def compile_filters(
+        filters: list[ParquetFilterExpr] | None, schema: polars.Schema
+    ) -> CompiledFilter | None:
+        """
+        Компилирует условия фильтрации в выражение Polars
+        """
+        try:
+            return compile_filters(filters, schema)
+        except FilterError as e:
+            raise DataRepositoryError(f'Некорректное условие фильтра: {e}')
+
+    @staticmethod
+    def get_watermark_predicate(
+        schema: polars.Schema, watermark: Watermark
+    ) -> Predicate:
+        """
+        Возвращает условие 'столбец > значение' для отметки инкрементальной выгрузки
+        (для пропуска фрагментов колоночной копии таблицы)
+        """
+        value, _ = DataRepository.get_watermark_value(schema, watermark)
+        return Predicate(watermark.column, '>', value)
+
+    @staticmethod
+    def get_watermark_expr(schema: polars.Schema, watermark: Watermark) -> polars.Expr:
+        """
+        Возвращает выражение Polars 'столбец > значение' для отметки инкрементальной
+        выгрузки
+        """
+        value, dtype = DataRepository.get_watermark_value(schema, watermark)
+        column = polars.col(watermark.column)
+        if dtype != schema[watermark.column]:
+            column = column.cast(dtype)
+        return column > polars.lit(value, dtype=dtype)
+
+    @staticmethod
+    def get_watermark_value(
+        schema: polars.Schema, watermark: Watermark
+    ) -> tuple[Any, polars.DataType]:
+        """
+        Приводит значение отметки из JSON к типу столбца отметки и возвращает его
+        вместе с типом, в котором нужно сравнивать столбец и значение. Значение
+        не разбирается как текст условия, поэтому строки (например, '0008')
+        сравниваются как есть
+        """
+        if watermark.column not in schema:
+            raise DataRepositoryError(
+                f'Столбец {watermark.column} не найден в данных объекта'
+            )
+
+        try:
+            values, dtype = FilterCompiler.typed_values(
+                [watermark.value], schema[watermark.column]
+            )
+        except FilterError as e:
+            raise DataRepositoryError(
+                f'Значение отметки не соответствует типу столбца {watermark.column}: {e}'
+            )
+        return values[0], dtype
+
+    @staticmethod
+    def with_watermark_column(
+        columns: list[str] | None, watermark: Watermark | None
+    ) -> list[str] | None:
+        """
+        Добавляет столбец отметки к списку читаемых столбцов
+        """
+        if not columns or watermark is None or watermark.column in columns:
+            return columns
+        return [*columns, watermark.column]
+
+    @staticmethod
+    def get_projection(
+        schema: polars.Schema,
+        columns: list[str] | None,
+        filters: list[ParquetFilterExpr] | None = None,
+    ) -> list[str] | None:
+        """
+        Возвращает список столбцов, которые нужно прочитать: столбцы из columns и
+        столбцы, участвующие в фильтрах. Порядок столбцов соответствует схеме.
+        Если columns не указан, возвращается None (нужны все столбцы)
+        """
+        if not columns:
+            return None
+
+        required = set(columns)
+        if filters:
+            compiled = DataRepository.compile_filters(filters, schema)
+            required |= compiled.columns if compiled else set()
+
+        return [name for name in schema.names() if name in required]
+
+    @staticmethod
+    def get_columns_meta_for_schema(schema: polars.Schema) -> list[ObjectColumnMeta]:
+        """
+        Возвращает метаданные столбцов по схеме таблицы
+        """
+        return [
+            ObjectColumnMeta(
+                name=name,
+                type=DataRepository.get_type_name_by_dtype(dtype),
+                simple_type=DataRepository.get_simple_type_by_dtype(dtype),
+                comment=None,
+            )
+            for name, dtype in schema.items()
+        ]
+
+    @staticmethod
+    def get_type_name_by_dtype(dtype: polars.DataType) -> str:
+        """
+        Возвращает название исходного типа столбца (в терминах типов python)
+        """
+        if dtype.is_integer():
+            return 'int'
+        if dtype.is_float() or isinstance(dtype, polars.Decimal):
+            return 'float'
+        if dtype == polars.Boolean:
+            return 'bool'
+        if dtype == polars.Date:
+            return 'date'
+        if isinstance(dtype, polars.Datetime):
+            return 'datetime'
+        if dtype == polars.Null:
+            return 'NoneType'
+        if isinstance(dtype, (polars.List, polars.Array)):
+            return 'list'
+        if isinstance(dtype, polars.Struct):
+            return 'dict'
+        return 'str'
 
     @staticmethod
-    def get_simple_type_by_value(value: Any) -> SimpleType:
+    def get_simple_type_by_dtype(dtype: polars.DataType) -> SimpleType:
         """ """
-        match value:
-            case int():
-                return SimpleType.number
-            case float():
-                return SimpleType.float
-            case bool():
-                return SimpleType.bool
-            case datetime.date() | datetime.datetime():
-                return SimpleType.date
-            case _:
-                return SimpleType.string
+        if dtype.is_integer():
+            return SimpleType.number
+        if dtype.is_float() or isinstance(dtype, polars.Decimal):
+            return SimpleType.float
+        if dtype == polars.Boolean:
+            return SimpleType.bool
+        if dtype.is_temporal() and dtype != polars.Time:
+            return SimpleType.date
+        return SimpleType.string
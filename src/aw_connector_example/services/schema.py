@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from dataclasses import dataclass
+import codecs
+import json
+import logging
+import re
+
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import polars
+else:
+    polars = lazy_import('polars')
+
+
+logger = logging.getLogger('uvicorn')
+
+WHITESPACE = re.compile(r'\s*')
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Схема таблицы, сохраненная для версии файла таблицы
+    """
+
+    schema: polars.Schema
+    # схема определена по выборке строк, а не по всем строкам файла
+    sampled: bool = False
+    # количество замен схемы после чтения всех строк файла (входит в версию
+    # метаданных таблицы, см. DataRepository.get_version)
+    revision: int = 0
+
+
+class SchemaInference:
+    """
+    Определение схемы (типов столбцов) таблицы источника по выборке строк.
+
+    В выборку попадают первые sample_rows строк: файл разбирается по частям, пока
+    не прочитано нужное количество строк, и остальная часть файла не разбирается.
+    Типы значений в выборке объединяются средствами Polars: для столбца выбирается
+    общий супертип всех его значений, а столбец, который есть хотя бы в одной строке
+    выборки, попадает в схему. Схема по выборке уточняется при первом чтении
+    всех строк файла (см. decode)
+    """
+
+    def __init__(self, sample_rows: int = 1000, chunk_size: int = 64 * 1024):
+        self.sample_rows = sample_rows
+        # размер первой разбираемой части файла (в байтах)
+        self.chunk_size = chunk_size
+
+    def sample(self, content: bytes) -> list:
+        """
+        Возвращает выборку строк: первые sample_rows элементов json-массива
+        """
+        decoder = json.JSONDecoder()
+        rows = []
+        # позиция следующего элемента массива (None - начало массива еще не прочитано)
+        pos = None
+        size = self.chunk_size
+        while True:
+            final = size >= len(content)
+            text = codecs.getincrementaldecoder('utf-8')().decode(
+                content[:size], final=final
+            )
+            try:
+                if pos is None:
+                    start = WHITESPACE.match(text).end()
+                    if text[start : start + 1] not in ('[', ''):
+                        raise ValueError('Данные таблицы должны быть массивом объектов')
+                    if start == len(text):
+                        raise json.JSONDecodeError("Expecting '['", text, start)
+                    pos = start + 1
+
+                while len(rows) < self.sample_rows:
+                    start = WHITESPACE.match(text, pos).end()
+                    if not rows and text[start : start + 1] == ']':
+                        return rows
+
+                    # элемент читается вместе с разделителем после него: элемент
+                    # в конце прочитанной части файла может быть неполным
+                    row, end = decoder.raw_decode(text, start)
+                    end = WHITESPACE.match(text, end).end()
+                    separator = text[end : end + 1]
+                    if separator not in (',', ']'):
+                        raise json.JSONDecodeError("Expecting ',' delimiter", text, end)
+
+                    rows.append(row)
+                    if separator == ']':
+                        return rows
+                    pos = end + 1
+
+                return rows
+            except json.JSONDecodeError as e:
+                if final:
+                    raise ValueError(f'Некорректный json: {e}')
+                size *= 2
+
+    def infer(self, content: bytes) -> polars.Schema:
+        """
+        Определяет схему таблицы по содержимому файла (json-массив объектов)
+        """
+        sample = self.sample(content)
+        if not sample:
+            return polars.Schema()
+        if not all(isinstance(row, dict) for row in sample):
+            raise ValueError('Данные таблицы должны быть массивом объектов')
+
+        return polars.from_dicts(sample, infer_schema_length=None).schema
+
+    @staticmethod
+    def decode(content: bytes, table_schema: TableSchema) -> polars.DataFrame:
+        """
+        Декодирует содержимое файла таблицы в DataFrame.
+
+        По схеме, определенной по всем строкам файла, значения декодируются сразу
+        в типы столбцов. Схема по выборке для этого не подходит: значения другого
+        типа вне выборки Polars молча приводит к типу столбца (дробные числа
+        к целым), а новые столбцы отбрасывает. Поэтому в этом случае (и если
+        декодировать по схеме не удалось) типы определяются по всем строкам файла:
+        столбцы расширяются до общего супертипа, и значения не теряются.
+        Схема результата в этом случае может отличаться от table_schema
+        """
+        schema = table_schema.schema
+        if not schema:
+            return polars.read_json(content)
+
+        if not table_schema.sampled:
+            try:
+                return polars.read_json(content, schema=schema)
+            except polars.exceptions.PolarsError:
+                logger.warning(
+                    'Данные таблицы не соответствуют сохраненной схеме, '
+                    'схема определяется по всем строкам'
+                )
+
+        frame = polars.read_json(content, infer_schema_length=None)
+        if frame.schema != schema:
+            # столбцы из схемы остаются в начале, новые столбцы - после них
+            frame = frame.select(
+                [name for name in schema.names() if name in frame.columns]
+                + [name for name in frame.columns if name not in schema]
+            )
+
+        return frame
@@ -0,0 +1,36 @@
+from typing import Any, Awaitable, Callable, Hashable
+
+import asyncio
+
+
+class SharedLoads:
+    """
+    Общие загрузки данных для нескольких запросов (например, объектов пакетной
+    выгрузки в parquet).
+
+    Загрузка по ключу выполняется один раз: запросы, которые пришли во время
+    загрузки, ожидают ее окончания, а последующие получают готовый результат.
+    Отмена одного из ожидающих запросов не прерывает загрузку для остальных.
+    Если загрузка завершилась ошибкой, то результат не запоминается, и следующий
+    запрос загружает данные заново
+    """
+
+    def __init__(self):
+        self.tasks: dict[Hashable, asyncio.Task] = {}
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает результат загрузки по ключу key (load вызывается, только если
+        загрузки по этому ключу еще не было)
+        """
+        task = self.tasks.get(key)
+        if task is None:
+            task = self.tasks[key] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda t: self.forget_failed(key, t))
+
+        return await asyncio.shield(task)
+
+    def forget_failed(self, key: Hashable, task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            if self.tasks.get(key) is task:
+                del self.tasks[key]
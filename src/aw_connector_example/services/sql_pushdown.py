@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from collections import Counter
+from dataclasses import dataclass, field
+
+from aw_connector_example.dto import ParquetFilterExpr
+from aw_connector_example.services.filters import FilterError, compile_filters
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.optimizer import scope as sqlglot_scope
+    import polars
+else:
+    sqlglot = lazy_import('sqlglot')
+    exp = lazy_import('sqlglot.expressions')
+    sqlglot_scope = lazy_import('sqlglot.optimizer.scope')
+
+
+class PushdownError(Exception):
+    """
+    Запрос нельзя проанализировать (таблицы читаются целиком)
+    """
+
+
+@dataclass
+class TablePushdown:
+    """
+    Часть таблицы, которая нужна SQL запросу
+    """
+
+    # столбцы таблицы, к которым обращается запрос (None - все столбцы)
+    columns: list[str] | None = None
+    # условия из WHERE, которые относятся только к этой таблице. Условия остаются
+    # в запросе, а при чтении таблицы по ним пропускаются фрагменты без подходящих строк
+    filters: list[ParquetFilterExpr] = field(default_factory=list)
+
+
+def analyze_sql(
+    sql_text: str, schemas: dict[str, polars.Schema]
+) -> dict[str, TablePushdown]:
+    """
+    Определяет по AST SQL запроса, какие столбцы каждой таблицы нужны запросу
+    и какие условия WHERE можно проверить при чтении таблицы.
+
+    schemas - схемы таблиц запроса (ключ - название таблицы в запросе). Если запрос
+    не удалось проанализировать, то для всех таблиц возвращается TablePushdown()
+    (таблицы читаются целиком)
+    """
+    try:
+        return SqlPushdownAnalyzer(schemas).analyze(sqlglot.parse_one(sql_text))
+    except (PushdownError, sqlglot.errors.SqlglotError):
+        return {name: TablePushdown() for name in schemas}
+
+
+class SqlPushdownAnalyzer:
+    """
+    Анализ SQL запроса по областям видимости (scope) sqlglot: для каждого SELECT
+    (в том числе в подзапросах, CTE и UNION) определяются его источники (таблицы
+    и подзапросы) и столбцы, к которым он обращается.
+
+    Условия WHERE передаются в чтение таблицы, только если они обращаются к одной
+    таблице, таблица упоминается в запросе один раз и ее строки не дополняются
+    значениями null во внешнем соединении (иначе отброшенные строки таблицы
+    изменили бы результат соединения)
+    """
+
+    def __init__(self, schemas: dict[str, polars.Schema]):
+        self.schemas = schemas
+
+    def analyze(self, ast: exp.Expression) -> dict[str, TablePushdown]:
+        """ """
+        columns: dict[str, set[str] | None] = {name: set() for name in self.schemas}
+        filters: dict[str, list[ParquetFilterExpr]] = {
+            name: [] for name in self.schemas
+        }
+        table_counts = Counter(t.name for t in ast.find_all(exp.Table))
+
+        for scope in sqlglot_scope.traverse_scope(ast):
+            if any(j.args.get('using') or j.method for j in self.get_joins(scope)):
+                raise PushdownError('Соединения USING и NATURAL не анализируются')
+
+            for star in self.get_stars(scope):
+                aliases = (
+                    [star.table]
+                    if isinstance(star, exp.Column)
+                    else list(scope.selected_sources)
+                )
+                for alias in aliases:
+                    table = self.get_table(scope, alias)
+                    if table is not None:
+                        columns[table] = None
+
+            for column in scope.columns:
+                for table in self.resolve_column(scope, column):
+                    if columns[table] is not None:
+                        columns[table].add(column.name)
+
+            for table, condition in self.get_conditions(scope):
+                if table_counts[table] == 1:
+                    filters[table].append(condition)
+
+        result = {}
+        for name, schema in self.schemas.items():
+            names = columns[name]
+            if names is None:
+                result[name] = TablePushdown(filters=filters[name])
+                continue
+            # для запросов вида count(*) нужен хотя бы один столбец (количество строк)
+            selected = [c for c in schema.names() if c in names] or schema.names()[:1]
+            result[name] = TablePushdown(columns=selected, filters=filters[name])
+
+        return result
+
+    def resolve_column(
+        self, scope: sqlglot_scope.Scope, column: exp.Column
+    ) -> list[str]:
+        """
+        Возвращает таблицы, к которым может относиться столбец
+        """
+        if column.table:
+            # столбец коррелированного подзапроса относится к источнику внешнего запроса
+            while scope is not None and column.table not in scope.sources:
+                scope = scope.parent
+            if scope is None:
+                raise PushdownError(f'Не найден источник столбца {column.sql()}')
+            table = self.get_table(scope, column.table)
+            return [table] if table is not None else []
+
+        tables = [
+            table
+            for alias in scope.selected_sources
+            if (table := self.get_table(scope, alias)) is not None
+            and column.name in self.schemas[table]
+        ]
+        if tables:
+            return tables
+
+        # столбец без таблицы может относиться к внешнему запросу (или быть
+        # псевдонимом выражения) - он читается из всех таблиц, где он есть
+        return [name for name, schema in self.schemas.items() if column.name in schema]
+
+    def get_conditions(
+        self, scope: sqlglot_scope.Scope
+    ) -> list[tuple[str, ParquetFilterExpr]]:
+        """
+        Возвращает условия WHERE области видимости, которые можно проверить при
+        чтении одной таблицы
+        """
+        where = scope.expression.args.get('where')
+        if not isinstance(scope.expression, exp.Select) or where is None:
+            return []
+
+        conditions = []
+        for condition in self.split_and(where.this):
+            if condition.find(exp.Select, exp.Subquery, exp.Exists):
+                continue
+
+            aliases = set()
+            for column in condition.find_all(exp.Column):
+                alias = column.table or self.get_single_alias(scope, column.name)
+                aliases.add(alias)
+            if len(aliases) != 1:
+                continue
+
+            alias = aliases.pop()
+            table = (
+                self.get_table(scope, alias)
+                if alias in scope.selected_sources
+                else None
+            )
+            if table is None or self.is_null_extended(scope, alias):
+                continue
+
+            node = condition.copy()
+            for column in node.find_all(exp.Column):
+                column.set('table', None)
+            condition_filter = ParquetFilterExpr(value=node.sql())
+            try:
+                if compile_filters([condition_filter], self.schemas[table]) is None:
+                    continue
+            except FilterError:
+                continue
+
+            conditions.append((table, condition_filter))
+
+        return conditions
+
+    def get_single_alias(self, scope: sqlglot_scope.Scope, name: str) -> str | None:
+        """
+        Возвращает источник столбца без таблицы, если он однозначен: столбец есть
+        только в одной таблице, и среди источников нет подзапросов
+        """
+        aliases = list(scope.selected_sources)
+        if len(aliases) == 1:
+            return aliases[0]
+
+        matches = []
+        for alias in aliases:
+            table = self.get_table(scope, alias)
+            if table is None:
+                return None
+            if name in self.schemas[table]:
+                matches.append(alias)
+        return matches[0] if len(matches) == 1 else None
+
+    def is_null_extended(self, scope: sqlglot_scope.Scope, alias: str) -> bool:
+        """
+        Проверяет, что строки источника alias могут дополняться значениями null
+        во внешнем соединении (или отбрасываться в SEMI и ANTI соединениях)
+        """
+        joins = self.get_joins(scope)
+        sides = [(j.side or '').upper() for j in joins]
+        kinds = [(j.kind or '').upper() for j in joins]
+
+        from_ = scope.expression.args.get('from')
+        if from_ is not None and from_.this.alias_or_name == alias:
+            return any(side in ('RIGHT', 'FULL') for side in sides)
+
+        for i, join in enumerate(joins):
+            if join.this.alias_or_name == alias:
+                return (
+                    sides[i] in ('LEFT', 'FULL')
+                    or kinds[i] in ('SEMI', 'ANTI')
+                    or any(side in ('RIGHT', 'FULL') for side in sides[i + 1 :])
+                )
+        return True
+
+    def get_table(self, scope: sqlglot_scope.Scope, alias: str) -> str | None:
+        """
+        Возвращает название таблицы источника alias (None - если это подзапрос
+        или таблица не из запроса)
+        """
+        source = scope.sources.get(alias)
+        if isinstance(source, exp.Table) and source.name in self.schemas:
+            return source.name
+        return None
+
+    @staticmethod
+    def get_stars(scope: sqlglot_scope.Scope) -> list[exp.Expression]:
+        """
+        Возвращает * и table.* из списка выражений SELECT
+        """
+        if not isinstance(scope.expression, exp.Select):
+            return []
+        return [e for e in scope.expression.expressions if e.is_star]
+
+    @staticmethod
+    def get_joins(scope: sqlglot_scope.Scope) -> list[exp.Join]:
+        return scope.expression.args.get('joins') or []
+
+    @staticmethod
+    def split_and(condition: exp.Expression) -> list[exp.Expression]:
+        """
+        Разбивает условие на части, соединенные через AND
+        """
+        condition = condition.unnest()
+        if isinstance(condition, exp.And):
+            return SqlPushdownAnalyzer.split_and(
+                condition.this
+            ) + SqlPushdownAnalyzer.split_and(condition.expression)
+        return [condition]
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
+from dataclasses import dataclass, field
+import datetime
+import math
+
+from aw_connector_example.lazy import lazy_import
+from aw_connector_example.services.filters import Predicate
+from aw_connector_example.services.zone_map import ZoneMap
+
+if TYPE_CHECKING:
+    import polars
+else:
+    polars = lazy_import('polars')
+
+
+class HyperLogLog:
+    """
+    Оценка количества различных значений столбца (HyperLogLog).
+
+    Хэш значения делится на номер регистра (старшие precision бит) и остаток,
+    в регистре хранится максимальная позиция первой единицы в остатке. Оценка
+    считается по 2^precision регистрам (по умолчанию 16384 регистра, относительная
+    ошибка около 0.8%), поэтому память не зависит от количества значений
+    """
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.size = 2**precision
+
+    def expr(self, column: str) -> polars.Expr:
+        """
+        Выражение Polars, которое вычисляет обновления регистров за один проход по
+        столбцу: список различных пар (регистр, позиция единицы), упакованных в число
+        """
+        p = self.precision
+        hashes = polars.col(column).drop_nulls().hash(seed=0)
+        register = hashes // 2 ** (64 - p)
+        # ведущие нули остатка (остаток занимает младшие 64 - p бит хэша)
+        rank = (hashes % 2 ** (64 - p)).bitwise_leading_zeros().cast(polars.UInt64) - (
+            p - 1
+        )
+
+        return (register * 64 + rank).unique().implode()
+
+    def estimate(self, updates: polars.Series) -> float:
+        """
+        Возвращает оценку количества различных значений по результату expr
+        """
+        registers = (
+            updates.to_frame('update')
+            .group_by(polars.col('update') // 64)
+            .agg((polars.col('update') % 64).max().alias('rank'))
+        )
+        zeros = self.size - registers.height
+        total = registers.select(
+            (2.0 ** (-polars.col('rank').cast(polars.Float64))).sum()
+        ).item()
+
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size**2 / (total + zeros)
+        if estimate <= 2.5 * self.size and zeros:
+            # для небольшого количества значений точнее оценка по пустым регистрам
+            estimate = self.size * math.log(self.size / zeros)
+
+        return estimate
+
+
+@dataclass
+class ColumnStatistics:
+    """
+    Статистики столбца таблицы
+    """
+
+    type: str
+    null_count: int = 0
+    # оценка количества различных значений (без null)
+    distinct_count: int | None = None
+    min: Any = None
+    max: Any = None
+    # оценка объема данных столбца в памяти (в байтах)
+    size: int = 0
+
+
+@dataclass
+class TableStatistics:
+    """
+    Статистики таблицы: количество строк, объем данных в памяти и статистики
+    по каждому столбцу
+    """
+
+    row_count: int
+    size: int = 0
+    columns: dict[str, ColumnStatistics] = field(default_factory=dict)
+
+    @classmethod
+    def compute(cls, frame: polars.LazyFrame, precision: int = 14) -> TableStatistics:
+        """
+        Вычисляет статистики таблицы за один проход по данным. Запрос выполняется
+        потоковым движком Polars, поэтому таблица не загружается в память целиком
+        """
+        schema = frame.collect_schema()
+        hll = HyperLogLog(precision)
+
+        aggs = [polars.len().alias('__rows')]
+        for i, (name, dtype) in enumerate(schema.items()):
+            column = polars.col(name)
+            aggs.append(column.null_count().alias(f'{i}__nulls'))
+            if dtype != polars.Object:
+                aggs.append(hll.expr(name).alias(f'{i}__hll'))
+            if ZoneMap.dtype_kind(dtype) is not None:
+                aggs.append(column.min().alias(f'{i}__min'))
+                aggs.append(column.max().alias(f'{i}__max'))
+            if dtype == polars.String:
+                aggs.append(column.str.len_bytes().sum().alias(f'{i}__bytes'))
+            elif dtype == polars.Binary:
+                aggs.append(column.bin.size().sum().alias(f'{i}__bytes'))
+
+        row = frame.select(aggs).collect(engine='streaming').row(0, named=True)
+        rows = row['__rows']
+
+        columns = {}
+        for i, (name, dtype) in enumerate(schema.items()):
+            nulls = row[f'{i}__nulls']
+            updates = row.get(f'{i}__hll')
+            columns[name] = ColumnStatistics(
+                type=str(dtype),
+                null_count=nulls,
+                distinct_count=(
+                    min(
+                        round(
+                            hll.estimate(polars.Series(updates, dtype=polars.UInt64))
+                        ),
+                        rows - nulls,
+                    )
+                    if updates is not None
+                    else None
+                ),
+                min=row.get(f'{i}__min'),
+                max=row.get(f'{i}__max'),
+                size=(
+                    (row[f'{i}__bytes'] or 0)
+                    if f'{i}__bytes' in row
+                    else round(rows * cls.value_size(dtype))
+                ),
+            )
+
+        return cls(
+            row_count=rows,
+            size=sum(c.size for c in columns.values()),
+            columns=columns,
+        )
+
+    def selectivity(self, predicates: list[Predicate]) -> float:
+        """
+        Оценивает долю строк таблицы, которые удовлетворяют всем предикатам
+        (предикаты считаются независимыми)
+        """
+        result = 1.0
+        for predicate in predicates:
+            stats = self.columns.get(predicate.column)
+            if stats is not None and self.row_count:
+                result *= self.predicate_selectivity(stats, predicate, self.row_count)
+        return result
+
+    @staticmethod
+    def predicate_selectivity(
+        stats: ColumnStatistics, predicate: Predicate, rows: int
+    ) -> float:
+        """
+        Оценивает долю строк, которые удовлетворяют предикату: для равенства - по
+        количеству различных значений, для сравнений - по положению значения между
+        min и max. Если оценить нельзя, то возвращается 1
+        """
+        not_null = 1 - stats.null_count / rows
+        match predicate.operator:
+            case 'is null':
+                return 1 - not_null
+            case 'is not null':
+                return not_null
+
+        lo, hi = (
+            TableStatistics.to_number(stats.min),
+            TableStatistics.to_number(stats.max),
+        )
+        equal = not_null / stats.distinct_count if stats.distinct_count else not_null
+
+        def in_range(value: Any) -> bool:
+            number = TableStatistics.to_number(value)
+            return lo is None or number is None or lo <= number <= hi
+
+        match predicate.operator:
+            case '=':
+                return equal if in_range(predicate.value) else 0.0
+            case '!=':
+                return not_null - equal if in_range(predicate.value) else not_null
+            case 'in':
+                return min(
+                    not_null,
+                    equal
+                    * sum(1 for v in predicate.value if v is not None and in_range(v)),
+                )
+            case '<' | '<=' | '>' | '>=':
+                value = TableStatistics.to_number(predicate.value)
+                if lo is None or value is None:
+                    return not_null
+                fraction = (value - lo) / (hi - lo) if hi > lo else float(value >= lo)
+                fraction = min(max(fraction, 0.0), 1.0)
+                if predicate.operator in ('>', '>='):
+                    fraction = 1 - fraction
+                return not_null * fraction
+
+        return 1.0
+
+    @staticmethod
+    def to_number(value: Any) -> float | None:
+        """
+        Преобразует значение статистики в число для интерполяции между min и max
+        """
+        if isinstance(value, datetime.datetime):
+            return value.timestamp()
+        if isinstance(value, datetime.date):
+            return float(value.toordinal())
+        if isinstance(value, (int, float)):
+            return float(value)
+        return None
+
+    @staticmethod
+    def value_size(dtype: polars.DataType) -> float:
+        """
+        Возвращает средний объем одного значения столбца типа dtype в памяти
+        """
+        return polars.Series(values=[None] * 1024, dtype=dtype).estimated_size() / 1024
+
+    # --------------------------------------------------------------------
+    # Сериализация
+    # --------------------------------------------------------------------
+    def to_dict(self) -> dict:
+        def dump(stats: ColumnStatistics) -> dict:
+            kind = self.value_kind(stats.min)
+            return {
+                'type': stats.type,
+                'null_count': stats.null_count,
+                'distinct_count': stats.distinct_count,
+                'kind': kind,
+                'min': ZoneMap.dump_value(stats.min, kind),
+                'max': ZoneMap.dump_value(stats.max, kind),
+                'size': stats.size,
+            }
+
+        return {
+            'row_count': self.row_count,
+            'size': self.size,
+            'columns': {name: dump(stats) for name, stats in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> TableStatistics:
+        return cls(
+            row_count=data['row_count'],
+            size=data['size'],
+            columns={
+                name: ColumnStatistics(
+                    type=stats['type'],
+                    null_count=stats['null_count'],
+                    distinct_count=stats['distinct_count'],
+                    min=ZoneMap.load_value(stats['min'], stats['kind']),
+                    max=ZoneMap.load_value(stats['max'], stats['kind']),
+                    size=stats['size'],
+                )
+                for name, stats in data['columns'].items()
+            },
+        )
+
+    @staticmethod
+    def value_kind(value: Any) -> str:
+        """
+        Возвращает вид значения min/max для сериализации дат
+        """
+        if isinstance(value, datetime.datetime):
+            return 'datetime'
+        if isinstance(value, datetime.date):
+            return 'date'
+        return 'value'
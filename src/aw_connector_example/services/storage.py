@@ -0,0 +1,544 @@
+from __future__ import annotations
+
+from typing import Any, BinaryIO, TYPE_CHECKING
+from pathlib import Path
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from aw_connector_example.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import fsspec
+    import pyarrow.dataset as pads
+    import pyarrow.fs as pafs
+    from aw_connector_example.services.deadline import Deadline
+else:
+    pads = lazy_import('pyarrow.dataset')
+    pafs = lazy_import('pyarrow.fs')
+
+
+logger = logging.getLogger('uvicorn')
+
+
+@dataclass(frozen=True)
+class FileStat:
+    """
+    Метаданные файла (или папки) с данными
+    """
+
+    size: int
+    mtime_ns: int
+    # ETag объекта в объектном хранилище (None для файлов на локальном диске)
+    etag: str | None = None
+
+    @property
+    def version(self) -> str:
+        """
+        Версия содержимого файла: ETag, а если его нет - время изменения и размер
+        """
+        if self.etag is not None:
+            return self.etag
+        return f'{self.mtime_ns}-{self.size}'
+
+    @classmethod
+    def from_os(cls, stat: os.stat_result) -> FileStat:
+        return cls(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+
+class LocalStorage:
+    """
+    Папка с данными источников на локальном диске (или примонтированном томе).
+    Файлы читаются на месте
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def exists(self, path: Path) -> bool:
+        return path.exists()
+
+    def is_file(self, path: Path) -> bool:
+        return path.is_file()
+
+    def listdir(self, path: Path) -> list[str]:
+        return os.listdir(path)
+
+    def stat(self, path: Path) -> FileStat:
+        return FileStat.from_os(path.stat())
+
+    def get_key(self, path: Path) -> str:
+        """
+        Возвращает уникальный ключ файла (для ключей кэшей)
+        """
+        return str(path.resolve())
+
+    def get_local_path(self, path: Path) -> Path | None:
+        """
+        Возвращает путь к файлу на локальном диске (или None, если файл нужно скачать)
+        """
+        return path
+
+    async def fetch(self, path: Path, deadline: Deadline | None = None) -> Path:
+        """
+        Возвращает путь к файлу на локальном диске (скачивает файл, если нужно)
+        """
+        return path
+
+    def open(self, path: Path) -> BinaryIO:
+        """
+        Открывает файл для чтения с произвольным доступом (без загрузки файла целиком)
+        """
+        return open(path, mode='rb')
+
+    def open_dataset(self, path: Path, format: str) -> pads.Dataset:
+        """
+        Открывает файл как набор данных pyarrow
+        """
+        return pads.dataset(str(path), format=format)
+
+
+class DiskCache:
+    """
+    Локальный кэш файлов из объектного хранилища ограниченного размера.
+
+    Файл хранится под ключом из пути объекта и его версии (ETag), поэтому измененный
+    объект скачивается заново, а уже открытые файлы предыдущей версии не меняются.
+    Если размер кэша превышает max_size, то удаляются файлы, которые дольше всего
+    не читались (вместе с файлами блокировок).
+
+    Размеры и время чтения файлов хранятся в индексе в памяти, поэтому при добавлении
+    файла папка кэша не обходится. Кэш общий для всех workers: индекс перестраивается
+    по содержимому папки раз в rescan_seconds секунд, чтобы учитывать файлы, скачанные
+    и удаленные другими процессами
+    """
+
+    # файлы, прочитанные за последние protect_seconds секунд, не удаляются: их
+    # может читать запрос, который получил путь к файлу, но еще не открыл его
+    protect_seconds = 60
+    rescan_seconds = 300
+
+    def __init__(self, root: Path, max_size: int = 10 * 1024 * 1024 * 1024):
+        self.root = root
+        self.max_size = max_size
+
+        # путь к файлу -> (время чтения, размер)
+        self.index: dict[str, tuple[float, int]] = {}
+        self.size = 0
+        self.scanned_at: float | None = None
+        self.index_lock = threading.Lock()
+
+    def get_path(self, key: str, version: str, suffix: str) -> Path:
+        """
+        Возвращает путь к файлу версии version объекта key в кэше. Расширение
+        файла сохраняется (по нему определяется формат и сжатие файла)
+        """
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        version_hash = hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+        return self.root / key_hash[:2] / key_hash / f'{version_hash}{suffix}'
+
+    def get(self, path: Path) -> Path | None:
+        """
+        Возвращает файл из кэша (или None) и отмечает время его чтения
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        with self.index_lock:
+            entry = self.index.get(str(path))
+            if entry is not None:
+                self.index[str(path)] = (time.time(), entry[1])
+        return path
+
+    def put(self, tmp_path: Path, path: Path):
+        """
+        Сохраняет скачанный файл в кэш и удаляет из кэша файлы, которые не помещаются
+        """
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, path)
+
+        with self.index_lock:
+            self.add(str(path), time.time(), size)
+        self.evict()
+
+    def add(self, file: str, mtime: float, size: int):
+        previous = self.index.get(file)
+        if previous is not None:
+            self.size -= previous[1]
+        self.index[file] = (mtime, size)
+        self.size += size
+
+    def scan(self):
+        """
+        Перестраивает индекс по содержимому папки кэша
+        """
+        self.index, self.size = {}, 0
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith('.') or name.endswith('.tmp'):
+                    continue
+                file = os.path.join(folder, name)
+                try:
+                    stat = os.stat(file)
+                except FileNotFoundError:
+                    continue
+                self.add(file, stat.st_mtime, stat.st_size)
+        self.scanned_at = time.monotonic()
+
+    def evict(self):
+        """
+        Удаляет файлы, которые дольше всего не читались, пока размер кэша больше max_size
+        """
+        with self.index_lock:
+            if (
+                self.scanned_at is None
+                or time.monotonic() - self.scanned_at >= self.rescan_seconds
+            ):
+                self.scan()
+            if self.size <= self.max_size:
+                return
+
+            protected_since = time.time() - self.protect_seconds
+            for file, (mtime, _) in sorted(self.index.items(), key=lambda f: f[1]):
+                if self.size <= self.max_size:
+                    break
+                if mtime >= protected_since:
+                    continue
+                self.remove(file)
+
+    def remove(self, file: str):
+        """
+        Удаляет файл из кэша вместе с файлом блокировки и пустой папкой ключа
+        """
+        _, size = self.index.pop(file)
+        self.size -= size
+
+        folder, name = os.path.split(file)
+        for path in (file, os.path.join(folder, f'.{name}.lock')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(folder)
+        except OSError:
+            # в папке есть другие версии файла
+            pass
+
+    @asynccontextmanager
+    async def lock(self, path: Path):
+        """
+        Межпроцессная блокировка на загрузку файла, чтобы файл скачивался один раз,
+        даже если он нужен нескольким запросам
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path.parent / f'.{path.name}.lock', mode='w') as f:
+            if fcntl is None:
+                yield
+                return
+
+            await asyncio.to_thread(fcntl.flock, f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ObjectStorage:
+    """
+    Папка с данными источников в объектном хранилище (S3-совместимом или любом другом
+    с интерфейсом fsspec).
+
+    Список объектов (с размерами и ETag) читается раз в listing_interval секунд в фоне
+    (см. run), поэтому каталог объектов и версии данных определяются без запросов
+    к хранилищу. Файлы таблиц скачиваются в локальный кэш DiskCache при первом
+    чтении: большие файлы - параллельными запросами диапазонов байтов по part_size.
+    Схемы Parquet и Arrow IPC читаются из метаданных в конце файла запросами
+    диапазонов байтов, без загрузки файла, и данные этих форматов запросы тоже
+    читают диапазонами байтов (см. open_dataset).
+
+    Если включен prefetch, то измененные объекты, которые уже читались, скачиваются
+    в фоне сразу после обновления списка объектов, и запрос к ним не ждет загрузки.
+
+    Пути к файлам - логические: root / {база данных} / {схема} / {файл}
+    """
+
+    def __init__(
+        self,
+        fs: fsspec.AbstractFileSystem,
+        url: str,
+        cache: DiskCache,
+        listing_interval: float = 30,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 8,
+        prefetch: bool = True,
+    ):
+        self.fs = fs
+        self.url = url
+        self.fs_root = fs._strip_protocol(url).rstrip('/')
+        self.root = Path('/') / self.fs_root.lstrip('/')
+        self.cache = cache
+        self.listing_interval = listing_interval
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.prefetch = prefetch
+
+        # список объектов: файлы (относительный путь -> метаданные) и папки
+        # (относительный путь -> названия вложенных файлов и папок)
+        self.files: dict[str, FileStat] | None = None
+        self.dirs: dict[str, set[str]] = {}
+        # файлы, которые читались процессом (для фоновой загрузки их новых версий)
+        self.fetched: set[str] = set()
+
+    async def run(self):
+        """
+        Периодически обновляет список объектов (до отмены задачи)
+        """
+        if self.files is not None:
+            # список уже прочитан при запуске приложения (см. ServiceContainer.start)
+            await asyncio.sleep(self.listing_interval)
+
+        while True:
+            try:
+                changed = await self.refresh()
+                if self.prefetch:
+                    await self.prefetch_files(changed)
+            except Exception as e:
+                logger.warning(f'Не удалось обновить список объектов {self.url}: {e}')
+            await asyncio.sleep(self.listing_interval)
+
+    async def refresh(self) -> list[str]:
+        """
+        Читает список объектов хранилища. Возвращает файлы, которые изменились
+        с прошлого чтения списка
+        """
+        return await asyncio.to_thread(self.read_listing)
+
+    def read_listing(self) -> list[str]:
+        """ """
+        # fsspec кэширует списки объектов, а нужен текущий список
+        self.fs.invalidate_cache()
+        infos = self.fs.find(self.fs_root, detail=True)
+
+        files, dirs = {}, {'': set()}
+        for name, info in infos.items():
+            if info.get('type') == 'directory':
+                continue
+            rel = name.rstrip('/')[len(self.fs_root) :].strip('/')
+            files[rel] = self.get_stat(info)
+
+            parts = rel.split('/')
+            for i in range(len(parts)):
+                dirs.setdefault('/'.join(parts[:i]), set()).add(parts[i])
+
+        previous = self.files or {}
+        self.files, self.dirs = files, dirs
+
+        return [rel for rel, stat in files.items() if previous.get(rel) != stat]
+
+    async def prefetch_files(self, rels: list[str]):
+        """
+        Скачивает в кэш новые версии файлов, которые уже читались
+        """
+        for rel in rels:
+            if rel not in self.fetched:
+                continue
+            try:
+                await self.fetch(self.root / rel)
+            except Exception as e:
+                logger.warning(f'Не удалось скачать файл {rel}: {e}')
+
+    def get_listing(self) -> tuple[dict[str, FileStat], dict[str, set[str]]]:
+        """
+        Возвращает список объектов. Список читается при запуске приложения, а если
+        прочитать его не удалось - при первом обращении
+        """
+        if self.files is None:
+            self.read_listing()
+        return self.files, self.dirs
+
+    def get_rel(self, path: Path) -> str:
+        """
+        Возвращает путь к файлу относительно корня хранилища
+        """
+        try:
+            rel = path.relative_to(self.root).as_posix()
+        except ValueError:
+            raise FileNotFoundError(str(path))
+        return '' if rel == '.' else rel
+
+    def get_fs_path(self, path: Path) -> str:
+        rel = self.get_rel(path)
+        return f'{self.fs_root}/{rel}' if rel else self.fs_root
+
+    def exists(self, path: Path) -> bool:
+        files, dirs = self.get_listing()
+        rel = self.get_rel_or_none(path)
+        return rel is not None and (rel in files or rel in dirs)
+
+    def is_file(self, path: Path) -> bool:
+        files, _ = self.get_listing()
+        return self.get_rel_or_none(path) in files
+
+    def listdir(self, path: Path) -> list[str]:
+        _, dirs = self.get_listing()
+        rel = self.get_rel(path)
+        if rel not in dirs:
+            raise FileNotFoundError(str(path))
+        return sorted(dirs[rel])
+
+    def stat(self, path: Path) -> FileStat:
+        """
+        Возвращает метаданные файла. Версия папки меняется при добавлении и удалении
+        вложенных файлов и папок
+        """
+        files, dirs = self.get_listing()
+        rel = self.get_rel(path)
+        if rel in files:
+            return files[rel]
+        if rel in dirs:
+            names = '\n'.join(sorted(dirs[rel]))
+            return FileStat(
+                size=0, mtime_ns=0, etag=hashlib.sha1(names.encode('utf-8')).hexdigest()
+            )
+        raise FileNotFoundError(str(path))
+
+    def get_key(self, path: Path) -> str:
+        return f'{self.url.rstrip("/")}/{self.get_rel(path)}'
+
+    def get_local_path(self, path: Path) -> Path | None:
+        return self.cache.get(self.get_cache_path(path))
+
+    async def fetch(self, path: Path, deadline: Deadline | None = None) -> Path:
+        """
+        Возвращает путь к скачанному файлу в локальном кэше (скачивает файл, если
+        текущей версии файла нет в кэше)
+        """
+        self.fetched.add(self.get_rel(path))
+
+        cache_path = self.get_cache_path(path)
+        if self.cache.get(cache_path) is not None:
+            return cache_path
+
+        async with self.cache.lock(cache_path):
+            # пока ожидали блокировку, файл мог скачать другой процесс
+            if self.cache.get(cache_path) is not None:
+                return cache_path
+
+            if deadline is not None:
+                deadline.check()
+
+            tmp_path = cache_path.with_name(
+                cache_path.name + f'.{uuid.uuid4().hex}.tmp'
+            )
+            try:
+                await self.download(path, tmp_path, deadline)
+                await asyncio.to_thread(self.cache.put, tmp_path, cache_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+        return cache_path
+
+    async def download(
+        self, path: Path, target: Path, deadline: Deadline | None = None
+    ):
+        """
+        Скачивает файл частями по part_size байт (до max_concurrency запросов
+        диапазонов байтов одновременно). Срок deadline проверяется перед загрузкой
+        каждой части
+        """
+        fs_path = self.get_fs_path(path)
+        stat = self.stat(path)
+
+        with open(target, mode='wb') as f:
+            f.truncate(stat.size)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def download_part(start: int):
+            async with semaphore:
+                if deadline is not None:
+                    deadline.check()
+                end = min(start + self.part_size, stat.size)
+                data = await asyncio.to_thread(self.fs.cat_file, fs_path, start, end)
+                await asyncio.to_thread(self.write_part, target, start, data)
+
+        await asyncio.gather(
+            *(download_part(start) for start in range(0, stat.size, self.part_size))
+        )
+
+        # части файла должны относиться к одной версии объекта
+        info = await asyncio.to_thread(self.fs.info, fs_path)
+        if self.get_stat(info).version != stat.version:
+            raise RuntimeError(f'Файл {path.name} изменился во время загрузки')
+
+    def open(self, path: Path) -> BinaryIO:
+        local_path = self.get_local_path(path)
+        if local_path is not None:
+            return open(local_path, mode='rb')
+        return self.fs.open(self.get_fs_path(path), mode='rb', cache_type='readahead')
+
+    def open_dataset(self, path: Path, format: str) -> pads.Dataset:
+        """
+        Открывает файл как набор данных pyarrow. Если файла нет в локальном кэше,
+        то он не скачивается: при чтении из хранилища запрашиваются только нужные
+        диапазоны байтов (метаданные файла и данные нужных столбцов)
+        """
+        local_path = self.get_local_path(path)
+        if local_path is not None:
+            return pads.dataset(str(local_path), format=format)
+
+        return pads.dataset(
+            self.get_fs_path(path),
+            format=format,
+            filesystem=pafs.PyFileSystem(pafs.FSSpecHandler(self.fs)),
+        )
+
+    def get_cache_path(self, path: Path) -> Path:
+        # сохраняются два последних расширения (например, .ndjson.gz)
+        return self.cache.get_path(
+            self.get_key(path), self.stat(path).version, ''.join(path.suffixes[-2:])
+        )
+
+    def get_rel_or_none(self, path: Path) -> str | None:
+        try:
+            return self.get_rel(path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def write_part(target: Path, start: int, data: bytes):
+        with open(target, mode='r+b') as f:
+            f.seek(start)
+            f.write(data)
+
+    @staticmethod
+    def get_stat(info: dict[str, Any]) -> FileStat:
+        """
+        Возвращает метаданные файла по описанию объекта fsspec
+        """
+        etag = info.get('ETag') or info.get('etag')
+        mtime = info.get('LastModified') or info.get('mtime') or 0
+        if isinstance(mtime, datetime.datetime):
+            mtime = mtime.timestamp()
+        return FileStat(
+            size=int(info.get('size') or 0),
+            mtime_ns=int(mtime * 1_000_000_000),
+            etag=etag.strip('"') if etag else None,
+        )
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from pathlib import Path
+from contextlib import asynccontextmanager
+
+import os
+import json
+import asyncio
+import hashlib
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from aw_connector_example.lazy import lazy_import
+from aw_connector_example.services.filters import Predicate
+from aw_connector_example.services.schema import TableSchema
+from aw_connector_example.services.storage import LocalStorage, ObjectStorage
+from aw_connector_example.services.statistics import TableStatistics
+from aw_connector_example.services.zone_map import ZoneMap
+
+if TYPE_CHECKING:
+    import polars
+    import pyarrow as pa
+else:
+    polars = lazy_import('polars')
+    pa = lazy_import('pyarrow')
+
+
+class CachedTable:
+    """
+    Колоночная копия таблицы источника: Arrow IPC файл, разбитый на фрагменты
+    (record batch) по chunk_rows строк, и зональная карта этих фрагментов
+    """
+
+    def __init__(self, path: Path, zone_map: ZoneMap):
+        self.path = path
+        self.zone_map = zone_map
+
+    @property
+    def schema(self) -> polars.Schema:
+        with pa.memory_map(str(self.path)) as source:
+            return polars.from_arrow(
+                pa.ipc.open_file(source).schema.empty_table()
+            ).schema
+
+    def scan(
+        self,
+        predicates: list[Predicate] | None = None,
+        columns: list[str] | None = None,
+    ) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм с данными таблицы. Фрагменты, которые по зональной
+        карте не могут удовлетворять предикатам, не читаются. Если указан список
+        столбцов columns, то читаются только эти столбцы
+        """
+        chunks = (
+            self.zone_map.prune(predicates)
+            if predicates
+            else range(len(self.zone_map.chunks))
+        )
+
+        # файл отображается в память, поэтому непрочитанные фрагменты не декодируются
+        # и не занимают память процесса. Фрагменты ссылаются на отображение, и после
+        # закрытия файла оно остается, пока фрейм использует данные фрагментов
+        with pa.memory_map(str(self.path)) as source:
+            reader = pa.ipc.open_file(source)
+            schema = reader.schema
+            batches = [reader.get_batch(i) for i in chunks]
+        if columns is not None:
+            schema = pa.schema([schema.field(c) for c in columns])
+            batches = [batch.select(columns) for batch in batches]
+
+        table = pa.Table.from_batches(batches, schema=schema)
+
+        # без объединения фрагментов данные не копируются из отображения в память
+        # процесса
+        return polars.from_arrow(table, rechunk=False).lazy()
+
+    def scan_file(self, columns: list[str] | None = None) -> polars.LazyFrame:
+        """
+        Возвращает ленивый фрейм, который читает файл копии по частям во время
+        выполнения запроса (для потокового движка Polars). Зональная карта
+        не используется, условия проталкиваются в чтение файла самим Polars
+        """
+        frame = polars.scan_ipc(self.path, memory_map=True)
+        return frame if columns is None else frame.select(columns)
+
+
+class TableCache:
+    """
+    Кэш колоночных копий таблиц источника.
+
+    Копия привязана к версии исходного файла (размер и время изменения или ETag
+    объекта в объектном хранилище), поэтому
+    при изменении файла она строится заново. Копии читаются через отображение
+    файлов в память, поэтому при запуске в несколько процессов данные таблицы
+    хранятся в памяти один раз (в страничном кэше ОС), а не в каждом процессе
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        chunk_rows: int = 65536,
+        storage: LocalStorage | ObjectStorage | None = None,
+    ):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        # хранилище файлов таблиц (версия файла определяется по его метаданным)
+        self.storage = storage or LocalStorage(root)
+
+    def get(self, table_path: Path) -> CachedTable | None:
+        """
+        Возвращает колоночную копию таблицы (или None, если ее нет в кэше)
+        """
+        data_path, zone_map_path = self.get_paths(table_path)
+        if not data_path.exists() or not zone_map_path.exists():
+            return None
+
+        with open(zone_map_path, mode='r') as f:
+            zone_map = ZoneMap.from_dict(json.load(f))
+
+        return CachedTable(data_path, zone_map)
+
+    def put(self, table_path: Path, frame: polars.DataFrame) -> CachedTable:
+        """
+        Сохраняет в кэш колоночную копию таблицы
+        """
+        data_path, zone_map_path = self.get_paths(table_path)
+        cached_table = self.write(data_path, zone_map_path, frame, self.chunk_rows)
+
+        self.remove_stale_versions(data_path.parent, keep=data_path.stem)
+
+        if not self.get_schema_path(table_path).exists():
+            self.put_schema(table_path, TableSchema(frame.schema))
+
+        return cached_table
+
+    @staticmethod
+    def write(
+        data_path: Path, zone_map_path: Path, frame: polars.DataFrame, chunk_rows: int
+    ) -> CachedTable:
+        """
+        Записывает фрейм в Arrow IPC файл фрагментами по chunk_rows строк
+        и строит зональную карту этих фрагментов
+        """
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # фрагменты зональной карты должны совпадать с record batch в файле
+        table = frame.to_arrow(
+            compat_level=polars.CompatLevel.newest()
+        ).combine_chunks()
+        zone_map = ZoneMap.build(frame, chunk_rows)
+
+        # файлы пишутся во временные и переименовываются, чтобы параллельные
+        # запросы не увидели недописанные данные
+        tmp_suffix = f'.{uuid.uuid4().hex}.tmp'
+        tmp_data_path = data_path.with_name(data_path.name + tmp_suffix)
+        with pa.ipc.new_file(str(tmp_data_path), table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=chunk_rows):
+                writer.write_batch(batch)
+
+        tmp_zone_map_path = zone_map_path.with_name(zone_map_path.name + tmp_suffix)
+        with open(tmp_zone_map_path, mode='w') as f:
+            json.dump(zone_map.to_dict(), f)
+
+        os.replace(tmp_data_path, data_path)
+        os.replace(tmp_zone_map_path, zone_map_path)
+
+        return CachedTable(data_path, zone_map)
+
+    @asynccontextmanager
+    async def lock(self, table_path: Path):
+        """
+        Межпроцессная блокировка на построение копии таблицы, чтобы несколько
+        процессов не декодировали одну и ту же таблицу одновременно
+        """
+        folder = self.get_paths(table_path)[0].parent
+        folder.mkdir(parents=True, exist_ok=True)
+
+        with open(folder / '.lock', mode='w') as f:
+            if fcntl is None:
+                yield
+                return
+
+            await asyncio.to_thread(fcntl.flock, f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def get_schema(self, table_path: Path) -> TableSchema | None:
+        """
+        Возвращает сохраненную схему текущей версии таблицы (или None)
+        """
+        schema_path = self.get_schema_path(table_path)
+        if not schema_path.exists():
+            return None
+
+        with pa.memory_map(str(schema_path)) as source:
+            arrow_schema = pa.ipc.open_file(source).schema
+
+        metadata = arrow_schema.metadata or {}
+        return TableSchema(
+            polars.from_arrow(arrow_schema.empty_table()).schema,
+            sampled=metadata.get(b'sampled') == b'1',
+            revision=int(metadata.get(b'revision', 0)),
+        )
+
+    def put_schema(self, table_path: Path, table_schema: TableSchema):
+        """
+        Сохраняет схему текущей версии таблицы
+        """
+        schema_path = self.get_schema_path(table_path)
+        schema_path.parent.mkdir(parents=True, exist_ok=True)
+
+        arrow_schema = (
+            polars.DataFrame(schema=table_schema.schema)
+            .to_arrow(compat_level=polars.CompatLevel.newest())
+            .schema.with_metadata(
+                {
+                    'sampled': '1' if table_schema.sampled else '0',
+                    'revision': str(table_schema.revision),
+                }
+            )
+        )
+
+        tmp_schema_path = schema_path.with_name(
+            schema_path.name + f'.{uuid.uuid4().hex}.tmp'
+        )
+        with pa.ipc.new_file(str(tmp_schema_path), arrow_schema):
+            pass
+        os.replace(tmp_schema_path, schema_path)
+
+    def get_stats(self, table_path: Path) -> TableStatistics | None:
+        """
+        Возвращает сохраненные статистики текущей версии таблицы (или None)
+        """
+        return self.read_stats(self.get_stats_path(table_path))
+
+    def put_stats(self, table_path: Path, stats: TableStatistics):
+        """
+        Сохраняет статистики текущей версии таблицы
+        """
+        self.write_stats(self.get_stats_path(table_path), stats)
+
+    @staticmethod
+    def read_stats(stats_path: Path) -> TableStatistics | None:
+        if not stats_path.exists():
+            return None
+
+        with open(stats_path, mode='r') as f:
+            return TableStatistics.from_dict(json.load(f))
+
+    @staticmethod
+    def write_stats(stats_path: Path, stats: TableStatistics):
+        stats_path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_stats_path = stats_path.with_name(
+            stats_path.name + f'.{uuid.uuid4().hex}.tmp'
+        )
+        with open(tmp_stats_path, mode='w') as f:
+            json.dump(stats.to_dict(), f)
+        os.replace(tmp_stats_path, stats_path)
+
+    def get_stats_path(self, table_path: Path) -> Path:
+        data_path, _ = self.get_paths(table_path)
+        return data_path.with_suffix('.stats.json')
+
+    def get_schema_path(self, table_path: Path) -> Path:
+        data_path, _ = self.get_paths(table_path)
+        return data_path.with_suffix('.schema.arrow')
+
+    def get_paths(self, table_path: Path) -> tuple[Path, Path]:
+        """
+        Возвращает пути к файлу с данными и к зональной карте текущей версии таблицы
+        """
+        table_key = hashlib.sha1(self.storage.get_key(table_path).encode()).hexdigest()
+        version = self.storage.stat(table_path).version
+        folder = self.root / 'tables' / table_key
+
+        return folder / f'{version}.arrow', folder / f'{version}.zonemap.json'
+
+    @staticmethod
+    def remove_stale_versions(folder: Path, keep: str):
+        """
+        Удаляет копии предыдущих версий таблицы
+        """
+        for file in folder.iterdir():
+            if file.name.startswith('.') or file.name.endswith('.tmp'):
+                continue
+            if file.name.split('.', maxsplit=1)[0] != keep:
+                try:
+                    file.unlink()
+                except FileNotFoundError:
+                    pass
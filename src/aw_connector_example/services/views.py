@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from pathlib import Path
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+
+import asyncio
+import json
+import logging
+import re
+import shutil
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+import aiofiles
+import aiofiles.os
+
+from aw_connector_example.dto import DataSource
+from aw_connector_example.services.table_cache import CachedTable, TableCache
+from aw_connector_example.services.zone_map import ZoneMap
+
+if TYPE_CHECKING:
+    import polars
+    from aw_connector_example.services.repo import DataRepository
+
+
+logger = logging.getLogger('uvicorn')
+
+
+@dataclass(frozen=True)
+class ViewDefinition:
+    """
+    Материализованное представление: SQL запрос к таблицам источника, результат
+    которого хранится на диске и пересчитывается при изменении этих таблиц
+    """
+
+    schema: str
+    name: str
+    query_text: str
+
+    @property
+    def object_name(self) -> str:
+        return f'{self.schema}.{self.name}'
+
+
+class ViewStore:
+    """
+    Хранилище материализованных представлений.
+
+    Описания представлений хранятся в папке root/{db}/ (общей для всех workers),
+    результаты - там же в виде колоночных копий (Arrow IPC с зональной картой),
+    как копии таблиц в TableCache. Результат привязан к версии данных представления
+    (тексту запроса, размеру и времени изменения файлов таблиц), поэтому при изменении
+    таблиц он пересчитывается
+    """
+
+    # названия представлений (schema.name) используются в путях к файлам
+    object_name_pattern = re.compile(
+        r'^[A-Za-z_][A-Za-z0-9_]*\.[A-Za-z_][A-Za-z0-9_]*$'
+    )
+
+    def __init__(self, root: Path, chunk_rows: int = 65536):
+        self.root = root
+        self.chunk_rows = chunk_rows
+
+    async def list_dbs(self) -> list[str]:
+        """
+        Возвращает базы данных, для которых есть представления
+        """
+        if not await aiofiles.os.path.exists(self.root):
+            return []
+        return sorted(await aiofiles.os.listdir(self.root))
+
+    async def list(self, db_name: str) -> list[ViewDefinition]:
+        """
+        Возвращает представления базы данных
+        """
+        folder = self.root / db_name
+        if not await aiofiles.os.path.exists(folder):
+            return []
+
+        views = []
+        for file in sorted(await aiofiles.os.listdir(folder)):
+            if file.endswith('.json'):
+                async with aiofiles.open(folder / file, mode='r') as f:
+                    views.append(ViewDefinition(**json.loads(await f.read())))
+        return views
+
+    async def get(self, db_name: str, object_name: str) -> ViewDefinition | None:
+        """
+        Возвращает представление по названию schema.name (или None)
+        """
+        if not self.object_name_pattern.match(object_name):
+            return None
+
+        view_file = self.root / db_name / f'{object_name}.json'
+        if not await aiofiles.os.path.exists(view_file):
+            return None
+
+        async with aiofiles.open(view_file, mode='r') as f:
+            return ViewDefinition(**json.loads(await f.read()))
+
+    async def put(self, db_name: str, view: ViewDefinition):
+        """
+        Сохраняет описание представления (заменяет существующее)
+        """
+        folder = self.root / db_name
+        await aiofiles.os.makedirs(folder, exist_ok=True)
+
+        tmp_view_file = folder / f'{view.object_name}.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp_view_file, mode='w') as f:
+            await f.write(json.dumps(asdict(view), ensure_ascii=False))
+        await aiofiles.os.replace(tmp_view_file, folder / f'{view.object_name}.json')
+
+    async def delete(self, db_name: str, object_name: str) -> bool:
+        """
+        Удаляет представление и его результат. Возвращает False, если представления нет
+        """
+        if not self.object_name_pattern.match(object_name):
+            return False
+
+        view_file = self.root / db_name / f'{object_name}.json'
+        if not await aiofiles.os.path.exists(view_file):
+            return False
+
+        await aiofiles.os.remove(view_file)
+        await asyncio.to_thread(
+            shutil.rmtree, self.get_data_folder(db_name, object_name), True
+        )
+        return True
+
+    def get_table(
+        self, db_name: str, view: ViewDefinition, version: str
+    ) -> CachedTable | None:
+        """
+        Возвращает результат представления для версии данных version (или None)
+        """
+        data_path, zone_map_path = self.get_paths(db_name, view, version)
+        if not data_path.exists() or not zone_map_path.exists():
+            return None
+
+        with open(zone_map_path, mode='r') as f:
+            zone_map = ZoneMap.from_dict(json.load(f))
+
+        return CachedTable(data_path, zone_map)
+
+    def put_table(
+        self,
+        db_name: str,
+        view: ViewDefinition,
+        version: str,
+        frame: polars.DataFrame,
+    ) -> CachedTable:
+        """
+        Сохраняет результат представления для версии данных version
+        """
+        data_path, zone_map_path = self.get_paths(db_name, view, version)
+        cached_table = TableCache.write(
+            data_path, zone_map_path, frame, self.chunk_rows
+        )
+
+        TableCache.remove_stale_versions(data_path.parent, keep=version)
+
+        return cached_table
+
+    def get_refreshed_at(self, db_name: str, view: ViewDefinition) -> float | None:
+        """
+        Возвращает время последнего расчета представления (или None)
+        """
+        folder = self.get_data_folder(db_name, view.object_name)
+        if not folder.exists():
+            return None
+
+        times = [f.stat().st_mtime for f in folder.glob('*.arrow')]
+        return max(times) if times else None
+
+    @asynccontextmanager
+    async def lock(self, db_name: str, view: ViewDefinition):
+        """
+        Межпроцессная блокировка на расчет представления, чтобы запрос представления
+        выполнялся один раз, даже если его результат нужен нескольким запросам
+        """
+        folder = self.get_data_folder(db_name, view.object_name)
+        await aiofiles.os.makedirs(folder, exist_ok=True)
+
+        with open(folder / '.lock', mode='w') as f:
+            if fcntl is None:
+                yield
+                return
+
+            await asyncio.to_thread(fcntl.flock, f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def get_data_folder(self, db_name: str, object_name: str) -> Path:
+        return self.root / db_name / 'data' / object_name
+
+    def get_paths(
+        self, db_name: str, view: ViewDefinition, version: str
+    ) -> tuple[Path, Path]:
+        """
+        Возвращает пути к файлу с результатом и к зональной карте представления
+        """
+        folder = self.get_data_folder(db_name, view.object_name)
+        return folder / f'{version}.arrow', folder / f'{version}.zonemap.json'
+
+
+class ViewRefresher:
+    """
+    Фоновый пересчет материализованных представлений.
+
+    Раз в interval секунд проверяются версии данных всех представлений, и
+    представления, таблицы которых изменились, пересчитываются. Поэтому запросы
+    к представлениям после изменения данных, как правило, не ждут пересчета
+    """
+
+    def __init__(self, data_repo: DataRepository, interval: float = 30):
+        self.data_repo = data_repo
+        self.interval = interval
+
+    async def run(self):
+        """ """
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self):
+        """
+        Пересчитывает представления, данные которых изменились. Ошибки пересчета
+        записываются в лог, представление будет пересчитано при следующей проверке
+        (или при запросе к нему)
+        """
+        views = self.data_repo.views
+        for db_name in await views.list_dbs():
+            data_source = DataSource(id=0, type='views', params={'db': db_name})
+            for view in await views.list(db_name):
+                try:
+                    await self.data_repo.load_view(data_source, view)
+                except Exception as e:
+                    logger.warning(
+                        f'Не удалось пересчитать представление {db_name}.{view.object_name}: {e}'
+                    )
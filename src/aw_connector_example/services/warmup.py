@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
+from fnmatch import fnmatchcase
+
+import asyncio
+import logging
+
+from aw_connector_example.dto import DataSource
+from aw_connector_example.lazy import lazy_import
+from aw_connector_example.services.repo import DataRepository
+
+if TYPE_CHECKING:
+    import s3fs
+else:
+    s3fs = lazy_import('s3fs')
+
+
+logger = logging.getLogger('uvicorn')
+
+
+class Warmup:
+    """
+    Прогрев коннектора после запуска.
+
+    Читается каталог объектов всех баз данных, для "горячих" таблиц строятся
+    колоночные копии (или определяются только схемы таблиц), открывается соединение
+    к S3 хранилищу. Таблицы указываются шаблонами вида db1.public.table1
+    (допускаются * и ?). Пока прогрев не закончен, ready = False
+    """
+
+    def __init__(
+        self,
+        data_repo: DataRepository,
+        tables: list[str] | None = None,
+        schemas: list[str] | None = None,
+        s3_storage_options: dict[str, Any] | None = None,
+        s3_bucket: str = '',
+    ):
+        self.data_repo = data_repo
+        self.tables = tables or []
+        self.schemas = schemas or []
+        self.s3_storage_options = s3_storage_options
+        self.s3_bucket = s3_bucket
+
+        self.ready = False
+        self.errors: list[str] = []
+
+    async def run(self):
+        """
+        Выполняет прогрев. Ошибки прогрева не останавливают запуск коннектора,
+        а только записываются в лог и в список errors
+        """
+        try:
+            await self.warmup_catalog()
+        except Exception as e:
+            self.add_error(f'Не удалось прочитать каталог объектов: {e}')
+
+        await self.warmup_s3()
+
+        self.ready = True
+        logger.info('Прогрев коннектора завершен')
+
+    async def warmup_catalog(self):
+        """
+        Читает каталог объектов и прогревает таблицы, подходящие под шаблоны
+        """
+        storage, root = self.data_repo.storage, self.data_repo.root
+        if not await asyncio.to_thread(storage.exists, root):
+            return
+
+        for db_name in sorted(await asyncio.to_thread(storage.listdir, root)):
+            data_source = DataSource(id=0, type='warmup', params={'db': db_name})
+
+            try:
+                objects = await self.data_repo.get_objects(data_source)
+            except Exception as e:
+                self.add_error(
+                    f'Не удалось прочитать каталог базы данных {db_name}: {e}'
+                )
+                continue
+
+            for obj in objects:
+                object_name = f'{obj.schema_name}.{obj.name}'
+                table_key = f'{db_name}.{object_name}'
+
+                try:
+                    if self.match(table_key, self.tables):
+                        await self.warmup_table(data_source, object_name)
+                    elif self.match(table_key, self.schemas):
+                        await self.data_repo.get_object_meta(data_source, object_name)
+                    else:
+                        continue
+                except Exception as e:
+                    self.add_error(f'Не удалось прогреть таблицу {table_key}: {e}')
+                else:
+                    logger.debug(f'Таблица {table_key} прогрета')
+
+    async def warmup_table(self, data_source: DataSource, object_name: str):
+        """
+        Строит колоночную копию таблицы (если кэш таблиц отключен, то определяет
+        только схему таблицы)
+        """
+        if self.data_repo.table_cache is None:
+            await self.data_repo.get_object_meta(data_source, object_name)
+            return
+
+        await self.data_repo.scan_object(data_source, object_name)
+
+    async def warmup_s3(self):
+        """
+        Открывает соединение к S3 хранилищу (первая выгрузка в S3 не тратит время
+        на установку соединения). Экземпляр S3FileSystem с теми же параметрами
+        кэшируется fsspec и используется при выгрузке
+        """
+        if self.s3_storage_options is None or not self.s3_bucket:
+            return
+
+        try:
+            fs = s3fs.S3FileSystem(**self.s3_storage_options)
+            await asyncio.to_thread(fs.ls, self.s3_bucket)
+        except Exception as e:
+            self.add_error(f'Не удалось подключиться к S3 хранилищу: {e}')
+
+    def add_error(self, error: str):
+        logger.warning(f'Ошибка прогрева коннектора: {error}')
+        self.errors.append(error)
+
+    @staticmethod
+    def match(table_key: str, patterns: list[str]) -> bool:
+        return any(fnmatchcase(table_key, pattern) for pattern in patterns)
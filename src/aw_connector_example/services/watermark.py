@@ -0,0 +1,125 @@
+from typing import Any
+from pathlib import Path
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+
+import asyncio
+import datetime
+import hashlib
+import json
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+import aiofiles
+import aiofiles.os
+
+from aw_connector_example.dto import ParquetRequest
+
+
+@dataclass(frozen=True)
+class Watermark:
+    """
+    Отметка инкрементальной выгрузки: максимальное значение столбца column среди
+    уже выгруженных строк
+    """
+
+    column: str
+    value: Any
+
+
+class WatermarkStore:
+    """
+    Хранилище отметок (watermark) инкрементальной выгрузки в parquet.
+
+    Отметка хранится для каждой комбинации (источник, объект, папка выгрузки)
+    в отдельном файле в папке root. Файл записывается во временный и затем
+    переименовывается, поэтому отметка либо обновляется целиком, либо остается
+    прежней. Отметку нужно сохранять только после успешной записи данных
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    @staticmethod
+    def get_column(request: ParquetRequest) -> str | None:
+        """
+        Возвращает столбец для инкрементальной выгрузки: из запроса или из параметра
+        'ИнкрементальныйСтолбец' источника (название столбца или словарь
+        "объект -> столбец"). Если столбец не указан, выгрузка полная
+        """
+        if request.incremental_column:
+            return request.incremental_column
+
+        extra = request.object.data_source.extra or {}
+        column = extra.get('ИнкрементальныйСтолбец')
+        if isinstance(column, dict):
+            column = column.get(request.object.name)
+
+        return str(column) if column else None
+
+    @staticmethod
+    def get_key(request: ParquetRequest) -> str:
+        """
+        Возвращает ключ отметки для источника, объекта (или текста SQL запроса)
+        и папки выгрузки
+        """
+        obj = request.object
+        object_key = obj.query_text if obj.type == 'sql' else obj.name
+        key = f'{obj.data_source.id}\n{object_key}\n{request.folder}'
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Watermark | None:
+        """
+        Возвращает сохраненную отметку (или None, если выгрузок еще не было)
+        """
+        watermark_file = self.root / f'{key}.json'
+        if not await aiofiles.os.path.exists(watermark_file):
+            return None
+
+        async with aiofiles.open(watermark_file, mode='r') as f:
+            return Watermark(**json.loads(await f.read()))
+
+    async def put(self, key: str, watermark: Watermark):
+        """
+        Сохраняет отметку
+        """
+        await aiofiles.os.makedirs(self.root, exist_ok=True)
+
+        tmp_watermark_file = self.root / f'{key}.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp_watermark_file, mode='w') as f:
+            await f.write(json.dumps(asdict(watermark), ensure_ascii=False))
+        await aiofiles.os.replace(tmp_watermark_file, self.root / f'{key}.json')
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        """
+        Межпроцессная блокировка выгрузки по ключу отметки, чтобы две одновременные
+        выгрузки не выгрузили одни и те же строки
+        """
+        await aiofiles.os.makedirs(self.root, exist_ok=True)
+
+        with open(self.root / f'{key}.lock', mode='w') as f:
+            if fcntl is None:
+                yield
+                return
+
+            await asyncio.to_thread(fcntl.flock, f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def to_json_value(value: Any) -> Any:
+        """
+        Приводит значение столбца к виду, в котором его можно сохранить в JSON
+        """
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
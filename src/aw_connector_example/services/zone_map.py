@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+from typing import Any, TYPE_CHECKING
+from dataclasses import dataclass, field
+import datetime
+
+from aw_connector_example.lazy import lazy_import
+from aw_connector_example.services.filters import Predicate
+
+if TYPE_CHECKING:
+    import polars
+else:
+    polars = lazy_import('polars')
+
+
+@dataclass
+class ColumnStats:
+    """
+    Статистики столбца во фрагменте таблицы
+    """
+
+    min: Any = None
+    max: Any = None
+    null_count: int = 0
+
+
+@dataclass
+class ChunkStats:
+    """
+    Статистики фрагмента (chunk) таблицы
+    """
+
+    offset: int
+    rows: int
+    columns: dict[str, ColumnStats] = field(default_factory=dict)
+
+
+class ZoneMap:
+    """
+    Зональная карта таблицы: значения min/max и количество null по каждому столбцу
+    в каждом фрагменте таблицы.
+
+    По зональной карте можно определить фрагменты, в которых гарантированно нет строк,
+    удовлетворяющих условиям фильтра, и не читать их
+    """
+
+    def __init__(self, chunks: list[ChunkStats], dtypes: dict[str, str]):
+        self.chunks = chunks
+        self.dtypes = dtypes
+
+    @classmethod
+    def build(cls, frame: polars.DataFrame, chunk_rows: int) -> 'ZoneMap':
+        """
+        Строит зональную карту за один проход по данным (фрагменты по chunk_rows строк)
+        """
+        columns = [
+            name
+            for name, dtype in frame.schema.items()
+            if cls.dtype_kind(dtype) is not None
+        ]
+        dtypes = {name: cls.dtype_kind(frame.schema[name]) for name in columns}
+
+        stats = (
+            frame.lazy()
+            .with_row_index('__row')
+            .group_by((polars.col('__row') // chunk_rows).alias('__chunk'))
+            .agg(
+                polars.len().alias('__rows'),
+                *[polars.col(c).min().alias(f'{c}__min') for c in columns],
+                *[polars.col(c).max().alias(f'{c}__max') for c in columns],
+                *[polars.col(c).null_count().alias(f'{c}__nulls') for c in columns],
+            )
+            .sort('__chunk')
+            .collect()
+        )
+
+        chunks = [
+            ChunkStats(
+                offset=row['__chunk'] * chunk_rows,
+                rows=row['__rows'],
+                columns={
+                    c: ColumnStats(
+                        min=row[f'{c}__min'],
+                        max=row[f'{c}__max'],
+                        null_count=row[f'{c}__nulls'],
+                    )
+                    for c in columns
+                },
+            )
+            for row in stats.iter_rows(named=True)
+        ]
+
+        return cls(chunks=chunks, dtypes=dtypes)
+
+    def prune(self, predicates: list[Predicate]) -> list[int]:
+        """
+        Возвращает индексы фрагментов, в которых могут быть строки, удовлетворяющие
+        всем предикатам
+        """
+        return [
+            i
+            for i, chunk in enumerate(self.chunks)
+            if all(self.may_match(chunk, p) for p in predicates)
+        ]
+
+    @staticmethod
+    def may_match(chunk: ChunkStats, predicate: Predicate) -> bool:
+        """
+        Проверяет, могут ли во фрагменте быть строки, удовлетворяющие предикату.
+        Если это нельзя определить по статистикам, то возвращается True
+        """
+        stats = chunk.columns.get(predicate.column)
+        if stats is None:
+            return True
+
+        match predicate.operator:
+            case 'is null':
+                return stats.null_count > 0
+            case 'is not null':
+                return stats.null_count < chunk.rows
+
+        if stats.null_count >= chunk.rows:
+            # во фрагменте только null, с ними не совпадает ни одно сравнение
+            return False
+
+        lo, hi, value = stats.min, stats.max, predicate.value
+        try:
+            match predicate.operator:
+                case '=':
+                    return lo <= value <= hi
+                case '!=':
+                    return not (lo == hi == value)
+                case '<':
+                    return lo < value
+                case '<=':
+                    return lo <= value
+                case '>':
+                    return hi > value
+                case '>=':
+                    return hi >= value
+                case 'in':
+                    return any(v is not None and lo <= v <= hi for v in value)
+        except TypeError:
+            # значение нельзя сравнить со статистиками (например, строка и число)
+            return True
+
+        return True
+
+    # --------------------------------------------------------------------
+    # Сериализация
+    # --------------------------------------------------------------------
+    def to_dict(self) -> dict:
+        dump = self.dump_value
+        return {
+            'dtypes': self.dtypes,
+            'chunks': [
+                {
+                    'offset': chunk.offset,
+                    'rows': chunk.rows,
+                    'columns': {
+                        name: [
+                            dump(stats.min, self.dtypes[name]),
+                            dump(stats.max, self.dtypes[name]),
+                            stats.null_count,
+                        ]
+                        for name, stats in chunk.columns.items()
+                    },
+                }
+                for chunk in self.chunks
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ZoneMap':
+        dtypes: dict[str, str] = data['dtypes']
+        load = cls.load_value
+        return cls(
+            chunks=[
+                ChunkStats(
+                    offset=chunk['offset'],
+                    rows=chunk['rows'],
+                    columns={
+                        name: ColumnStats(
+                            min=load(lo, dtypes[name]),
+                            max=load(hi, dtypes[name]),
+                            null_count=nulls,
+                        )
+                        for name, (lo, hi, nulls) in chunk['columns'].items()
+                    },
+                )
+                for chunk in data['chunks']
+            ],
+            dtypes=dtypes,
+        )
+
+    @staticmethod
+    def dump_value(value: Any, kind: str) -> Any:
+        """
+        Преобразует значение статистики в значение JSON
+        """
+        if value is not None and kind in ('date', 'datetime'):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def load_value(value: Any, kind: str) -> Any:
+        """
+        Восстанавливает значение статистики из значения JSON
+        """
+        if value is None:
+            return None
+        match kind:
+            case 'date':
+                return datetime.date.fromisoformat(value)
+            case 'datetime':
+                return datetime.datetime.fromisoformat(value)
+        return value
+
+    @staticmethod
+    def dtype_kind(dtype: polars.DataType) -> str | None:
+        """
+        Возвращает вид типа столбца, для которого ведутся статистики (или None,
+        если значения столбца нельзя упорядочить)
+        """
+        if dtype.is_numeric() and not isinstance(dtype, polars.Decimal):
+            return 'number'
+        if dtype == polars.String:
+            return 'string'
+        if dtype == polars.Boolean:
+            return 'bool'
+        if dtype == polars.Date:
+            return 'date'
+        if isinstance(dtype, polars.Datetime) and dtype.time_zone is None:
+            return 'datetime'
+        return None
@@ -6,3 +6,115 @@ class Settings(BaseSettings):
     """
     etl_s3_url: str = ''
     etl_s3_bucket: str = ''
+
+    # интервал фоновой проверки доступа к S3 хранилищу (в секундах)
+    health_check_interval: float = 10
+    # максимальное время ожидания ответа S3 хранилища при проверке (в секундах)
+    health_check_timeout: float = 5
+    # через сколько секунд результат проверки считается устаревшим
+    health_check_stale_after: float = 60
+
+    # заголовок Cache-Control ответов со списком объектов и метаданными (с ETag)
+    metadata_cache_control: str = 'no-cache'
+
+    # алгоритмы сжатия ответов в порядке предпочтения: zstd, gzip (через запятую,
+    # пустая строка - не сжимать ответы)
+    compression_encodings: str = 'zstd,gzip'
+    # ответы меньше этого размера (в байтах) не сжимаются
+    compression_min_size: int = 1024
+    # уровень сжатия gzip (1-9)
+    compression_gzip_level: int = 6
+    # уровень сжатия zstd (1-22)
+    compression_zstd_level: int = 3
+    # ответы начиная с этого размера (в байтах) сжимаются в отдельном потоке
+    compression_thread_threshold: int = 256 * 1024
+
+    # количество процессов (workers), в которых запускается коннектор
+    connector_workers: int = 1
+    # папка для хранения статусов задач асинхронной выгрузки (общая для всех workers)
+    queue_folder: str = ''
+
+    # максимальное количество одновременно выполняемых запросов к данным в процессе
+    # (0 - без ограничения)
+    admission_max_requests: int = 8
+    # максимальное количество одновременно выполняемых запросов к одному источнику
+    admission_source_max_requests: int = 4
+    # максимальная оценка памяти для одновременно выполняемых запросов (в МБ)
+    admission_memory_limit_mb: int = 0
+    # максимальная оценка памяти для запросов к одному источнику (в МБ)
+    admission_source_memory_limit_mb: int = 0
+    # максимальное количество запросов, ожидающих в очереди
+    admission_queue_size: int = 64
+    # максимальное время ожидания запроса в очереди (в секундах)
+    admission_queue_timeout: float = 30
+
+    # папка для хранения отметок инкрементальной выгрузки в parquet (общая для всех workers)
+    watermark_folder: str = ''
+
+    # папка с данными источников: путь на диске или URL папки в S3 (s3://bucket/prefix),
+    # пустая строка - папка data внутри пакета
+    data_root: str = ''
+    # URL S3 хранилища с данными источников (в формате ETL_S3_URL, пустая строка -
+    # хранилище из ETL_S3_URL)
+    data_s3_url: str = ''
+    # папка локального кэша файлов из S3 (пустая строка - подпапка objects в cache_folder)
+    data_cache_folder: str = ''
+    # максимальный размер локального кэша файлов из S3 (в МБ)
+    data_cache_size_mb: int = 10240
+    # интервал обновления списка файлов в S3 (в секундах)
+    data_listing_interval: float = 30
+    # размер части файла, которые скачиваются из S3 параллельно (в МБ)
+    data_download_part_size_mb: int = 8
+    # сколько частей файла скачиваются одновременно
+    data_download_concurrency: int = 8
+    # скачивать в фоне новые версии файлов, которые уже читались
+    data_prefetch: bool = True
+
+    # папка для служебных файлов коннектора (колоночные копии таблиц и т.п.)
+    cache_folder: str = ''
+    # хранить колоночные копии таблиц источника с зональными картами
+    table_cache_enabled: bool = True
+    # количество строк во фрагменте колоночной копии таблицы
+    table_cache_chunk_rows: int = 65536
+    # начиная с какой оценки памяти запроса (в МБ) он выполняется потоковым движком
+    # Polars (0 - не использовать потоковое выполнение)
+    streaming_threshold_mb: int = 512
+    # папка для временных файлов потокового выполнения запросов
+    spill_folder: str = ''
+    # количество строк в выборке для определения типов столбцов таблицы
+    schema_sample_rows: int = 1000
+    # точность оценки количества различных значений в статистиках столбцов: 2^N
+    # регистров HyperLogLog (14 - 16384 регистра, погрешность около 0.8%)
+    stats_precision: int = 14
+
+    # папка для хранения материализованных представлений (общая для всех workers)
+    views_folder: str = ''
+    # интервал фоновой проверки и пересчета представлений (в секундах, 0 - пересчитывать
+    # только при запросе к представлению)
+    views_refresh_interval: float = 30
+
+    # параметры записи parquet-файлов по умолчанию (могут быть переопределены в запросе)
+    # алгоритм сжатия: none, snappy, gzip, brotli, zstd или lz4
+    parquet_compression: str = 'snappy'
+    # уровень сжатия (для gzip, brotli и zstd, по умолчанию - уровень алгоритма)
+    parquet_compression_level: int | None = None
+    # использовать словарное кодирование столбцов
+    parquet_use_dictionary: bool = True
+    # размер страницы данных (в байтах)
+    parquet_data_page_size: int = 1024 * 1024
+    # количество строк в группе строк (row group)
+    parquet_max_rows_per_group: int = 1024 * 1024
+    # максимальное количество строк в одном файле (0 - без ограничения)
+    parquet_max_rows_per_file: int = 0
+    # примерный размер одного файла в МБ несжатых данных (0 - без ограничения)
+    parquet_target_file_size_mb: float = 0
+    # не выгружать повторно объект, данные которого не изменились с прошлой выгрузки
+    # в ту же папку (по отпечатку параметров запроса и файлов таблиц)
+    parquet_skip_unchanged: bool = True
+    # сколько объектов пакетной выгрузки выгружаются одновременно
+    parquet_batch_max_parallel: int = 4
+
+    # таблицы, колоночные копии которых строятся при запуске (шаблоны db.schema.table через запятую)
+    warmup_tables: str = ''
+    # таблицы, схемы которых определяются при запуске (шаблоны db.schema.table через запятую)
+    warmup_schemas: str = ''
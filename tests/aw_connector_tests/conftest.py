@@ -2,9 +2,24 @@ import pytest
 from fastapi.testclient import TestClient
 
 from aw_connector_example.main import app
+from aw_connector_example.settings import Settings
+from aw_connector_example.dependencies import get_settings
 
 
 @pytest.fixture(scope='session')
-def app_client():
+def app_client(tmp_path_factory):
     """ """
-    yield TestClient(app=app)
+    settings = Settings(
+        cache_folder=str(tmp_path_factory.mktemp('cache')),
+        queue_folder=str(tmp_path_factory.mktemp('queue')),
+        spill_folder=str(tmp_path_factory.mktemp('spill')),
+        watermark_folder=str(tmp_path_factory.mktemp('watermarks')),
+        views_folder=str(tmp_path_factory.mktemp('views')),
+    )
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    # сервисы приложения создаются в lifespan, поэтому клиент запускается как контекст
+    with TestClient(app=app) as client:
+        yield client
+
+    app.dependency_overrides.clear()
@@ -10,11 +10,48 @@ def test_object_data(app_client):
                 'params': {'db': 'db1'},
                 'extra': {},
             },
-            'object_name': 'public.table1'
+            'object_name': 'public.table1',
         },
     )
 
     assert r.is_success, r.text
-    
+
     object_data = r.json()['data']
-    assert object_data and isinstance(object_data, list), 'Нет данных объекта'
\ No newline at end of file
+    assert object_data and isinstance(object_data, list), 'Нет данных объекта'
+
+
+def test_object_data_compression(app_client, monkeypatch):
+    """ """
+    # данные тестовых таблиц меньше порога сжатия по умолчанию
+    monkeypatch.setattr(app_client.app.state.services.compressor, 'min_size', 0)
+
+    request = {
+        'data_source': {
+            'id': 1,
+            'type': 'custom',
+            'params': {'db': 'db1'},
+            'extra': {},
+        },
+        'object_name': 'public.table1',
+    }
+
+    r = app_client.post(
+        url='data-source/object-data',
+        json=request,
+        headers={'Accept-Encoding': 'gzip'},
+    )
+    assert r.is_success, r.text
+    assert r.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in r.headers['vary']
+    assert r.json()['data']
+
+    r = app_client.post(
+        url='data-source/object-data',
+        json=request,
+        headers={'Accept-Encoding': 'identity'},
+    )
+    assert r.is_success, r.text
+    assert 'content-encoding' not in r.headers
+
+    metrics = app_client.get('metrics').json()['compression']
+    assert metrics['encodings']['gzip']['responses'] >= 1
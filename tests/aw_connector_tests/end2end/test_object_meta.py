@@ -32,4 +32,35 @@ def test_object_meta_wrong_name(app_client):
         },
     )
 
-    assert not r.is_success, 'Успешный ответ для несуществующей таблицы источника'
\ No newline at end of file
+    assert not r.is_success, 'Успешный ответ для несуществующей таблицы источника'
+
+def test_object_meta_etag(app_client):
+    """ """
+    body = {
+        'data_source': {
+            'id': 1,
+            'type': 'custom',
+            'params': {'db': 'db1'},
+            'extra': {},
+        },
+        'object_name': 'public.table1',
+    }
+    r = app_client.post(url='data-source/object-meta', json=body)
+    assert r.is_success, r.text
+    etag = r.headers['ETag']
+    assert r.headers['Cache-Control']
+
+    r = app_client.post(
+        url='data-source/object-meta', json=body, headers={'If-None-Match': etag}
+    )
+    assert r.status_code == 304
+    assert r.headers['ETag'] == etag
+
+    # ETag зависит от тела запроса
+    r = app_client.post(
+        url='data-source/object-meta',
+        json={**body, 'object_name': 'public.table2'},
+        headers={'If-None-Match': f'W/{etag}'},
+    )
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
@@ -0,0 +1,46 @@
+def test_object_stats(app_client):
+    """ """
+    body = {
+        'data_source': {
+            'id': 1,
+            'type': 'custom',
+            'params': {'db': 'db1'},
+            'extra': {},
+        },
+        'object_name': 'public.table1',
+    }
+    r = app_client.post(url='data-source/object-stats', json=body)
+
+    assert r.is_success, r.text
+    stats = r.json()
+    assert stats['row_count'] == 3
+    columns = {c['name']: c for c in stats['columns']}
+    assert columns['id']['min'] == 1
+    assert columns['id']['max'] == 3
+    assert columns['name']['distinct_count'] == 3
+    assert columns['table']['distinct_count'] == 1
+
+    r = app_client.post(
+        url='data-source/object-stats',
+        json=body,
+        headers={'If-None-Match': r.headers['ETag']},
+    )
+    assert r.status_code == 304
+
+
+def test_object_stats_wrong_name(app_client):
+    """ """
+    r = app_client.post(
+        url='data-source/object-stats',
+        json={
+            'data_source': {
+                'id': 1,
+                'type': 'custom',
+                'params': {'db': 'db1'},
+                'extra': {},
+            },
+            'object_name': 'public.missing',
+        },
+    )
+
+    assert r.status_code == 400, r.text
@@ -0,0 +1,52 @@
+def export(name: str, folder: str) -> dict:
+    return {
+        'object': {
+            'data_source': {
+                'id': 1,
+                'type': 'custom',
+                'params': {'db': 'db1'},
+                'extra': {},
+            },
+            'name': name,
+            'type': 'table',
+        },
+        'folder': folder,
+    }
+
+
+def test_parquet_batch_status(app_client):
+    """ """
+    r = app_client.post(
+        url='data-source/parquet/batch',
+        json={
+            'exports': [
+                export('public.missing1', 'runs/missing1'),
+                export('public.missing2', 'runs/missing2'),
+            ],
+            'max_parallel': 2,
+        },
+    )
+    assert r.status_code == 202, r.text
+    assert r.json()['status'] == 'running'
+    location = r.headers['Location']
+
+    # фоновая задача TestClient выполняется до возврата ответа
+    r = app_client.get(location)
+    assert r.status_code == 200, r.text
+    batch_status = r.json()
+    assert batch_status['status'] == 'error'
+    assert [o['name'] for o in batch_status['objects']] == [
+        'public.missing1',
+        'public.missing2',
+    ]
+    assert all(o['status'] == 'error' for o in batch_status['objects'])
+    assert 'missing2' in batch_status['objects'][1]['error']
+
+    # после получения итогового состояния информация о пакете удаляется
+    assert app_client.get(location).status_code == 404
+
+
+def test_parquet_batch_empty(app_client):
+    """ """
+    r = app_client.post(url='data-source/parquet/batch', json={'exports': []})
+    assert r.status_code == 422
@@ -15,3 +15,25 @@ def test_object_meta(app_client):
 
     assert r.is_success, r.text
     assert r.json()['columns'], 'Нет столцов в метаданных объекта'
+
+
+def test_sql_meta_etag(app_client):
+    """ """
+    body = {
+        'data_source': {
+            'id': 1,
+            'type': 'custom',
+            'params': {'db': 'db1'},
+            'extra': {},
+        },
+        'sql_text': 'select * from table1',
+    }
+    r = app_client.post(url='data-source/sql-meta', json=body)
+    assert r.is_success, r.text
+
+    r = app_client.post(
+        url='data-source/sql-meta',
+        json=body,
+        headers={'If-None-Match': r.headers['ETag']},
+    )
+    assert r.status_code == 304
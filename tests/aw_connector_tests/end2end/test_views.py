@@ -0,0 +1,47 @@
+DATA_SOURCE = {
+    'id': 1,
+    'type': 'custom',
+    'params': {'db': 'db1'},
+    'extra': {},
+}
+
+
+def test_views(app_client):
+    """ """
+    r = app_client.post(
+        url='data-source/views',
+        json={
+            'data_source': DATA_SOURCE,
+            'name': 'table1_names',
+            'query_text': 'select id, name from table1',
+        },
+    )
+    assert r.is_success, r.text
+
+    r = app_client.post(url='data-source/objects', json={'data_source': DATA_SOURCE})
+    assert r.is_success, r.text
+    assert {'schema': 'views', 'name': 'table1_names', 'type': 'view'} in r.json()
+
+    r = app_client.post(url='data-source/views/list', json={'data_source': DATA_SOURCE})
+    assert r.is_success, r.text
+    (view,) = r.json()
+    assert view['fresh'] and view['refreshed_at']
+
+    r = app_client.post(
+        url='data-source/object-data',
+        json={'data_source': DATA_SOURCE, 'object_name': 'views.table1_names'},
+    )
+    assert r.is_success, r.text
+    assert r.json()['data'] and set(r.json()['data'][0]) == {'id', 'name'}
+
+    r = app_client.post(
+        url='data-source/views/drop',
+        json={'data_source': DATA_SOURCE, 'object_name': 'views.table1_names'},
+    )
+    assert r.is_success, r.text
+
+    r = app_client.post(
+        url='data-source/object-data',
+        json={'data_source': DATA_SOURCE, 'object_name': 'views.table1_names'},
+    )
+    assert r.status_code == 400
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from aw_connector_example.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+
+
+async def run_requests(admission, requests, order, hold: asyncio.Event):
+    """
+    Запускает запросы (источник, память) и записывает порядок их выполнения
+    """
+
+    async def run(name, source_id, memory):
+        async with admission.admit(source_id, memory):
+            order.append(name)
+            await hold.wait()
+
+    tasks = []
+    for name, source_id, memory in requests:
+        tasks.append(asyncio.create_task(run(name, source_id, memory)))
+        # запросы встают в очередь в порядке создания
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_source_limit():
+    """ """
+
+    async def main():
+        admission = AdmissionController(max_requests=4, source_max_requests=1)
+        order, hold = [], asyncio.Event()
+        tasks = await run_requests(
+            admission, [('a1', 1, 0), ('a2', 1, 0), ('b1', 2, 0)], order, hold
+        )
+        # второй запрос к источнику 1 ждет, запрос к источнику 2 выполняется
+        assert order == ['a1', 'b1']
+        assert admission.queued == 1
+
+        hold.set()
+        await asyncio.gather(*tasks)
+        assert order == ['a1', 'b1', 'a2']
+        assert admission.usage.requests == 0 and not admission.source_usage
+
+    asyncio.run(main())
+
+
+def test_fair_queue():
+    """ """
+
+    async def main():
+        admission = AdmissionController(max_requests=1)
+        order, hold = [], asyncio.Event()
+        tasks = await run_requests(
+            admission,
+            [('a1', 1, 0), ('a2', 1, 0), ('a3', 1, 0), ('b1', 2, 0)],
+            order,
+            hold,
+        )
+        hold.set()
+        await asyncio.gather(*tasks)
+        # источники обслуживаются по кругу
+        assert order == ['a1', 'a2', 'b1', 'a3']
+
+    asyncio.run(main())
+
+
+def test_memory_limit():
+    """ """
+
+    async def main():
+        admission = AdmissionController(memory_limit=100)
+        order, hold = [], asyncio.Event()
+        tasks = await run_requests(
+            admission,
+            [('a1', 1, 60), ('b1', 2, 60), ('c1', 3, 1000)],
+            order,
+            hold,
+        )
+        assert order == ['a1']
+
+        hold.set()
+        await asyncio.gather(*tasks)
+        # запрос больше лимита выполняется, когда других запросов нет
+        assert order == ['a1', 'b1', 'c1']
+
+    asyncio.run(main())
+
+
+def test_rejected():
+    """ """
+
+    async def main():
+        admission = AdmissionController(
+            max_requests=1, queue_size=1, queue_timeout=0.05, retry_after=2
+        )
+        order, hold = [], asyncio.Event()
+        tasks = await run_requests(admission, [('a1', 1, 0), ('a2', 1, 0)], order, hold)
+
+        # очередь заполнена
+        with pytest.raises(AdmissionRejected) as e:
+            async with admission.admit(2):
+                pass
+        assert e.value.retry_after == 2
+
+        # время ожидания в очереди истекло
+        with pytest.raises(AdmissionRejected):
+            await tasks[1]
+        assert admission.queued == 0
+
+        hold.set()
+        await tasks[0]
+        assert admission.usage.requests == 0
+
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+import gzip
+
+import pyarrow as pa
+import pytest
+
+from aw_connector_example.services.compression import ResponseCompressor
+
+
+def test_choose_encoding():
+    """ """
+    compressor = ResponseCompressor(['zstd', 'gzip'])
+
+    assert compressor.choose_encoding(None) is None
+    assert compressor.choose_encoding('br') is None
+    assert compressor.choose_encoding('gzip, deflate') == 'gzip'
+    assert compressor.choose_encoding('gzip, zstd') == 'zstd'
+    assert compressor.choose_encoding('zstd;q=0, gzip') == 'gzip'
+    assert compressor.choose_encoding('*') == 'zstd'
+    # алгоритм, от которого клиент явно отказался, не выбирается и при *
+    assert compressor.choose_encoding('zstd;q=0, *') == 'gzip'
+    assert compressor.choose_encoding('zstd;q=0, gzip;q=0, *') is None
+
+    with pytest.raises(ValueError):
+        ResponseCompressor(['br'])
+
+
+def test_compress():
+    """ """
+    compressor = ResponseCompressor(
+        ['zstd', 'gzip'], min_size=100, thread_threshold=1000
+    )
+    body = b'{"data": [' + b'[1, "abc"], ' * 1000 + b'[]]}'
+
+    assert asyncio.run(compressor.compress(b'{}', 'gzip')) is None
+
+    # большие ответы сжимаются в отдельном потоке
+    compressed = asyncio.run(compressor.compress(body, 'gzip'))
+    assert gzip.decompress(compressed) == body
+
+    compressed = asyncio.run(compressor.compress(body[:500], 'zstd'))
+    assert (
+        pa.Codec('zstd').decompress(compressed, decompressed_size=500, asbytes=True)
+        == body[:500]
+    )
+
+    stats = compressor.get_stats()
+    assert stats['skipped_small'] == 1
+    assert stats['encodings']['gzip']['responses'] == 1
+    assert stats['encodings']['gzip']['bytes_in'] == len(body)
+    assert stats['encodings']['gzip']['ratio'] > 10
+    assert stats['encodings']['zstd']['responses'] == 1
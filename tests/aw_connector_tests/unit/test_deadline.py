@@ -0,0 +1,151 @@
+import asyncio
+import time
+from pathlib import Path
+
+import polars
+import pytest
+import pyarrow as pa
+
+import aw_connector_example
+from aw_connector_example.dto import DataSource, ParquetWriterOptions
+from aw_connector_example.services.admission import AdmissionController
+from aw_connector_example.services.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    run_in_thread,
+)
+from aw_connector_example.services.parquet import ParquetService
+from aw_connector_example.services.repo import DataRepository, DataRepositoryError
+
+
+@pytest.fixture
+def repo():
+    yield DataRepository(Path(aw_connector_example.__file__).parent / 'data')
+
+
+def expired_deadline() -> Deadline:
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    return deadline
+
+
+def test_parse_timeout():
+    """ """
+    assert Deadline.parse_timeout(None) is None
+    assert Deadline.parse_timeout('') is None
+    assert Deadline.parse_timeout('0') is None
+    assert Deadline.parse_timeout('2.5') == 2.5
+    assert Deadline.parse_timeout(10) == 10
+
+    with pytest.raises(ValueError):
+        Deadline.parse_timeout('-1')
+    with pytest.raises(ValueError):
+        Deadline.parse_timeout('abc')
+
+
+def test_get_deadline(repo):
+    """ """
+    data_source = DataSource(id=1, type='custom', params={}, extra={'Таймаут': '30'})
+
+    assert repo.get_deadline(data_source).timeout == 30
+    # используется меньший из таймаутов источника и заголовка запроса
+    assert repo.get_deadline(data_source, '5').timeout == 5
+    assert repo.get_deadline(DataSource(id=1, type='custom', params={})) is None
+
+    with pytest.raises(DataRepositoryError):
+        repo.get_deadline(data_source, 'abc')
+
+
+def test_expired_object_frame(repo):
+    """ """
+    data_source = DataSource(id=1, type='custom', params={'db': 'db1'}, extra={})
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(
+            repo.get_object_frame(
+                data_source, 'public.table1', deadline=expired_deadline()
+            )
+        )
+
+
+def test_abandoned_work_holds_admission():
+    """
+    Ресурсы запроса, прерванного по сроку, освобождаются только после завершения
+    работы в потоке, и работа прерывается через cancel
+    """
+
+    async def main():
+        admission = AdmissionController(max_requests=1)
+        deadline = Deadline(0.05)
+        cancelled = []
+
+        with pytest.raises(DeadlineExceeded):
+            async with admission.admit(1, deadline=deadline):
+                await run_in_thread(
+                    deadline, time.sleep, 0.3, cancel=lambda: cancelled.append(True)
+                )
+
+        assert cancelled == [True]
+        assert admission.usage.requests == 1
+
+        await asyncio.sleep(0.5)
+        assert admission.usage.requests == 0 and not admission.source_usage
+
+    asyncio.run(main())
+
+
+def test_expired_parquet_write(tmp_path):
+    """ """
+    table = pa.table({'id': list(range(100))})
+    parquet_service = ParquetService(
+        options=ParquetWriterOptions(max_rows_per_group=10)
+    )
+
+    with pytest.raises(DeadlineExceeded):
+        # запись прерывается на первой группе строк
+        parquet_service.write_dataset(
+            table, str(tmp_path / 'export'), deadline=expired_deadline()
+        )
+    # недописанный файл удален
+    assert not list(tmp_path.rglob('*.parquet'))
+
+    asyncio.run(parquet_service.write_table_fs(table, str(tmp_path / 'export')))
+    assert len(list(tmp_path.rglob('*.parquet'))) == 1
+
+
+def test_expired_streaming_parquet_write(tmp_path):
+    """
+    Ожидание потоковой записи прекращается по сроку, а файл выгрузки не появляется
+    """
+    frame = polars.LazyFrame({'id': range(5_000_000)}).sort(polars.col('id') % 1000)
+    parquet_service = ParquetService(spill_folder=tmp_path / 'spill')
+
+    async def main():
+        deadline = Deadline(0.05)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await parquet_service.write_table_fs(
+                frame, str(tmp_path / 'export'), deadline=deadline
+            )
+        assert time.monotonic() - started < 0.5
+
+        pending = deadline.pending_work()
+        if pending is not None:
+            await pending
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert not list(tmp_path.rglob('*.parquet'))
+
+
+def test_object_data_timeout(app_client):
+    """ """
+    r = app_client.post(
+        url='data-source/object-data',
+        json={
+            'data_source': {'id': 1, 'type': 'custom', 'params': {'db': 'db1'}},
+            'object_name': 'public.table1',
+        },
+        headers={'X-Request-Timeout': '-1'},
+    )
+    assert r.status_code == 400, r.text
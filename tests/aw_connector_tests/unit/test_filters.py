@@ -0,0 +1,212 @@
+import datetime
+
+import polars
+import pytest
+
+from aw_connector_example.dto import ParquetFilterExpr
+from aw_connector_example.services.filters import (
+    FilterError,
+    Predicate,
+    compile_filters,
+)
+
+
+@pytest.fixture
+def frame():
+    yield polars.DataFrame(
+        {
+            'id': [1, 2, 3, 4, 5],
+            'name': ['name 1', 'name 2', 'name 3', 'other', None],
+            'created_at': [datetime.date(2025, 1, d) for d in range(1, 6)],
+        }
+    ).lazy()
+
+
+def apply(frame: polars.LazyFrame, filters: list[ParquetFilterExpr]) -> list[int]:
+    compiled = compile_filters(filters, frame.collect_schema())
+    return frame.filter(compiled.expr).collect()['id'].to_list()
+
+
+def test_structured_filters(frame):
+    """ """
+    assert apply(
+        frame,
+        [
+            ParquetFilterExpr(field_name='id', operator='>', value='1'),
+            ParquetFilterExpr(
+                field_name='created_at', operator='<=', value='2025-01-04'
+            ),
+        ],
+    ) == [2, 3, 4]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='id', operator='in', value='(1, 5)')]
+    ) == [1, 5]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='name', operator='like', value='name%')]
+    ) == [1, 2, 3]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='name', operator='is', value='null')]
+    ) == [5]
+
+
+def test_value_only_filters(frame):
+    """ """
+    assert apply(frame, [ParquetFilterExpr(value='id < 3 or id between 4 and 5')]) == [
+        1,
+        2,
+        4,
+        5,
+    ]
+    assert apply(
+        frame, [ParquetFilterExpr(value='name is not null and id not in (1, 2)')]
+    ) == [3, 4]
+
+
+def test_structured_value_is_not_sql(frame):
+    """
+    Значение в структурированном условии не должно интерпретироваться как SQL
+    """
+    assert (
+        apply(
+            frame,
+            [ParquetFilterExpr(field_name='name', operator='=', value='1 or 1=1')],
+        )
+        == []
+    )
+
+
+def test_structured_string_values():
+    """
+    Строка в структурированном условии сравнивается как есть, без разбора как SQL
+    """
+    frame = polars.DataFrame(
+        {'id': [1, 2, 3, 4], 'code': ['0008', '8', 'null', '1e1']}
+    ).lazy()
+
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='code', operator='=', value='0008')]
+    ) == [1]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='code', operator='=', value='null')]
+    ) == [3]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='code', operator='=', value='1e1')]
+    ) == [4]
+    assert apply(
+        frame,
+        [ParquetFilterExpr(field_name='code', operator='in', value=['0008', 'null'])],
+    ) == [1, 3]
+    # для числового столбца строка приводится к типу столбца
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='id', operator='=', value='2')]
+    ) == [2]
+
+
+def test_quoted_values(frame):
+    """
+    Значение в кавычках SQL принимается без кавычек для всех операторов
+    """
+    assert apply(
+        frame,
+        [
+            ParquetFilterExpr(
+                field_name='created_at', operator='=', value="'2025-01-03'"
+            )
+        ],
+    ) == [3]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='name', operator='=', value="'other'")]
+    ) == [4]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='name', operator='like', value="'name%'")]
+    ) == [1, 2, 3]
+    assert apply(
+        frame,
+        [
+            ParquetFilterExpr(
+                field_name='name', operator='in', value="('name 1', 'other')"
+            )
+        ],
+    ) == [1, 4]
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='id', operator='between', value='2 and 3')]
+    ) == [2, 3]
+    assert apply(
+        frame,
+        [
+            ParquetFilterExpr(
+                field_name='created_at',
+                operator='between',
+                value="'2025-01-02' and '2025-01-03'",
+            )
+        ],
+    ) == [2, 3]
+    # запятая внутри кавычек не разделяет значения
+    assert apply(
+        polars.DataFrame({'id': [1, 2], 'name': ['a, b', 'a']}).lazy(),
+        [ParquetFilterExpr(field_name='name', operator='in', value="'a, b'")],
+    ) == [1]
+
+
+@pytest.mark.parametrize(
+    'f',
+    [
+        ParquetFilterExpr(field_name='name', operator='=', value=8),
+        ParquetFilterExpr(field_name='created_at', operator='=', value='yesterday'),
+        ParquetFilterExpr(field_name='id', operator='in', value='1, two'),
+        ParquetFilterExpr(value="created_at > 'yesterday'"),
+    ],
+)
+def test_type_mismatch(frame, f):
+    """
+    Значение, которое нельзя привести к типу столбца, - ошибка условия фильтра
+    """
+    with pytest.raises(FilterError):
+        compile_filters([f], frame.collect_schema())
+
+
+def test_fractional_value_for_integer_column(frame):
+    """
+    Дробное значение не округляется до целого при сравнении с целочисленным столбцом
+    """
+    assert apply(frame, [ParquetFilterExpr(value='id < 2.5')]) == [1, 2]
+    assert apply(frame, [ParquetFilterExpr(value='id = 2.5')]) == []
+    assert apply(
+        frame, [ParquetFilterExpr(field_name='id', operator='<=', value='2.5')]
+    ) == [1, 2]
+
+    compiled = compile_filters(
+        [ParquetFilterExpr(value='id < 2.5')], frame.collect_schema()
+    )
+    assert compiled.predicates == [Predicate(column='id', operator='<', value=2.5)]
+
+
+@pytest.mark.parametrize(
+    'value',
+    [
+        'id < 5; drop table table1',
+        'id in (select id from table2)',
+        "lower(name) = 'name 1'",
+        'id < (select max(id) from table2)',
+    ],
+)
+def test_unsafe_filters_rejected(value):
+    """ """
+    with pytest.raises(FilterError):
+        compile_filters([ParquetFilterExpr(value=value)])
+
+
+def test_predicates(frame):
+    """ """
+    compiled = compile_filters(
+        [
+            ParquetFilterExpr(field_name='id', operator='>=', value=2),
+            ParquetFilterExpr(value="'2025-01-03' > created_at or id = 1"),
+            ParquetFilterExpr(value='5 > id'),
+        ],
+        frame.collect_schema(),
+    )
+    assert compiled.predicates == [
+        Predicate(column='id', operator='>=', value=2),
+        Predicate(column='id', operator='<', value=5),
+    ]
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+from aw_connector_example.dto import ParquetRequest
+from aw_connector_example.services.fingerprint import FingerprintStore
+
+
+def parquet_request(**kwargs) -> ParquetRequest:
+    return ParquetRequest.model_validate(
+        {
+            'object': {
+                'data_source': {'id': 1, 'type': 'custom', 'params': {'db': 'db1'}},
+                'name': 'public.table1',
+                'type': 'table',
+            },
+            'folder': 's3://runs/table1',
+            **kwargs,
+        }
+    )
+
+
+def test_matches(tmp_path):
+    """ """
+    store = FingerprintStore(tmp_path / 'fingerprints')
+    table_path = tmp_path / 'table1.json'
+    table_path.write_text('[{"id": 1}]')
+
+    async def main():
+        previous = await store.build(parquet_request(), [table_path])
+        previous.files = {'file-0.parquet': 100}
+        await store.put('key', previous)
+        previous = await store.get('key')
+
+        # файл перезаписан теми же данными: изменилось только время изменения
+        os.utime(table_path, ns=(0, 0))
+        same = await store.build(parquet_request(), [table_path], previous)
+
+        other_filters = await store.build(
+            parquet_request(filters=[{'value': 'id > 1'}]), [table_path], previous
+        )
+
+        table_path.write_text('[{"id": 2}]')
+        changed = await store.build(parquet_request(), [table_path], previous)
+
+        return previous, same, other_filters, changed
+
+    previous, same, other_filters, changed = asyncio.run(main())
+    assert previous.files == {'file-0.parquet': 100}
+    assert same.matches(previous)
+    assert same.tables[str(table_path)]['mtime_ns'] == 0
+    assert not other_filters.matches(previous)
+    assert not changed.matches(previous)
+
+
+def test_request_hash_ignores_folder():
+    """ """
+    assert FingerprintStore.hash_request(
+        parquet_request()
+    ) == FingerprintStore.hash_request(parquet_request(folder='s3://runs/other'))
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+# бюджет времени импорта приложения (в миллисекундах)
+IMPORT_TIME_BUDGET_MS = int(os.getenv('IMPORT_TIME_BUDGET_MS', '1000'))
+
+# тяжелые библиотеки, которые импортируются только при первом обращении к данным
+DEFERRED_MODULES = ['polars', 'pyarrow', 'sqlglot', 's3fs', 'botocore']
+
+
+def import_profile() -> dict[str, int]:
+    """
+    Импортирует приложение в отдельном процессе с -X importtime и возвращает
+    накопленное время импорта модулей (в микросекундах)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import aw_connector_example.main'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.removeprefix('import time:').split('|')
+        profile[name.strip()] = int(cumulative)
+
+    return profile
+
+
+def test_deferred_imports():
+    """ """
+    profile = import_profile()
+    assert [m for m in DEFERRED_MODULES if m in profile] == []
+
+
+def test_import_time_budget():
+    """ """
+    # берем лучший из нескольких запусков, чтобы не зависеть от случайных задержек
+    import_time_ms = (
+        min(import_profile()['aw_connector_example.main'] for _ in range(3)) / 1000
+    )
+
+    assert import_time_ms < IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,132 @@
+import asyncio
+
+import polars
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from aw_connector_example.dto import ParquetWriterOptions
+from aw_connector_example.services.parquet import ParquetService
+
+
+@pytest.fixture
+def table():
+    yield pa.table(
+        {
+            'id': list(range(100)),
+            'region': ['north', 'south', None, 'east/west'] * 25,
+        }
+    )
+
+
+def test_get_options():
+    """ """
+    parquet_service = ParquetService(
+        options=ParquetWriterOptions(compression='snappy', max_rows_per_group=1000)
+    )
+
+    options = parquet_service.get_options(ParquetWriterOptions(compression='zstd'))
+    assert options.compression == 'zstd'
+    # не указанные в запросе параметры берутся по умолчанию
+    assert options.max_rows_per_group == 1000
+    assert parquet_service.get_options(None) is parquet_service.options
+
+
+def test_write_options(tmp_path, table):
+    """ """
+    parquet_service = ParquetService()
+    asyncio.run(
+        parquet_service.write_table_fs(
+            table,
+            str(tmp_path / 'export'),
+            options=ParquetWriterOptions(
+                compression='zstd', max_rows_per_group=30, use_dictionary=False
+            ),
+        )
+    )
+
+    (file_path,) = (tmp_path / 'export').glob('*.parquet')
+    metadata = pq.ParquetFile(file_path).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [
+        30,
+        30,
+        30,
+        10,
+    ]
+    assert metadata.row_group(0).column(0).compression == 'ZSTD'
+    assert pq.read_table(file_path).equals(table)
+
+
+def test_max_rows_per_file(tmp_path, table):
+    """ """
+    parquet_service = ParquetService()
+    parquet_service.write_dataset(
+        table,
+        str(tmp_path / 'export'),
+        options=ParquetWriterOptions(max_rows_per_file=40, max_rows_per_group=15),
+    )
+
+    files = sorted((tmp_path / 'export').glob('*.parquet'))
+    assert [pq.ParquetFile(f).metadata.num_rows for f in files] == [40, 40, 20]
+    assert pq.read_table(tmp_path / 'export').sort_by('id')['id'] == table['id']
+
+
+def test_partition_cols(tmp_path, table):
+    """ """
+    parquet_service = ParquetService()
+    parquet_service.write_dataset(
+        table,
+        str(tmp_path / 'export'),
+        options=ParquetWriterOptions(partition_cols=['region']),
+    )
+
+    folders = sorted(p.name for p in (tmp_path / 'export').iterdir())
+    assert folders == [
+        'region=__HIVE_DEFAULT_PARTITION__',
+        'region=east%2Fwest',
+        'region=north',
+        'region=south',
+    ]
+
+    dataset = pq.read_table(tmp_path / 'export', partitioning='hive')
+    assert dataset.num_rows == 100
+    assert dataset.filter(pa.compute.field('region') == 'north').num_rows == 25
+
+    with pytest.raises(ValueError):
+        parquet_service.write_dataset(
+            table,
+            str(tmp_path / 'other'),
+            options=ParquetWriterOptions(partition_cols=['missing']),
+        )
+
+
+def test_sink_watermark(tmp_path):
+    """
+    Отметка при потоковой записи определяется по записанным строкам
+    """
+    frame = polars.LazyFrame({'id': [3, 1, 2], 'updated_at': [30, 10, 20]})
+    parquet_service = ParquetService(spill_folder=tmp_path / 'spill')
+
+    watermark_value = asyncio.run(
+        parquet_service.write_table_fs(
+            frame,
+            str(tmp_path / 'export'),
+            watermark_column='updated_at',
+            drop_columns=['updated_at'],
+        )
+    )
+    assert watermark_value == 30
+    (file_path,) = (tmp_path / 'export').glob('*.parquet')
+    assert pq.read_table(file_path).column_names == ['id']
+
+    # если строк нет, то файл не записывается
+    watermark_value = asyncio.run(
+        parquet_service.write_table_fs(
+            frame.filter(polars.col('updated_at') > 30),
+            str(tmp_path / 'empty'),
+            watermark_column='updated_at',
+        )
+    )
+    assert watermark_value is None
+    assert not (tmp_path / 'empty').exists()
+    assert not list((tmp_path / 'spill').glob('*'))
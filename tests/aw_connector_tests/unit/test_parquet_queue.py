@@ -0,0 +1,23 @@
+import asyncio
+
+from aw_connector_example.services.parquet_queue import ParquetQueue
+
+
+def test_status_shared_between_instances(tmp_path):
+    """ """
+    # два экземпляра очереди с общей папкой, как в разных workers
+    queue1 = ParquetQueue(tmp_path)
+    queue2 = ParquetQueue(tmp_path)
+
+    asyncio.run(queue1.start_task('task1'))
+    assert asyncio.run(queue2.get_task_status('task1')) == 'started'
+
+    asyncio.run(queue2.run_task('task1'))
+    assert asyncio.run(queue1.get_task_status('task1')) == 'running'
+
+    asyncio.run(queue1.finish_task('task1'))
+    assert asyncio.run(queue2.get_task_status('task1')) == 'finished'
+    assert [f.name for f in (tmp_path / 'task1').iterdir()] == ['status']
+
+    asyncio.run(queue2.clear_task('task1'))
+    assert asyncio.run(queue1.get_task_status('task1')) == 'not found'
@@ -0,0 +1,200 @@
+import asyncio
+import gzip
+
+import polars
+import pyarrow as pa
+import pytest
+
+from aw_connector_example.dto import DataSource, ParquetFilterExpr
+from aw_connector_example.services.readers import (
+    CompressedNdjsonReader,
+    ReaderRegistry,
+    ScanReader,
+)
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.table_cache import TableCache
+
+
+FORMATS = [
+    'json',
+    'ndjson',
+    'csv',
+    'parquet',
+    'arrow',
+    'json_gz',
+    'json_zst',
+    'ndjson_gz',
+    'ndjson_zst',
+]
+
+
+def zstd_compress(data: bytes) -> bytes:
+    return pa.Codec('zstd').compress(data, asbytes=True)
+
+
+@pytest.fixture
+def data_source():
+    yield DataSource(id=1, type='custom', params={'db': 'db1'})
+
+
+@pytest.fixture
+def repo(tmp_path):
+    frame = polars.DataFrame(
+        {'id': list(range(100)), 'name': [f'name {i}' for i in range(100)]}
+    )
+    schema_folder = tmp_path / 'data' / 'db1' / 'public'
+    schema_folder.mkdir(parents=True)
+    frame.write_json(schema_folder / 't_json.json')
+    frame.write_ndjson(schema_folder / 't_ndjson.ndjson')
+    frame.write_csv(schema_folder / 't_csv.csv')
+    frame.write_parquet(schema_folder / 't_parquet.parquet')
+    frame.write_ipc(schema_folder / 't_arrow.arrow')
+    json_content = (schema_folder / 't_json.json').read_bytes()
+    ndjson_content = (schema_folder / 't_ndjson.ndjson').read_bytes()
+    (schema_folder / 't_json_gz.json.gz').write_bytes(gzip.compress(json_content))
+    (schema_folder / 't_json_zst.json.zst').write_bytes(zstd_compress(json_content))
+    (schema_folder / 't_ndjson_gz.ndjson.gz').write_bytes(gzip.compress(ndjson_content))
+    (schema_folder / 't_ndjson_zst.ndjson.zst').write_bytes(
+        zstd_compress(ndjson_content)
+    )
+    # файлы неподдерживаемых форматов не показываются в каталоге
+    (schema_folder / 'readme.txt').write_text('')
+
+    yield DataRepository(tmp_path / 'data')
+
+
+def test_split_name():
+    """ """
+    readers = ReaderRegistry()
+
+    assert readers.split_name('table1.json')[0] == 'table1'
+    assert readers.split_name('table1.ndjson.zst')[0] == 'table1'
+    assert readers.split_name('table1.tar.parquet')[0] == 'table1.tar'
+    assert readers.split_name('table1.txt') is None
+    assert readers.split_name('.json') is None
+
+
+def test_formats(repo, data_source):
+    """ """
+    objects = asyncio.run(repo.get_objects(data_source))
+    assert sorted(o.name for o in objects) == sorted(f't_{f}' for f in FORMATS)
+
+    for f in FORMATS:
+        object_name = f'public.t_{f}'
+
+        meta = asyncio.run(repo.get_object_meta(data_source, object_name))
+        assert [(c.name, c.simple_type) for c in meta.columns] == [
+            ('id', 'number'),
+            ('name', 'string'),
+        ], f
+
+        data = asyncio.run(
+            repo.get_object_data(
+                data_source,
+                object_name,
+                limit=2,
+                offset=0,
+                filters=[ParquetFilterExpr(field_name='id', operator='>=', value=10)],
+                columns=['name'],
+            )
+        )
+        assert data == [{'name': 'name 10'}, {'name': 'name 11'}], f
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['no-cache', 'table-cache'])
+def test_values_outside_sample(tmp_path, data_source, cached):
+    """
+    Значения другого типа и новые столбцы после первых строк файла не приводят
+    к ошибке чтения и не теряются
+    """
+    rows = [{'id': i, 'amount': i} for i in range(1500)]
+    rows[1200] = {'id': 1200, 'amount': 2.5, 'note': 'late'}
+    frame = polars.DataFrame(rows, infer_schema_length=None)
+
+    schema_folder = tmp_path / 'data' / 'db1' / 'public'
+    schema_folder.mkdir(parents=True)
+    frame.write_ndjson(schema_folder / 't_ndjson.ndjson')
+    frame.write_csv(schema_folder / 't_csv.csv')
+    (schema_folder / 't_ndjson_gz.ndjson.gz').write_bytes(
+        gzip.compress((schema_folder / 't_ndjson.ndjson').read_bytes())
+    )
+    repo = DataRepository(
+        tmp_path / 'data',
+        table_cache=TableCache(tmp_path / 'cache') if cached else None,
+    )
+
+    for object_name in ['public.t_ndjson', 'public.t_csv', 'public.t_ndjson_gz']:
+        result = asyncio.run(
+            repo.get_object_frame(
+                data_source,
+                object_name,
+                filters=[ParquetFilterExpr(field_name='id', operator='>=', value=1199)],
+            )
+        )
+        assert result.schema['amount'] == polars.Float64, object_name
+        assert result['amount'].head(3).to_list() == [1199, 2.5, 1201], object_name
+        assert result['note'].head(2).to_list() == [None, 'late'], object_name
+
+
+def test_pushdown(repo, data_source):
+    """ """
+    frame = asyncio.run(
+        repo.query_object(
+            data_source,
+            'public.t_parquet',
+            limit=2,
+            offset=0,
+            filters=[ParquetFilterExpr(field_name='id', operator='>=', value=10)],
+            columns=['name'],
+        )
+    )
+
+    # условие фильтра выполняется при чтении файла
+    plan = frame.explain()
+    assert 'SELECTION' in plan.split('Parquet SCAN')[1]
+
+
+def test_compressed_preview(tmp_path, monkeypatch):
+    """ """
+    path = tmp_path / 'big.ndjson.zst'
+    content = b''.join(
+        b'{"id": %d, "name": "name %d"}\n' % (i, i) for i in range(200_000)
+    )
+    path.write_bytes(zstd_compress(content))
+
+    reader = CompressedNdjsonReader()
+    chunks = []
+    iter_chunks = reader.iter_chunks
+
+    def counting_iter_chunks(path):
+        for chunk in iter_chunks(path):
+            chunks.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(reader, 'iter_chunks', counting_iter_chunks)
+    schema = reader.infer_schema(path, sample_rows=100)
+
+    # для предпросмотра распаковывается только начало файла
+    chunks.clear()
+    frame = reader.scan(path, schema=schema, n_rows=30).slice(20, 10).collect()
+    assert frame['id'].to_list() == list(range(20, 30))
+    assert len(chunks) == 1
+
+    chunks.clear()
+    frame = (
+        reader.scan(path, schema=schema).filter(polars.col('id') >= 199_990).collect()
+    )
+    assert frame.height == 10
+    assert sum(chunks) == len(content)
+
+
+def test_incomplete_reader():
+    """
+    Формат без обязательных методов нельзя создать
+    """
+
+    class TsvReader(ScanReader):
+        suffixes = ('.tsv',)
+
+    with pytest.raises(TypeError):
+        TsvReader()
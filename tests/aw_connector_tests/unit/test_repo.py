@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import shutil
+from pathlib import Path
+
+import polars
+import pytest
+import pyarrow.parquet as pq
+
+import aw_connector_example
+from aw_connector_example.dto import DataSource, ParquetFilterExpr
+from aw_connector_example.services.parquet import ParquetService
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.schema import SchemaInference
+from aw_connector_example.services.table_cache import TableCache
+from aw_connector_example.services.watermark import Watermark
+
+
+@pytest.fixture
+def data_source():
+    yield DataSource(id=1, type='custom', params={'db': 'db1'}, extra={})
+
+
+@pytest.fixture(params=[False, True], ids=['no-cache', 'table-cache'])
+def repo(request, tmp_path):
+    table_cache = TableCache(tmp_path / 'cache') if request.param else None
+    yield DataRepository(
+        Path(aw_connector_example.__file__).parent / 'data', table_cache=table_cache
+    )
+
+
+def test_object_projection(repo, data_source):
+    """ """
+    frame = asyncio.run(
+        repo.get_object_frame(
+            data_source,
+            'public.table1',
+            filters=[ParquetFilterExpr(field_name='id', operator='>', value=1)],
+            columns=['name', 'missing'],
+        )
+    )
+    assert frame.columns == ['name']
+    assert frame['name'].to_list() == ['name 2', 'name 3']
+
+
+def test_sql_projection(repo, data_source):
+    """ """
+    frame = asyncio.run(
+        repo.get_sql_frame(
+            data_source,
+            'select t1.id, t1.name, t2.table from table1 t1 join table2 t2 on t1.id = t2.id;',
+            filters=[ParquetFilterExpr(value='id < 3')],
+            columns=['table'],
+        )
+    )
+    assert frame.columns == ['table']
+    assert frame.height == 2
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['no-cache', 'table-cache'])
+def test_watermark(tmp_path, data_source, cached):
+    """
+    Значение отметки сравнивается со столбцом с учетом его типа, строки
+    не разбираются как текст условия
+    """
+    folder = tmp_path / 'data' / 'db1' / 'public'
+    folder.mkdir(parents=True)
+    polars.DataFrame(
+        {'code': ['0007', '0008', '0010', '1e1', 'null'], 'id': [1, 2, 3, 4, 5]}
+    ).write_ndjson(folder / 'codes.ndjson')
+    repo = DataRepository(
+        tmp_path / 'data',
+        table_cache=TableCache(tmp_path / 'cache') if cached else None,
+    )
+
+    frame = asyncio.run(
+        repo.query_object(
+            data_source,
+            'public.codes',
+            columns=['id'],
+            watermark=Watermark('code', '0008'),
+        )
+    ).collect()
+    assert frame.columns == ['id']
+    assert frame['id'].to_list() == [3, 4, 5]
+
+    frame = asyncio.run(
+        repo.query_sql(
+            data_source,
+            'select code, id from codes',
+            columns=['code'],
+            limit=1,
+            offset=0,
+            order_by='code',
+            watermark=Watermark('code', '1e1'),
+        )
+    ).collect()
+    assert frame['code'].to_list() == ['null']
+
+    frame = asyncio.run(
+        repo.query_object(data_source, 'public.codes', watermark=Watermark('id', 4.5))
+    ).collect()
+    assert frame['id'].to_list() == [5]
+
+
+def test_streaming_sql(tmp_path, data_source):
+    """ """
+    repo = DataRepository(
+        Path(aw_connector_example.__file__).parent / 'data',
+        table_cache=TableCache(tmp_path / 'cache'),
+        streaming_threshold=1,
+    )
+    sql_text = (
+        'select t1.id, t1.name, t2.table from table1 t1 join table2 t2 on t1.id = t2.id'
+    )
+    assert asyncio.run(repo.use_streaming(data_source, sql_text=sql_text))
+
+    frame = asyncio.run(
+        repo.get_sql_frame(
+            data_source,
+            sql_text,
+            filters=[ParquetFilterExpr(value='id < 3')],
+            columns=['id', 'table'],
+        )
+    )
+    assert frame.columns == ['id', 'table']
+    assert sorted(frame['id'].to_list()) == [1, 2]
+
+
+def test_streaming_parquet(tmp_path, data_source):
+    """ """
+    repo = DataRepository(
+        Path(aw_connector_example.__file__).parent / 'data',
+        table_cache=TableCache(tmp_path / 'cache'),
+    )
+    query = asyncio.run(
+        repo.query_object(data_source, 'public.table1', columns=['id'], streaming=True)
+    )
+
+    parquet_service = ParquetService(spill_folder=tmp_path / 'spill')
+    asyncio.run(parquet_service.write_table_fs(query, str(tmp_path / 'export')))
+
+    (file_path,) = (tmp_path / 'export').glob('*.parquet')
+    assert pq.read_table(file_path).column('id').to_pylist() == [1, 2, 3]
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['no-cache', 'table-cache'])
+def test_schema_revision(tmp_path, data_source, cached):
+    """
+    Замена схемы по выборке строк после чтения всех строк меняет версию
+    метаданных таблицы
+    """
+    table_path = tmp_path / 'data' / 'db1' / 'public' / 'table1.json'
+    table_path.parent.mkdir(parents=True)
+    rows = [{'id': i, 'amount': i} for i in range(100)] + [{'id': 100, 'amount': 0.5}]
+    table_path.write_text(json.dumps(rows))
+
+    repo = DataRepository(
+        tmp_path / 'data',
+        table_cache=TableCache(tmp_path / 'cache') if cached else None,
+        schema_inference=SchemaInference(sample_rows=10),
+    )
+    meta = asyncio.run(repo.get_object_meta(data_source, 'public.table1'))
+    assert [c.type for c in meta.columns] == ['int', 'int']
+    before = asyncio.run(repo.get_version(data_source, object_name='public.table1'))
+
+    frame = asyncio.run(repo.query_object(data_source, 'public.table1'))
+    assert frame.collect()['amount'].to_list()[-1] == 0.5
+
+    after = asyncio.run(repo.get_version(data_source, object_name='public.table1'))
+    assert after != before
+    meta = asyncio.run(repo.get_object_meta(data_source, 'public.table1'))
+    assert [c.type for c in meta.columns] == ['int', 'float']
+
+    # схема по всем строкам больше не меняется
+    asyncio.run(repo.query_object(data_source, 'public.table1'))
+    assert (
+        asyncio.run(repo.get_version(data_source, object_name='public.table1')) == after
+    )
+
+
+def test_share_loads(repo, data_source):
+    """ """
+    batch_repo = repo.share_loads()
+    table_path = repo.get_table_path(data_source, 'public.table1')
+
+    async def main():
+        return await asyncio.gather(
+            batch_repo.load_table(table_path),
+            batch_repo.load_table(table_path),
+            batch_repo.get_sql_objects(data_source, 'select * from table1'),
+        )
+
+    table1, table2, _ = asyncio.run(main())
+    # таблица загружена один раз для всех запросов к репозиторию
+    assert table1 is table2
+    assert repo.shared_loads is None
+
+
+def test_get_version(tmp_path, data_source):
+    """ """
+    shutil.copytree(
+        Path(aw_connector_example.__file__).parent / 'data', tmp_path / 'data'
+    )
+    repo = DataRepository(tmp_path / 'data')
+    table_path = tmp_path / 'data' / 'db1' / 'public' / 'table1.json'
+
+    def versions():
+        return [
+            asyncio.run(repo.get_version(data_source)),
+            asyncio.run(repo.get_version(data_source, object_name='public.table1')),
+            asyncio.run(repo.get_version(data_source, object_name='public.table2')),
+            asyncio.run(repo.get_version(data_source, sql_text='select * from table1')),
+        ]
+
+    before = versions()
+    os.utime(table_path, ns=(0, 0))
+    after = versions()
+
+    # изменение файла таблицы меняет версию ее метаданных, но не списка объектов
+    assert [b == a for b, a in zip(before, after)] == [True, False, True, False]
+
+    (tmp_path / 'data' / 'db1' / 'public' / 'table4.json').write_text('[]')
+    assert asyncio.run(repo.get_version(data_source)) != after[0]
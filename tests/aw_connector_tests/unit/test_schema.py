@@ -0,0 +1,87 @@
+import json
+
+import polars
+import pytest
+
+from aw_connector_example.services.schema import SchemaInference, TableSchema
+
+
+def test_schema_from_sample():
+    """
+    Тип столбца определяется не только по первой строке
+    """
+    rows = [{'id': 1, 'comment': None}] + [
+        {'id': i, 'comment': f'comment {i}', 'amount': i * 1.5} for i in range(2, 1000)
+    ]
+    schema = SchemaInference(sample_rows=50).infer(json.dumps(rows).encode())
+
+    assert schema == polars.Schema(
+        {'id': polars.Int64, 'comment': polars.String, 'amount': polars.Float64}
+    )
+
+
+def test_decode_widens_schema_outside_sample():
+    """
+    Значения другого типа и новые столбцы вне выборки не теряются
+    """
+    content = json.dumps(
+        [
+            {'id': 1, 'price': 10},
+            {'id': 2, 'price': 19.99},
+            {'id': 'three', 'note': 'x'},
+        ]
+    ).encode()
+    frame = SchemaInference.decode(
+        content,
+        TableSchema(
+            polars.Schema({'id': polars.Int64, 'price': polars.Int64}), sampled=True
+        ),
+    )
+
+    assert frame.schema == polars.Schema(
+        {'id': polars.String, 'price': polars.Float64, 'note': polars.String}
+    )
+    assert frame['id'].to_list() == ['1', '2', 'three']
+    assert frame['price'].to_list() == [10, 19.99, None]
+    assert frame['note'].to_list() == [None, None, 'x']
+
+
+def test_sample_reads_head():
+    """
+    Для выборки разбирается только начало файла
+    """
+    rows = [{'id': i, 'name': f'имя {i}'} for i in range(1000)]
+    content = json.dumps(rows, ensure_ascii=False).encode()
+    # некорректный конец файла не разбирается
+    content = content[: len(content) // 2] + b'!'
+
+    inference = SchemaInference(sample_rows=20, chunk_size=64)
+    assert inference.sample(content) == rows[:20]
+    assert inference.infer(content) == polars.Schema(
+        {'id': polars.Int64, 'name': polars.String}
+    )
+
+    assert SchemaInference().sample(b' [ ] ') == []
+    assert SchemaInference().sample(json.dumps(rows[:3]).encode()) == rows[:3]
+    with pytest.raises(ValueError):
+        SchemaInference().infer(b'{"id": 1}')
+    with pytest.raises(ValueError):
+        SchemaInference().infer(b'[{"id": 1} {"id": 2}]')
+
+
+def test_decode_with_saved_schema():
+    """
+    По схеме, определенной по всем строкам, значения декодируются сразу в типы
+    столбцов, а если данные ей не соответствуют - типы определяются заново
+    """
+    content = json.dumps([{'id': 1, 'created': '2024-01-02'}]).encode()
+    schema = polars.Schema({'id': polars.Int64, 'created': polars.Date})
+
+    frame = SchemaInference.decode(content, TableSchema(schema))
+    assert frame.schema == schema
+
+    content = json.dumps([{'id': 'one', 'created': '2024-01-02'}]).encode()
+    frame = SchemaInference.decode(content, TableSchema(schema))
+    assert frame.schema == polars.Schema(
+        {'id': polars.String, 'created': polars.String}
+    )
@@ -0,0 +1,185 @@
+import asyncio
+
+import polars
+import pytest
+
+from aw_connector_example.dto import DataSource
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.sql_pushdown import analyze_sql
+from aw_connector_example.services.table_cache import TableCache
+
+
+@pytest.fixture
+def schemas():
+    yield {
+        'orders': polars.Schema(
+            {
+                'id': polars.Int64,
+                'customer_id': polars.Int64,
+                'amount': polars.Float64,
+                'comment': polars.String,
+            }
+        ),
+        'customers': polars.Schema(
+            {'id': polars.Int64, 'name': polars.String, 'city': polars.String}
+        ),
+    }
+
+
+def get_columns(sql_text: str, schemas) -> dict[str, list[str] | None]:
+    return {name: p.columns for name, p in analyze_sql(sql_text, schemas).items()}
+
+
+def get_filters(sql_text: str, schemas) -> dict[str, list[str]]:
+    return {
+        name: [f.value for f in p.filters]
+        for name, p in analyze_sql(sql_text, schemas).items()
+    }
+
+
+def test_columns(schemas):
+    """ """
+    assert get_columns(
+        'select o.amount, c.name from orders o join customers c on o.customer_id = c.id',
+        schemas,
+    ) == {'orders': ['customer_id', 'amount'], 'customers': ['id', 'name']}
+
+    # столбец без таблицы читается из таблиц, в которых он есть
+    assert get_columns(
+        'select name, sum(amount) from orders join customers on customer_id = customers.id '
+        'group by name',
+        schemas,
+    ) == {'orders': ['customer_id', 'amount'], 'customers': ['id', 'name']}
+
+    assert get_columns(
+        'select c.*, o.amount from orders o join customers c on o.customer_id = c.id',
+        schemas,
+    ) == {'orders': ['customer_id', 'amount'], 'customers': None}
+
+    # для количества строк читается первый столбец
+    assert get_columns(
+        'select count(*) from orders', {'orders': schemas['orders']}
+    ) == {'orders': ['id']}
+
+
+def test_subquery_columns(schemas):
+    """ """
+    assert get_columns(
+        'with big as (select customer_id, amount as total from orders where amount > 10) '
+        'select c.city, big.total from big join customers c on c.id = big.customer_id',
+        schemas,
+    ) == {'orders': ['customer_id', 'amount'], 'customers': ['id', 'city']}
+
+    # коррелированный подзапрос обращается к столбцу внешнего запроса
+    assert get_columns(
+        'select c.name from customers c '
+        'where exists (select 1 from orders o where o.customer_id = c.id)',
+        schemas,
+    ) == {'orders': ['customer_id'], 'customers': ['id', 'name']}
+
+    assert get_columns(
+        'select * from (select * from orders) t', {'orders': schemas['orders']}
+    ) == {'orders': None}
+
+
+def test_unsupported_query(schemas):
+    """
+    Запрос, который не удалось проанализировать, читает таблицы целиком
+    """
+    assert get_columns('select * from orders join customers using (id)', schemas) == {
+        'orders': None,
+        'customers': None,
+    }
+    assert get_columns('select from where', schemas) == {
+        'orders': None,
+        'customers': None,
+    }
+
+
+def test_filters(schemas):
+    """ """
+    assert get_filters(
+        'select c.name, o.amount from orders o join customers c on o.customer_id = c.id '
+        "where o.amount > 100 and c.city = 'Moscow' and (o.amount < 200 or c.id = 1)",
+        schemas,
+    ) == {'orders': ['amount > 100'], 'customers': ["city = 'Moscow'"]}
+
+    # строки таблицы справа в LEFT JOIN дополняются null, поэтому условие на нее
+    # нельзя проверять при чтении таблицы
+    assert get_filters(
+        'select c.name, o.amount from customers c left join orders o on o.customer_id = c.id '
+        "where o.amount > 100 and c.city = 'Moscow'",
+        schemas,
+    ) == {'orders': [], 'customers': ["city = 'Moscow'"]}
+
+    # таблица упоминается в запросе дважды
+    assert get_filters(
+        'select a.id from orders a join orders b on a.id = b.id where a.amount > 100',
+        schemas,
+    ) == {'orders': [], 'customers': []}
+
+    # условия с подзапросами не передаются
+    assert get_filters(
+        'select id from orders where customer_id in (select id from customers)',
+        schemas,
+    ) == {'orders': [], 'customers': []}
+
+
+def test_sql_pushdown(tmp_path):
+    """
+    Результат SQL запроса не меняется, а из колоночных копий читаются только
+    нужные столбцы и фрагменты
+    """
+    folder = tmp_path / 'data' / 'db1' / 'public'
+    folder.mkdir(parents=True)
+    polars.DataFrame(
+        {
+            'id': list(range(100)),
+            'customer_id': [i % 10 for i in range(100)],
+            'amount': [float(i) for i in range(100)],
+            'comment': [f'comment {i}' for i in range(100)],
+        }
+    ).write_json(folder / 'orders.json')
+    polars.DataFrame(
+        {
+            'id': list(range(10)),
+            'name': [f'name {i}' for i in range(10)],
+            'city': ['Moscow' if i % 2 else 'Kazan' for i in range(10)],
+        }
+    ).write_json(folder / 'customers.json')
+
+    repo = DataRepository(
+        tmp_path / 'data', table_cache=TableCache(tmp_path / 'cache', chunk_rows=10)
+    )
+    data_source = DataSource(id=1, type='custom', params={'db': 'db1'})
+
+    frame = asyncio.run(
+        repo.get_sql_frame(
+            data_source,
+            'select c.name, o.amount from orders o '
+            'left join customers c on o.customer_id = c.id '
+            "where o.amount >= 95 and (c.city = 'Moscow' or c.city is null) "
+            'order by o.amount',
+        )
+    )
+    assert frame.to_dicts() == [
+        {'name': 'name 5', 'amount': 95.0},
+        {'name': 'name 7', 'amount': 97.0},
+        {'name': 'name 9', 'amount': 99.0},
+    ]
+
+    schema = asyncio.run(repo.get_object_schema(data_source, 'public.orders'))
+    pushdown = analyze_sql(
+        'select amount from orders where amount >= 95', {'orders': schema}
+    )['orders']
+    orders = asyncio.run(
+        repo.scan_object(
+            data_source,
+            'public.orders',
+            filters=pushdown.filters,
+            columns=pushdown.columns,
+        )
+    ).collect()
+    # прочитан только последний фрагмент и один столбец
+    assert orders.columns == ['amount']
+    assert orders.height == 10
@@ -0,0 +1,98 @@
+import asyncio
+import datetime
+
+import polars
+import pytest
+
+from aw_connector_example.dto import DataSource, ParquetFilterExpr
+from aw_connector_example.services.filters import Predicate
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.statistics import TableStatistics
+from aw_connector_example.services.table_cache import TableCache
+
+
+@pytest.fixture
+def frame():
+    rows = 100_000
+    yield polars.DataFrame(
+        {
+            'id': list(range(rows)),
+            'group': [i % 100 for i in range(rows)],
+            'name': [f'name {i % 5000}' if i % 10 else None for i in range(rows)],
+            'created_at': [
+                datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365)
+                for i in range(rows)
+            ],
+        }
+    )
+
+
+def test_compute(frame):
+    """ """
+    stats = TableStatistics.compute(frame.lazy())
+
+    assert stats.row_count == 100_000
+    assert stats.columns['name'].null_count == 10_000
+    assert stats.columns['created_at'].min == datetime.date(2025, 1, 1)
+    assert stats.columns['created_at'].max == datetime.date(2025, 12, 31)
+    # оценка количества различных значений с погрешностью HyperLogLog
+    for name in frame.columns:
+        exact = frame[name].drop_nulls().n_unique()
+        assert abs(stats.columns[name].distinct_count - exact) <= exact * 0.03, name
+
+    assert TableStatistics.from_dict(stats.to_dict()) == stats
+
+
+def test_selectivity(frame):
+    """ """
+    stats = TableStatistics.compute(frame.lazy())
+
+    assert stats.selectivity([Predicate('group', '=', 5)]) == pytest.approx(
+        0.01, rel=0.1
+    )
+    assert stats.selectivity([Predicate('group', '=', 500)]) == 0
+    assert stats.selectivity([Predicate('id', '<', 25_000)]) == pytest.approx(
+        0.25, rel=0.01
+    )
+    assert stats.selectivity([Predicate('name', 'is null')]) == pytest.approx(0.1)
+    assert stats.selectivity(
+        [Predicate('id', '>=', 50_000), Predicate('group', 'in', [1, 2])]
+    ) == pytest.approx(0.01, rel=0.1)
+
+
+def test_object_stats(tmp_path, frame):
+    """
+    Статистики сохраняются для версии таблицы и используются в оценке памяти
+    """
+    folder = tmp_path / 'data' / 'db1' / 'public'
+    folder.mkdir(parents=True)
+    frame.write_ndjson(folder / 'events.ndjson')
+
+    table_cache = TableCache(tmp_path / 'cache')
+    repo = DataRepository(tmp_path / 'data', table_cache=table_cache)
+    data_source = DataSource(id=1, type='custom', params={'db': 'db1'})
+
+    memory = asyncio.run(repo.estimate_memory(data_source, object_name='public.events'))
+
+    stats = asyncio.run(repo.get_object_stats(data_source, 'public.events'))
+    assert stats.row_count == 100_000
+    assert [c.name for c in stats.columns] == frame.columns
+    assert table_cache.get_stats(folder / 'events.ndjson') is not None
+
+    # после вычисления статистик память оценивается по объему данных таблицы
+    # и доле строк, которые удовлетворяют фильтрам
+    full = asyncio.run(repo.estimate_memory(data_source, object_name='public.events'))
+    assert full != memory
+    filtered = asyncio.run(
+        repo.estimate_memory(
+            data_source,
+            object_name='public.events',
+            filters=[ParquetFilterExpr(value='id < 10000')],
+        )
+    )
+    assert filtered == pytest.approx(full * 0.1, rel=0.01)
+
+    # новая версия файла - новые статистики
+    frame.head(10).write_ndjson(folder / 'events.ndjson')
+    stats = asyncio.run(repo.get_object_stats(data_source, 'public.events'))
+    assert stats.row_count == 10
@@ -0,0 +1,172 @@
+import asyncio
+import os
+
+import polars
+import pytest
+from fsspec.implementations.local import LocalFileSystem
+
+from aw_connector_example.dto import DataSource, ParquetFilterExpr
+from aw_connector_example.services.deadline import Deadline, DeadlineExceeded
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.storage import DiskCache, ObjectStorage
+from aw_connector_example.services.table_cache import TableCache
+
+
+@pytest.fixture
+def data_source():
+    yield DataSource(id=1, type='custom', params={'db': 'db1'})
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    frame = polars.DataFrame(
+        {'id': list(range(100)), 'name': [f'name {i}' for i in range(100)]}
+    )
+    schema_folder = tmp_path / 'bucket' / 'data' / 'db1' / 'public'
+    schema_folder.mkdir(parents=True)
+    frame.write_ndjson(schema_folder / 't_ndjson.ndjson')
+    frame.write_json(schema_folder / 't_json.json')
+    frame.write_parquet(schema_folder / 't_parquet.parquet')
+    yield tmp_path / 'bucket' / 'data'
+
+
+@pytest.fixture
+def storage(tmp_path, bucket):
+    # объектное хранилище заменяет локальная файловая система fsspec
+    yield ObjectStorage(
+        LocalFileSystem(),
+        str(bucket),
+        cache=DiskCache(tmp_path / 'objects'),
+        part_size=100,
+        max_concurrency=4,
+    )
+
+
+def cached_files(storage: ObjectStorage) -> list[str]:
+    return [
+        name
+        for _, _, names in os.walk(storage.cache.root)
+        for name in names
+        if not name.startswith('.')
+    ]
+
+
+def test_object_storage(tmp_path, bucket, storage, data_source):
+    repo = DataRepository(
+        storage.root,
+        table_cache=TableCache(tmp_path / 'cache', storage=storage),
+        storage=storage,
+    )
+
+    objects = asyncio.run(repo.get_objects(data_source))
+    assert sorted(o.name for o in objects) == ['t_json', 't_ndjson', 't_parquet']
+
+    # схема parquet читается из метаданных файла, файл не скачивается
+    meta = asyncio.run(repo.get_object_meta(data_source, 'public.t_parquet'))
+    assert [c.name for c in meta.columns] == ['id', 'name']
+    assert cached_files(storage) == []
+
+    for object_name in ['public.t_ndjson', 'public.t_json', 'public.t_parquet']:
+        frame = asyncio.run(repo.get_object_frame(data_source, object_name))
+        assert frame['id'].to_list() == list(range(100))
+
+    # parquet читается из хранилища диапазонами байтов, файл не скачивается
+    parquet_path = storage.root / 'db1' / 'public' / 't_parquet.parquet'
+    assert storage.get_local_path(parquet_path) is None
+    frame = asyncio.run(
+        repo.get_object_frame(
+            data_source,
+            'public.t_parquet',
+            filters=[ParquetFilterExpr(value='id >= 98')],
+            columns=['name'],
+        )
+    )
+    assert frame['name'].to_list() == ['name 98', 'name 99']
+    assert storage.get_local_path(parquet_path) is None
+
+    # файл скачан частями по part_size байт
+    ndjson_path = storage.root / 'db1' / 'public' / 't_ndjson.ndjson'
+    local_path = storage.get_local_path(ndjson_path)
+    assert (
+        local_path.read_bytes() == (bucket / 'db1/public/t_ndjson.ndjson').read_bytes()
+    )
+
+    # новая версия файла видна после обновления списка объектов и скачивается заново
+    polars.DataFrame({'id': [1, 2], 'name': ['a', 'b']}).write_ndjson(
+        bucket / 'db1' / 'public' / 't_ndjson.ndjson'
+    )
+    assert asyncio.run(storage.refresh()) == ['db1/public/t_ndjson.ndjson']
+    assert storage.get_local_path(ndjson_path) is None
+
+    frame = asyncio.run(repo.get_object_frame(data_source, 'public.t_ndjson'))
+    assert frame['id'].to_list() == [1, 2]
+    assert storage.get_local_path(ndjson_path) != local_path
+
+
+def test_download_deadline(storage, monkeypatch):
+    """
+    Срок проверяется перед загрузкой каждой части файла
+    """
+    ndjson_path = storage.root / 'db1' / 'public' / 't_ndjson.ndjson'
+    deadline = Deadline(60)
+    parts = []
+
+    def cat_file(path, start, end):
+        parts.append(start)
+        # срок истекает во время загрузки первой части
+        deadline.expires_at = 0
+        return b''
+
+    monkeypatch.setattr(storage.fs, 'cat_file', cat_file)
+    storage.max_concurrency = 1
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(storage.fetch(ndjson_path, deadline))
+
+    assert parts == [0]
+    assert storage.get_local_path(ndjson_path) is None
+    assert cached_files(storage) == []
+
+
+def test_prefetch(bucket, storage):
+    json_path = storage.root / 'db1' / 'public' / 't_json.json'
+    asyncio.run(storage.fetch(json_path))
+
+    (bucket / 'db1' / 'public' / 't_json.json').write_text('[{"id": 1}]')
+    # в фоне скачиваются только новые версии файлов, которые уже читались
+    (bucket / 'db1' / 'public' / 'new.json').write_text('[{"id": 1}]')
+
+    async def refresh():
+        await storage.prefetch_files(await storage.refresh())
+
+    asyncio.run(refresh())
+    assert storage.get_local_path(json_path) is not None
+    assert storage.get_local_path(json_path.with_name('new.json')) is None
+
+
+def test_disk_cache_evict(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path / 'objects', max_size=25)
+    cache.protect_seconds = 0
+
+    def put(i: int):
+        path = cache.get_path(f'key{i}', 'etag', '.json')
+        asyncio.run(lock(path))
+        (tmp_path / f'{i}.tmp').write_bytes(b'x' * 10)
+        cache.put(tmp_path / f'{i}.tmp', path)
+        return path
+
+    async def lock(path):
+        async with cache.lock(path):
+            pass
+
+    paths = [put(0), put(1)]
+    # размеры файлов берутся из индекса, папка кэша не обходится заново
+    monkeypatch.setattr(os, 'walk', None)
+    # первый файл читался позже второго, поэтому при превышении размера
+    # удаляется второй
+    assert cache.get(paths[0]) == paths[0]
+    paths.append(put(2))
+
+    assert [cache.get(path) is not None for path in paths] == [True, False, True]
+    assert cache.size == 20
+    # файл блокировки и папка удаленного файла удалены вместе с ним
+    assert not paths[1].parent.exists()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+import aw_connector_example
+from aw_connector_example.dto import DataSource, ParquetFilterExpr
+from aw_connector_example.services.repo import DataRepository, DataRepositoryError
+from aw_connector_example.services.views import (
+    ViewDefinition,
+    ViewRefresher,
+    ViewStore,
+)
+
+
+@pytest.fixture
+def data_source():
+    yield DataSource(id=1, type='custom', params={'db': 'db1'})
+
+
+@pytest.fixture
+def repo(tmp_path):
+    shutil.copytree(
+        Path(aw_connector_example.__file__).parent / 'data', tmp_path / 'data'
+    )
+    yield DataRepository(tmp_path / 'data', views=ViewStore(tmp_path / 'views'))
+
+
+VIEW = ViewDefinition(
+    schema='views',
+    name='joined',
+    query_text='select t1.id, t1.name from table1 t1 join table2 t2 on t1.id = t2.id',
+)
+
+
+def test_view(repo, data_source, tmp_path):
+    """ """
+    asyncio.run(repo.register_view(data_source, VIEW))
+
+    objects = asyncio.run(repo.get_objects(data_source))
+    assert {'schema': 'views', 'name': 'joined', 'type': 'view'} in [
+        o.model_dump(by_alias=True) for o in objects
+    ]
+
+    meta = asyncio.run(repo.get_object_meta(data_source, 'views.joined'))
+    assert [c.name for c in meta.columns] == ['id', 'name']
+
+    expected = asyncio.run(repo.get_sql_data(data_source, VIEW.query_text))
+    data = asyncio.run(
+        repo.get_object_data(
+            data_source,
+            'views.joined',
+            filters=[ParquetFilterExpr(field_name='id', operator='>', value=1)],
+        )
+    )
+    assert data == [row for row in expected if row['id'] > 1]
+
+    # к представлению можно обращаться в SQL запросах
+    data = asyncio.run(
+        repo.get_sql_data(data_source, 'select count(*) as n from joined')
+    )
+    assert data == [{'n': len(expected)}]
+
+    # при изменении таблицы представление пересчитывается
+    info_before = asyncio.run(repo.get_views_info(data_source))
+    assert info_before[0].fresh
+    table2 = tmp_path / 'data' / 'db1' / 'public' / 'table2.json'
+    table2.write_text(json.dumps([{'id': i, 'name': f'name {i}'} for i in (1, 2)]))
+    assert not asyncio.run(repo.get_views_info(data_source))[0].fresh
+
+    asyncio.run(ViewRefresher(repo).refresh())
+    assert asyncio.run(repo.get_views_info(data_source))[0].fresh
+    data = asyncio.run(repo.get_object_data(data_source, 'views.joined'))
+    assert sorted(row['id'] for row in data) == [1, 2]
+
+    # результат предыдущей версии удаляется
+    assert (
+        len(
+            list((tmp_path / 'views' / 'db1' / 'data' / 'views.joined').glob('*.arrow'))
+        )
+        == 1
+    )
+
+    asyncio.run(repo.drop_view(data_source, 'views.joined'))
+    objects = asyncio.run(repo.get_objects(data_source))
+    assert all(o.type == 'table' for o in objects)
+
+
+def test_view_errors(repo, data_source):
+    """ """
+    with pytest.raises(DataRepositoryError):
+        asyncio.run(
+            repo.register_view(
+                data_source,
+                ViewDefinition(
+                    schema='views', name='table1', query_text='select * from table2'
+                ),
+            )
+        )
+
+    with pytest.raises(DataRepositoryError):
+        asyncio.run(
+            repo.register_view(
+                data_source,
+                ViewDefinition(
+                    schema='views', name='v', query_text='select * from unknown'
+                ),
+            )
+        )
+
+    asyncio.run(repo.register_view(data_source, VIEW))
+    with pytest.raises(DataRepositoryError):
+        asyncio.run(
+            repo.register_view(
+                data_source,
+                ViewDefinition(
+                    schema='views', name='v2', query_text='select * from joined'
+                ),
+            )
+        )
+
+    with pytest.raises(DataRepositoryError):
+        asyncio.run(repo.drop_view(data_source, 'views.unknown'))
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from pathlib import Path
+
+import aw_connector_example
+from aw_connector_example.main import app
+from aw_connector_example.dto import DataSource
+from aw_connector_example.dependencies import get_warmup
+from aw_connector_example.services.repo import DataRepository
+from aw_connector_example.services.table_cache import TableCache
+from aw_connector_example.services.warmup import Warmup
+
+
+def get_repo(cache_folder: Path) -> DataRepository:
+    return DataRepository(
+        Path(aw_connector_example.__file__).parent / 'data',
+        table_cache=TableCache(cache_folder),
+    )
+
+
+def test_warmup_tables(tmp_path):
+    """ """
+    warmup = Warmup(
+        get_repo(tmp_path),
+        tables=['db1.public.table1'],
+        schemas=['db1.work.*', 'db2.*'],
+    )
+    asyncio.run(warmup.run())
+
+    assert warmup.ready
+    assert warmup.errors == []
+
+    table_path = warmup.data_repo.get_table_path(
+        DataSource(id=1, type='custom', params={'db': 'db1'}),
+        'public.table1',
+    )
+    data_path, _ = warmup.data_repo.table_cache.get_paths(table_path)
+    assert data_path.exists()
+
+    # для таблиц из warmup_schemas сохраняется только схема
+    cached = [p.name for p in (tmp_path / 'tables').rglob('*.arrow')]
+    assert len([name for name in cached if name.endswith('.schema.arrow')]) > 1
+    assert len([name for name in cached if not name.endswith('.schema.arrow')]) == 1
+
+
+def test_warmup_failed(tmp_path, monkeypatch):
+    """
+    Ошибка чтения каталога записывается в errors, а коннектор становится готовым
+    """
+    warmup = Warmup(get_repo(tmp_path), tables=['db1.public.table1'])
+
+    def listdir(path):
+        raise OSError('storage is unavailable')
+
+    monkeypatch.setattr(warmup.data_repo.storage, 'listdir', listdir)
+    asyncio.run(warmup.run())
+
+    assert warmup.ready
+    assert warmup.errors == [
+        'Не удалось прочитать каталог объектов: storage is unavailable'
+    ]
+
+
+def test_ready(app_client, tmp_path):
+    """ """
+    app.dependency_overrides[get_warmup] = lambda: Warmup(get_repo(tmp_path))
+    try:
+        assert app_client.get('/ready').status_code == 503
+    finally:
+        del app.dependency_overrides[get_warmup]
+
+    # прогрев запускается в lifespan приложения
+    for _ in range(100):
+        response = app_client.get('/ready')
+        if response.status_code == 200:
+            break
+        time.sleep(0.01)
+
+    assert response.status_code == 200
+    assert response.json() == {'success': True, 'errors': []}
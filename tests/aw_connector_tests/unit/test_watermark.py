@@ -0,0 +1,77 @@
+import asyncio
+import datetime
+
+from aw_connector_example.dto import ParquetRequest
+from aw_connector_example.services.watermark import Watermark, WatermarkStore
+
+
+def parquet_request(extra: dict, **kwargs) -> ParquetRequest:
+    return ParquetRequest.model_validate(
+        {
+            'object': {
+                'data_source': {
+                    'id': 1,
+                    'type': 'custom',
+                    'params': {'db': 'db1'},
+                    'extra': extra,
+                },
+                'name': 'public.table1',
+                'type': 'table',
+            },
+            'folder': 's3://runs/table1',
+            **kwargs,
+        }
+    )
+
+
+def test_get_column():
+    """ """
+    assert WatermarkStore.get_column(parquet_request({})) is None
+    assert (
+        WatermarkStore.get_column(parquet_request({'ИнкрементальныйСтолбец': 'id'}))
+        == 'id'
+    )
+    # столбец можно указать для каждого объекта источника
+    assert (
+        WatermarkStore.get_column(
+            parquet_request({'ИнкрементальныйСтолбец': {'public.table2': 'id'}})
+        )
+        is None
+    )
+    # столбец из запроса важнее параметра источника
+    assert (
+        WatermarkStore.get_column(
+            parquet_request(
+                {'ИнкрементальныйСтолбец': 'id'}, incremental_column='updated_at'
+            )
+        )
+        == 'updated_at'
+    )
+
+
+def test_get_key():
+    """ """
+    request = parquet_request({})
+    assert WatermarkStore.get_key(request) == WatermarkStore.get_key(request)
+    assert WatermarkStore.get_key(request) != WatermarkStore.get_key(
+        parquet_request({}, folder='s3://runs/other')
+    )
+
+
+def test_put_get(tmp_path):
+    """ """
+    store = WatermarkStore(tmp_path / 'watermarks')
+
+    async def main():
+        assert await store.get('key') is None
+
+        value = store.to_json_value(datetime.datetime(2025, 8, 21, 1, 2, 3))
+        async with store.lock('key'):
+            await store.put('key', Watermark(column='updated_at', value=value))
+
+        return await store.get('key')
+
+    assert asyncio.run(main()) == Watermark(
+        column='updated_at', value='2025-08-21T01:02:03'
+    )
+    assert not list((tmp_path / 'watermarks').glob('*.tmp'))
@@ -0,0 +1,52 @@
+import datetime
+
+import polars
+
+from aw_connector_example.services.filters import Predicate
+from aw_connector_example.services.table_cache import TableCache
+
+
+def test_chunks_skipped_by_zone_map(tmp_path):
+    """ """
+    table_path = tmp_path / 'table.json'
+    table_path.write_text('[]')
+
+    frame = polars.DataFrame(
+        {
+            'id': list(range(1, 11)),
+            'created_at': [datetime.date(2025, 1, d) for d in range(1, 11)],
+            'comment': [None] * 9 + ['last'],
+        }
+    )
+    cache = TableCache(tmp_path / 'cache', chunk_rows=3)
+    cache.put(table_path, frame)
+
+    cached_table = cache.get(table_path)
+    assert cached_table is not None
+    assert [c.rows for c in cached_table.zone_map.chunks] == [3, 3, 3, 1]
+
+    predicates = [
+        Predicate(column='created_at', operator='>=', value=datetime.date(2025, 1, 8))
+    ]
+    assert cached_table.zone_map.prune(predicates) == [2, 3]
+    assert cached_table.scan(predicates).collect()['id'].to_list() == [7, 8, 9, 10]
+    # фрагменты не объединяются (не копируются из отображения файла в память)
+    assert cached_table.scan(predicates).collect().n_chunks() == 2
+
+    assert cached_table.zone_map.prune(
+        [Predicate(column='comment', operator='is not null')]
+    ) == [3]
+    assert cached_table.zone_map.prune(
+        [Predicate(column='id', operator='in', value=[2, 5])]
+    ) == [0, 1]
+
+
+def test_new_table_version_rebuilds_cache(tmp_path):
+    """ """
+    table_path = tmp_path / 'table.json'
+    table_path.write_text('[]')
+    cache = TableCache(tmp_path / 'cache')
+    cache.put(table_path, polars.DataFrame({'id': [1]}))
+
+    table_path.write_text('[{"id": 1}]')
+    assert cache.get(table_path) is None